@@ -0,0 +1,279 @@
+"""Catalog of application caches and logs that can be cleaned.
+
+Each Target describes one kind of reclaimable file declaratively: the root
+directories to look in, fnmatch patterns for the names to take (a matching
+directory contributes everything inside it, unless the target only matches
+files), names to skip, and age and size filters. Shared caches such as
+~/.cache are aged per top-level entry, so one program's cache is either
+left alone or removed whole, never thinned out file by file. Its safety class says how freely it may be cleaned:
+
+- SAFE: rebuilt automatically when needed (caches, bytecode); selected by
+  default in the UI and on the command line;
+- CAUTION: old logs, crash dumps and the shared user cache, which someone
+  may still want or which other programs manage themselves.
+
+size_targets() sizes all targets at once on a thread pool and
+clean_targets() removes the files of the selected ones in one pass. Files
+are deleted, not sent to the trash, since caches only free space when they
+are really gone. Symbolic links are never followed. Sizes are kept in a
+small JSON file so the UI can show them without rescanning.
+"""
+import fnmatch
+import json
+import os
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from hash_cache import CACHE_DIR
+from metrics import NULL_METRICS
+from scheduler import NEVER_CANCELLED
+from throttle import NO_THROTTLE
+
+SAFE = 'safe'
+CAUTION = 'caution'
+
+SIZES_PATH = os.path.join(CACHE_DIR, 'app_cache_sizes.json')
+SIZE_TTL = 60 * 60  # cached sizes older than this are shown as stale
+
+_CACHE_HOME = os.environ.get('XDG_CACHE_HOME') or os.path.join('~', '.cache')
+
+class Target:
+    """Files matching names directly in each root, or anywhere under it if recursive.
+
+    Names in exclude are neither taken nor descended into. With match_dirs
+    false, names are only matched against files, so a directory such as
+    php7.4 is searched rather than taken whole. A file is only counted and
+    removed if its mtime is at least min_age_days old and it has at least
+    min_size bytes. With by_entry, a directory directly in a root is instead
+    aged by the newest mtime of anything in it and taken whole or not at all.
+    """
+
+    def __init__(self, name, title, roots, names=('*',), recursive=False, exclude=(),
+                 min_age_days=0, min_size=0, safety=SAFE, match_dirs=True, by_entry=False):
+        self.name = name
+        self.title = title
+        self.roots = roots
+        self.names = names
+        self.recursive = recursive
+        self.exclude = exclude
+        self.min_age_days = min_age_days
+        self.min_size = min_size
+        self.safety = safety
+        self.match_dirs = match_dirs
+        self.by_entry = by_entry
+
+    def paths(self):
+        """Existing root directories, with ~ and environment variables expanded."""
+        paths = []
+        for root in self.roots:
+            path = os.path.expandvars(os.path.expanduser(root))
+            if '$' not in path and '%' not in path and os.path.isdir(path) \
+                    and not os.path.islink(path) and path not in paths:
+                paths.append(path)
+        return paths
+
+# Where Python projects and virtual environments usually live; walking all
+# of ~ for __pycache__ would reach into every other program's files
+_PYTHON_ROOTS = ['~/src', '~/code', '~/projects', '~/Projects', '~/dev', '~/git', '~/work',
+                 '~/.virtualenvs', '~/.local/share/virtualenvs', '~/.pyenv/versions',
+                 '~/.local/lib']
+
+TARGETS = [
+    Target('user-cache', "User cache (~/.cache)", [_CACHE_HOME],
+           exclude=('pip',), min_age_days=7, safety=CAUTION, by_entry=True),
+    Target('pip', "pip cache",
+           [os.path.join(_CACHE_HOME, 'pip'), '~/Library/Caches/pip',
+            os.path.join('%LOCALAPPDATA%', 'pip', 'Cache')]),
+    Target('npm', "npm cache",
+           ['~/.npm/_cacache', os.path.join('%LOCALAPPDATA%', 'npm-cache', '_cacache')]),
+    Target('pycache', "Python bytecode (__pycache__)", _PYTHON_ROOTS, names=('__pycache__',),
+           recursive=True, exclude=('.git', '.hg', 'node_modules')),
+    Target('rotated-logs', "Rotated logs (/var/log)", ['/var/log'],
+           names=('*.[0-9]', '*.gz', '*.xz', '*.bz2', '*.old',
+                  '*-[0-9][0-9][0-9][0-9][0-9][0-9][0-9][0-9]'),
+           recursive=True, min_age_days=7, safety=CAUTION, match_dirs=False),
+    Target('core-dumps', "Core dumps", ['/var/lib/systemd/coredump', '/var/crash'],
+           min_age_days=3, safety=CAUTION),
+]
+
+def get_target(name):
+    for target in TARGETS:
+        if target.name == name:
+            return target
+    raise KeyError(name)
+
+def _matches(name, patterns):
+    return any(fnmatch.fnmatch(name, pattern) for pattern in patterns)
+
+def _newest_mtime(path):
+    """Newest mtime of path and everything under it. Raises OSError if any of it cannot be read."""
+    newest = os.lstat(path).st_mtime
+    stack = [path]
+    while stack:
+        with os.scandir(stack.pop()) as it:
+            for entry in it:
+                newest = max(newest, entry.stat(follow_symlinks=False).st_mtime)
+                if entry.is_dir(follow_symlinks=False):
+                    stack.append(entry.path)
+    return newest
+
+def iter_files(target, cancel=NEVER_CANCELLED, errors=None, matched_dirs=None):
+    """Yield (path, size) for every file of target that passes its filters.
+
+    A symbolic link that matches is itself a file of the target. Paths that
+    cannot be read are added to errors as (path, error), and directories
+    that matched a name pattern (or were taken whole) to matched_dirs.
+    """
+    cutoff = time.time() - target.min_age_days * 86400
+    roots = target.paths()
+    stack = [(path, False) for path in reversed(roots)]
+    while stack:
+        directory, inside_match = stack.pop()
+        whole = target.by_entry and directory in roots
+        cancel.check()
+        try:
+            with os.scandir(directory) as it:
+                entries = list(it)
+        except OSError as e:
+            if errors is not None:
+                errors.append((directory, str(e)))
+            continue
+        for entry in entries:
+            matched = inside_match
+            if not matched:
+                if _matches(entry.name, target.exclude):
+                    continue
+                matched = _matches(entry.name, target.names)
+            try:
+                is_dir = entry.is_dir(follow_symlinks=False)
+                if is_dir and whole:
+                    if matched and (not target.min_age_days or _newest_mtime(entry.path) <= cutoff):
+                        if matched_dirs is not None:
+                            matched_dirs.append(entry.path)
+                        stack.append((entry.path, True))
+                    continue
+                if is_dir:
+                    if matched and target.match_dirs:
+                        if not inside_match and matched_dirs is not None:
+                            matched_dirs.append(entry.path)
+                        stack.append((entry.path, True))
+                    elif target.recursive:
+                        stack.append((entry.path, False))
+                    continue
+                if not matched:
+                    continue
+                st = entry.stat(follow_symlinks=False)
+            except OSError as e:
+                if errors is not None:
+                    errors.append((entry.path, str(e)))
+                continue
+            # Inside an entry taken whole, its newest file was already checked
+            if target.min_age_days and st.st_mtime > cutoff and not (target.by_entry and inside_match):
+                continue
+            if st.st_size < target.min_size:
+                continue
+            yield entry.path, st.st_size
+
+def size_target(target, cancel=NEVER_CANCELLED, throttle=NO_THROTTLE):
+    """Returns (bytes, files, errors) for the files of target."""
+    total = 0
+    count = 0
+    errors = []
+    for _, size in iter_files(target, cancel, errors):
+        throttle.file()
+        total += size
+        count += 1
+    return total, count, errors
+
+def size_targets(targets=None, metrics=NULL_METRICS, cancel=NEVER_CANCELLED,
+                 throttle=NO_THROTTLE, max_workers=8, on_sized=None):
+    """Size every target (default: all of TARGETS) concurrently on a thread pool.
+
+    on_sized(name, bytes, files) is called from a pool thread as each one
+    finishes. A throttled job sizes the targets one at a time, since its
+    Throttle is not shared between threads. Returns ({name: (bytes, files)},
+    errors).
+    """
+    targets = TARGETS if targets is None else targets
+    workers = 1 if throttle.enabled else max(1, min(max_workers, len(targets)))
+
+    def size(target):
+        start = time.perf_counter()
+        total, count, errors = size_target(target, cancel, throttle)
+        if on_sized:
+            on_sized(target.name, total, count)
+        return target, total, count, errors, time.perf_counter() - start
+
+    sizes = {}
+    all_errors = []
+    with ThreadPoolExecutor(max_workers=workers, thread_name_prefix='cache-size') as pool:
+        futures = [pool.submit(size, target) for target in targets]
+        for future in as_completed(futures):
+            target, total, count, errors, elapsed = future.result()
+            sizes[target.name] = (total, count)
+            all_errors.extend(errors)
+            metrics.add_time(f'size.{target.name}', elapsed)
+            metrics.count('files', count)
+            metrics.count('bytes', total)
+    metrics.count('errors', len(all_errors))
+    return sizes, all_errors
+
+def clean_targets(targets, metrics=NULL_METRICS, cancel=NEVER_CANCELLED, throttle=NO_THROTTLE,
+                  dry_run=False):
+    """Delete the files of each target, then any directories they left empty.
+
+    Returns ({name: (bytes freed, files removed)}, failed) where failed is a
+    list of (path, error). With dry_run nothing is deleted, and the result
+    says what would have been.
+    """
+    cleaned = {}
+    failed = []
+    for target in targets:
+        freed = 0
+        removed = 0
+        matched_dirs = []
+        with metrics.phase(f'clean.{target.name}'):
+            for path, size in iter_files(target, cancel, failed, matched_dirs):
+                throttle.file()
+                try:
+                    if not dry_run:
+                        os.remove(path)
+                    freed += size
+                    removed += 1
+                except OSError as e:
+                    failed.append((path, str(e)))
+            for directory in [] if dry_run else matched_dirs:
+                for root, _, _ in os.walk(directory, topdown=False):
+                    try:
+                        os.rmdir(root)
+                    except OSError:
+                        pass  # not empty: some files were kept or could not be removed
+        cleaned[target.name] = (freed, removed)
+        metrics.count('files', removed)
+        metrics.count('bytes', freed)
+    metrics.count('errors', len(failed))
+    return cleaned, failed
+
+def load_sizes(path=SIZES_PATH):
+    """Cached sizes as {name: {'bytes', 'files', 'sized_at'}}; empty if there are none."""
+    try:
+        with open(path) as f:
+            sizes = json.load(f)
+        return sizes if isinstance(sizes, dict) else {}
+    except (OSError, ValueError):
+        return {}
+
+def save_sizes(sizes, path=SIZES_PATH):
+    """Record {name: (bytes, files)} as sized now, keeping other cached targets."""
+    cached = load_sizes(path)
+    now = time.time()
+    for name, (total, count) in sizes.items():
+        cached[name] = {'bytes': total, 'files': count, 'sized_at': now}
+    try:
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        tmp_path = path + '.tmp'
+        with open(tmp_path, 'w') as f:
+            json.dump(cached, f, indent=2)
+        os.replace(tmp_path, path)
+    except OSError:
+        pass  # the cache only saves a rescan
+    return cached
@@ -0,0 +1,160 @@
+"""Measure the memory used per million files by scan result representations.
+
+Builds the same synthetic file list (no files are created) in each
+representation in a fresh process and reports the growth of peak RSS per
+million files, as JSON. With --trace each one is built again under
+tracemalloc to report the peak of Python allocations as well (tracing is
+slow and inflates RSS, so the two are measured separately):
+
+    python benchmarks/memory.py --files 1000000 --trace
+
+- tuples: digest -> [(path, size, mtime_ns)] for every file, as
+  scan_duplicates kept before it used columnar tables;
+- table: a columnar.FileTable with SHA256 digests, sorted by digest;
+- manifest_dicts / manifest_table: a recycle bin folder manifest as a list
+  of {'path', 'size'} dicts and as a FileTable without digests;
+- mapped: opening the saved table with mmap and running a size query.
+"""
+import argparse
+import hashlib
+import json
+import multiprocessing
+import os
+import random
+import sys
+import tempfile
+import time
+import tracemalloc
+
+REPO_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, REPO_DIR)
+
+EXTENSIONS = ['.jpg', '.png', '.mp4', '.mp3', '.pdf', '.txt', '.csv', '.log']
+
+def synthetic_files(count, files_per_dir=40, seed=0):
+    """Yield (directory, name, size, mtime_ns, inode, hex digest) rows."""
+    rng = random.Random(seed)
+    for i in range(count):
+        d = i // files_per_dir
+        directory = f"/srv/data/project{d // 1000:03d}/batch{d % 1000:03d}"
+        name = f"file_{i:08d}{rng.choice(EXTENSIONS)}"
+        size = int(rng.lognormvariate(10, 2))
+        # About one file in ten duplicates an earlier one
+        content = rng.randrange(i) if i and rng.random() < 0.1 else i
+        digest = hashlib.sha256(content.to_bytes(8, 'little')).hexdigest()
+        yield directory, name, size, 1700000000 * 10**9 + i, 1000 + i, digest
+
+def _build_tuples(rows):
+    from collections import defaultdict
+    groups = defaultdict(list)
+    for directory, name, size, mtime_ns, _, digest in rows:
+        groups[digest].append((os.path.join(directory, name), size, mtime_ns))
+    return groups
+
+def _build_table(rows):
+    from columnar import FileTable
+    table = FileTable(digest_size=32)
+    for row in rows:
+        table.append(*row)
+    table.digest_order()
+    return table
+
+def _build_manifest_dicts(rows):
+    return [{'path': os.path.join(directory, name), 'size': size}
+            for directory, name, size, _, _, _ in rows]
+
+def _build_manifest_table(rows):
+    from columnar import FileTable
+    table = FileTable()
+    for directory, name, size, mtime_ns, inode, _ in rows:
+        table.append(directory, name, size, mtime_ns, inode)
+    return table
+
+BUILDERS = {
+    'tuples': _build_tuples,
+    'table': _build_table,
+    'manifest_dicts': _build_manifest_dicts,
+    'manifest_table': _build_manifest_table,
+}
+
+def _peak_rss_kb():
+    import resource
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return peak // 1024 if sys.platform == 'darwin' else peak
+
+def _child(name, count, table_path, trace, results):
+    baseline_rss = _peak_rss_kb()
+    if trace:
+        tracemalloc.start()
+    start = time.perf_counter()
+    if name == 'mapped':
+        from columnar import open_table
+        with open_table(table_path) as table:
+            matches = sum(1 for _ in table.select(min_size=1 << 20))
+            groups = len(table.duplicate_groups())
+        extra = {'large_files': matches, 'duplicate_groups': groups,
+                 'file_bytes': os.path.getsize(table_path)}
+    else:
+        result = BUILDERS[name](synthetic_files(count))
+        extra = {}
+        if name == 'table' and table_path:
+            result.save(table_path)
+            extra['file_bytes'] = os.path.getsize(table_path)
+    wall = time.perf_counter() - start
+    if trace:
+        results.put({'traced_peak_bytes': tracemalloc.get_traced_memory()[1]})
+    else:
+        results.put(dict(extra, wall_s=wall, rss_growth_kb=_peak_rss_kb() - baseline_rss))
+
+def _run_child(name, count, table_path, trace):
+    ctx = multiprocessing.get_context('spawn')
+    results = ctx.Queue()
+    proc = ctx.Process(target=_child, args=(name, count, table_path, trace, results))
+    proc.start()
+    result = results.get()
+    proc.join()
+    if proc.exitcode != 0:
+        raise RuntimeError(f"{name} failed with exit code {proc.exitcode}")
+    return result
+
+def measure(name, count, table_path, trace=False):
+    per_million = 1e6 / count
+    result = _run_child(name, count, table_path, False)
+    result['rss_mb_per_million_files'] = result['rss_growth_kb'] * per_million / 1024
+    if trace:
+        result.update(_run_child(name, count, table_path, True))
+        result['traced_mb_per_million_files'] = result['traced_peak_bytes'] * per_million / 2**20
+    return result
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--files', type=int, default=1000000, help="Synthetic file count")
+    parser.add_argument('--only', nargs='+', choices=sorted(BUILDERS) + ['mapped'])
+    parser.add_argument('--trace', action='store_true',
+                        help="Also measure peak Python allocations with tracemalloc")
+    parser.add_argument('--output', help="Write results as JSON to this file")
+    args = parser.parse_args(argv)
+
+    names = args.only or list(BUILDERS) + ['mapped']
+    results = {}
+    with tempfile.TemporaryDirectory(prefix='ssc-mem-') as scratch:
+        table_path = os.path.join(scratch, 'scan.table')
+        if 'mapped' in names and 'table' not in names:
+            names = ['table'] + names
+        for name in names:
+            result = results[name] = measure(name, args.files, table_path, args.trace)
+            traced = result.get('traced_mb_per_million_files')
+            print(f"{name:16s} {result['rss_mb_per_million_files']:10.1f} MB/M RSS  "
+                  + (f"{traced:10.1f} MB/M traced  " if traced is not None else "")
+                  + f"{result['wall_s']:8.2f} s", file=sys.stderr)
+
+    text = json.dumps({'files': args.files, 'results': results}, indent=2)
+    if args.output:
+        with open(args.output, 'w') as f:
+            f.write(text + "\n")
+    else:
+        print(text)
+    return 0
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,188 @@
+"""Benchmark the engine entry points on a synthetic file tree.
+
+Each benchmark runs in a fresh process against a tree generated by synth.py
+under a temporary directory, and reports wall time, files/s, bytes/s and
+peak RSS. Results are written as JSON so runs can be compared across
+commits; with --baseline the run fails if anything regressed:
+
+    python benchmarks/run.py --files 20000 --output before.json
+    python benchmarks/run.py --files 20000 --baseline before.json --tolerance 0.15
+
+Exit status is 1 if a regression beyond the tolerance was found.
+"""
+import argparse
+import json
+import multiprocessing
+import os
+import platform
+import shutil
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+
+REPO_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, REPO_DIR)
+
+import synth
+
+def _bench_scan_directory(tree):
+    import engine
+    engine.scan_directory(tree)
+
+def _bench_scan_duplicates(tree):
+    import engine
+    engine.scan_duplicates(tree)
+
+def _bench_scan_temp_files(tree):
+    import engine
+    engine.scan_temp_files(tree)
+
+def _bench_move_to_bin(tree):
+    import engine
+    engine.RecycleBin().move_to_bin([os.path.join(tree, name) for name in os.listdir(tree)])
+
+def _bench_secure_delete(tree):
+    # secure_delete() only overwrites when moving to the recycle bin fails,
+    # so time the overwrite itself
+    from utils import overwrite_and_remove
+    overwrite_and_remove(tree)
+
+# name -> (function, modifies the tree)
+BENCHMARKS = {
+    'scan_directory': (_bench_scan_directory, False),
+    'scan_duplicates': (_bench_scan_duplicates, False),
+    'scan_temp_files': (_bench_scan_temp_files, False),
+    'move_to_bin': (_bench_move_to_bin, True),
+    'secure_delete': (_bench_secure_delete, True),
+}
+
+def _peak_rss_kb():
+    try:
+        import resource
+    except ImportError:
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # ru_maxrss is in bytes on macOS and kilobytes elsewhere
+    return peak // 1024 if sys.platform == 'darwin' else peak
+
+def _child(name, tree, home, results):
+    # The recycle bin lives under HOME; keep it inside the scratch directory
+    os.environ['HOME'] = home
+    func, _ = BENCHMARKS[name]
+    start = time.perf_counter()
+    func(tree)
+    wall = time.perf_counter() - start
+    results.put({'wall_s': wall, 'peak_rss_kb': _peak_rss_kb()})
+
+def run_once(name, tree, home):
+    """Run one benchmark in a fresh interpreter and return its measurements."""
+    ctx = multiprocessing.get_context('spawn')
+    results = ctx.Queue()
+    proc = ctx.Process(target=_child, args=(name, tree, home, results))
+    proc.start()
+    proc.join()
+    if proc.exitcode != 0:
+        raise RuntimeError(f"{name} failed with exit code {proc.exitcode}")
+    return results.get()
+
+def run_benchmarks(names, params, repeat, scratch):
+    """Run each benchmark repeat times; returns (manifest, results)."""
+    tree = os.path.join(scratch, 'tree')
+    home = os.path.join(scratch, 'home')
+    manifest = synth.generate_tree(tree, **params)
+
+    results = {}
+    for name in names:
+        _, destructive = BENCHMARKS[name]
+        runs = []
+        for _ in range(repeat):
+            if not os.path.exists(tree):
+                synth.generate_tree(tree, **params)
+            os.makedirs(home, exist_ok=True)
+            runs.append(run_once(name, tree, home))
+            shutil.rmtree(home, ignore_errors=True)
+            if destructive:
+                shutil.rmtree(tree, ignore_errors=True)
+        wall = statistics.median(r['wall_s'] for r in runs)
+        peaks = [r['peak_rss_kb'] for r in runs if r['peak_rss_kb'] is not None]
+        results[name] = {
+            'wall_s': wall,
+            'files_per_s': manifest['files'] / wall if wall else None,
+            'bytes_per_s': manifest['total_bytes'] / wall if wall else None,
+            'peak_rss_kb': max(peaks) if peaks else None,
+            'runs': len(runs),
+        }
+        print(f"{name:16s} {wall:8.3f} s  {results[name]['files_per_s']:12.0f} files/s  "
+              f"{results[name]['bytes_per_s'] / (1024*1024):10.1f} MB/s  "
+              f"{results[name]['peak_rss_kb'] or 0:8d} KB", file=sys.stderr)
+    return manifest, results
+
+def compare(results, baseline, tolerance):
+    """List regressions of wall time or peak RSS beyond tolerance vs baseline."""
+    regressions = []
+    for name, current in results.items():
+        before = baseline.get('results', {}).get(name)
+        if not before:
+            continue
+        for metric in ('wall_s', 'peak_rss_kb'):
+            old, new = before.get(metric), current.get(metric)
+            if old and new and new > old * (1 + tolerance):
+                regressions.append(f"{name}: {metric} {old:g} -> {new:g} "
+                                   f"(+{(new / old - 1) * 100:.1f}%)")
+    return regressions
+
+def _git_commit():
+    try:
+        return subprocess.run(['git', 'rev-parse', 'HEAD'], cwd=REPO_DIR, capture_output=True,
+                              text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    synth.add_arguments(parser)
+    parser.add_argument('--only', nargs='+', choices=sorted(BENCHMARKS), help="Benchmarks to run")
+    parser.add_argument('--repeat', type=int, default=3, help="Runs per benchmark; the median is kept")
+    parser.add_argument('--output', help="Write results as JSON to this file")
+    parser.add_argument('--baseline', help="JSON results of an earlier run to compare against")
+    parser.add_argument('--tolerance', type=float, default=0.10,
+                        help="Allowed relative slowdown or memory growth (default 0.10)")
+    parser.add_argument('--scratch', help="Directory for generated trees (default: a temp dir)")
+    args = parser.parse_args(argv)
+
+    names = args.only or list(BENCHMARKS)
+    params = synth.tree_params(args)
+    scratch = tempfile.mkdtemp(prefix='ssc-bench-', dir=args.scratch)
+    try:
+        manifest, results = run_benchmarks(names, params, args.repeat, scratch)
+    finally:
+        shutil.rmtree(scratch, ignore_errors=True)
+
+    report = {
+        'commit': _git_commit(),
+        'timestamp': time.time(),
+        'python': platform.python_version(),
+        'platform': platform.platform(),
+        'tree': manifest,
+        'results': results,
+    }
+    text = json.dumps(report, indent=2)
+    if args.output:
+        with open(args.output, 'w') as f:
+            f.write(text + "\n")
+    else:
+        print(text)
+
+    if args.baseline:
+        with open(args.baseline) as f:
+            regressions = compare(results, json.load(f), args.tolerance)
+        for line in regressions:
+            print(f"REGRESSION {line}", file=sys.stderr)
+        if regressions:
+            return 1
+    return 0
+
+if __name__ == '__main__':
+    sys.exit(main())
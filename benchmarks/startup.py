@@ -0,0 +1,71 @@
+"""Measure application startup time.
+
+Runs `main.py --startup-time` (time until the window is first drawn) and
+`python -m cli --help` several times in fresh interpreters and reports the
+median, so changes to startup cost can be tracked across commits:
+
+    python benchmarks/startup.py --runs 10 --output startup.json
+
+The GUI measurement needs a display; it is skipped when none is available.
+"""
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+import time
+
+REPO_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+def time_command(args, runs):
+    """Run args in a fresh interpreter runs times.
+
+    Returns (wall-clock ms per run, JSON reported by the process per run).
+    """
+    wall = []
+    reported = []
+    for _ in range(runs):
+        start = time.perf_counter()
+        proc = subprocess.run([sys.executable] + args, cwd=REPO_DIR,
+                              capture_output=True, text=True)
+        wall.append((time.perf_counter() - start) * 1000)
+        if proc.returncode != 0:
+            raise RuntimeError(proc.stderr.strip().splitlines()[-1] if proc.stderr else
+                               f"exit status {proc.returncode}")
+        try:
+            reported.append(json.loads(proc.stdout.strip().splitlines()[-1]))
+        except (ValueError, IndexError):
+            pass
+    return wall, reported
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--runs', type=int, default=5)
+    parser.add_argument('--output', help="Write results as JSON to this file")
+    args = parser.parse_args(argv)
+
+    results = {}
+    wall, _ = time_command(['-m', 'cli', '--help'], args.runs)
+    results['cli_help'] = {'wall_ms': statistics.median(wall)}
+
+    try:
+        wall, reported = time_command(['main.py', '--startup-time'], args.runs)
+        results['gui_startup'] = {
+            'wall_ms': statistics.median(wall),
+            'window_ms': statistics.median(r['startup_ms'] for r in reported),
+        }
+    except RuntimeError as e:
+        print(f"Skipping GUI startup: {e}", file=sys.stderr)
+
+    report = {'benchmark': 'startup', 'runs': args.runs,
+              'timestamp': time.time(), 'results': results}
+    text = json.dumps(report, indent=2)
+    if args.output:
+        with open(args.output, 'w') as f:
+            f.write(text + "\n")
+    print(text)
+    return 0
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,120 @@
+"""Seeded generator for synthetic file trees used by the benchmarks.
+
+The same parameters and seed always produce the same tree: directory layout,
+file names, sizes and contents. Example:
+
+    python benchmarks/synth.py /tmp/tree --files 10000 --dup-ratio 0.2
+"""
+import argparse
+import json
+import math
+import os
+import random
+import shutil
+import sys
+
+# Extensions spread files over the storage categories in engine.py
+EXTENSIONS = ['.jpg', '.png', '.mp4', '.mp3', '.pdf', '.txt', '.csv', '.deb', '.dll', '.dat', '.log']
+
+SIZE_DISTRIBUTIONS = ('lognormal', 'uniform', 'fixed')
+
+def _sample_size(rng, distribution, mean_size, max_size):
+    if distribution == 'fixed':
+        return mean_size
+    if distribution == 'uniform':
+        return rng.randint(0, 2 * mean_size)
+    # Log-normal with the requested mean: many small files, a long tail of big ones
+    sigma = 1.5
+    mu = math.log(max(mean_size, 1)) - sigma * sigma / 2
+    return min(int(rng.lognormvariate(mu, sigma)), max_size)
+
+def _write_random(f, rng, size, block=1024 * 1024):
+    """Write size seeded pseudo-random bytes in blocks."""
+    while size > 0:
+        n = min(size, block)
+        f.write(rng.getrandbits(8 * n).to_bytes(n, 'little'))
+        size -= n
+
+def _directories(root, rng, depth, count):
+    """count directory paths, at most depth levels below root."""
+    dirs = [root]
+    while depth > 0 and len(dirs) < count:
+        parent = rng.choice(dirs)
+        level = os.path.relpath(parent, root).count(os.sep) + (parent != root)
+        if level >= depth:
+            continue
+        dirs.append(os.path.join(parent, f"d{len(dirs):05d}"))
+    return dirs
+
+def generate_tree(root, files=1000, depth=4, dirs=None, size_distribution='lognormal',
+                  mean_size=16 * 1024, max_size=64 * 1024 * 1024, dup_ratio=0.1,
+                  hardlink_ratio=0.0, seed=0):
+    """Create a file tree under root and return a manifest describing it.
+
+    dup_ratio is the fraction of files that are byte-identical copies of an
+    earlier file; hardlink_ratio the fraction that are hard links to one.
+    Returns a dict with the parameters plus file, byte and duplicate counts.
+    """
+    if size_distribution not in SIZE_DISTRIBUTIONS:
+        raise ValueError(f"Unknown size distribution: {size_distribution}")
+    rng = random.Random(seed)
+    dir_paths = _directories(root, rng, depth, dirs or max(1, files // 50))
+    for path in dir_paths:
+        os.makedirs(path, exist_ok=True)
+
+    originals = []
+    total_bytes = 0
+    duplicates = 0
+    hardlinks = 0
+    for i in range(files):
+        path = os.path.join(rng.choice(dir_paths), f"f{i:07d}{rng.choice(EXTENSIONS)}")
+        roll = rng.random()
+        if originals and roll < hardlink_ratio:
+            source, size = rng.choice(originals)
+            os.link(source, path)
+            hardlinks += 1
+        elif originals and roll < hardlink_ratio + dup_ratio:
+            source, size = rng.choice(originals)
+            shutil.copyfile(source, path)
+            duplicates += 1
+        else:
+            size = _sample_size(rng, size_distribution, mean_size, max_size)
+            with open(path, 'wb') as f:
+                _write_random(f, rng, size)
+            originals.append((path, size))
+        total_bytes += size
+
+    return {
+        'files': files, 'dirs': len(dir_paths), 'depth': depth,
+        'size_distribution': size_distribution, 'mean_size': mean_size,
+        'dup_ratio': dup_ratio, 'hardlink_ratio': hardlink_ratio, 'seed': seed,
+        'total_bytes': total_bytes, 'duplicates': duplicates, 'hardlinks': hardlinks,
+    }
+
+def add_arguments(parser):
+    parser.add_argument('--files', type=int, default=2000)
+    parser.add_argument('--depth', type=int, default=4)
+    parser.add_argument('--dirs', type=int, help="Number of directories (default: files / 50)")
+    parser.add_argument('--size-distribution', choices=SIZE_DISTRIBUTIONS, default='lognormal')
+    parser.add_argument('--mean-size', type=int, default=16 * 1024, help="Mean file size in bytes")
+    parser.add_argument('--max-size', type=int, default=64 * 1024 * 1024)
+    parser.add_argument('--dup-ratio', type=float, default=0.1)
+    parser.add_argument('--hardlink-ratio', type=float, default=0.0)
+    parser.add_argument('--seed', type=int, default=0)
+
+def tree_params(args):
+    return {'files': args.files, 'depth': args.depth, 'dirs': args.dirs,
+            'size_distribution': args.size_distribution, 'mean_size': args.mean_size,
+            'max_size': args.max_size, 'dup_ratio': args.dup_ratio,
+            'hardlink_ratio': args.hardlink_ratio, 'seed': args.seed}
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('root')
+    add_arguments(parser)
+    args = parser.parse_args(argv)
+    print(json.dumps(generate_tree(args.root, **tree_params(args)), indent=2))
+    return 0
+
+if __name__ == '__main__':
+    sys.exit(main())
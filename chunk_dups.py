@@ -0,0 +1,361 @@
+"""Find partially duplicated files by content-defined chunking.
+
+Whole-file hashes miss files that are mostly identical, such as VM images,
+database dumps or log archives that differ in a few blocks. Here each file is
+split into variable-size chunks at positions chosen by a gear rolling hash
+(as in FastCDC), so an insertion or deletion only changes the chunks around
+it. Chunk digests are kept in a SQLite ChunkIndex, from which the bytes
+shared by each pair of files and each directory are reported.
+
+Files are read in fixed-size blocks and cut into segments that are chunked
+independently on a process pool, so memory use does not grow with file
+size and one large file can use every core. Requires numpy.
+"""
+import hashlib
+import os
+import sqlite3
+import tempfile
+import threading
+from array import array
+from collections import defaultdict
+from concurrent.futures import ProcessPoolExecutor, FIRST_COMPLETED, wait
+import numpy as np
+from hash_cache import CACHE_DIR
+from metrics import NULL_METRICS
+from scheduler import NEVER_CANCELLED
+from throttle import NO_THROTTLE
+
+MIN_FILE_SIZE = 1 << 20      # smaller files are left to whole-file hashing
+MIN_CHUNK = 16 * 1024
+MAX_CHUNK = 256 * 1024
+AVG_BITS = 16                # a boundary every 2**16 bytes past MIN_CHUNK on average
+SEGMENT_SIZE = 64 << 20      # unit of work for the pool; chunks never cross segments
+READ_SIZE = 1 << 20
+DIGEST_SIZE = 16
+
+# Chunks are only comparable if they were cut with the same parameters
+CHUNKER = f"gear64/{MIN_CHUNK}/{AVG_BITS}/{MAX_CHUNK}/{SEGMENT_SIZE}/blake2b{DIGEST_SIZE}"
+
+# Random 64-bit value per byte, derived from SHA256 so it never changes
+_GEAR = np.array([int.from_bytes(hashlib.sha256(bytes([i])).digest()[:8], 'little')
+                  for i in range(256)], dtype=np.uint64)
+_MASK = np.uint64(((1 << AVG_BITS) - 1) << (64 - AVG_BITS))
+
+def gear_hashes(data):
+    """Gear hash after every byte of data, starting from 0.
+
+    Equal to running h = (h << 1) + GEAR[byte] (mod 2**64) over data, i.e.
+    h[i] = sum(GEAR[data[i - k]] << k for k < 64), but computed with six
+    vectorized doubling steps instead of a Python loop per byte.
+    """
+    h = _GEAR[np.frombuffer(data, dtype=np.uint8)]
+    width = 1
+    while width < 64:
+        h[width:] += h[:-width] << np.uint64(width)
+        width *= 2
+    return h
+
+def _cut_points(data):
+    """Offsets just past each byte of data where a chunk may end."""
+    return np.flatnonzero((gear_hashes(data) & _MASK) == 0) + 1
+
+def chunk_segment(path, offset, length):
+    """Process-pool worker: chunk length bytes of path starting at offset.
+
+    Holds at most one read block plus one unfinished chunk in memory.
+    Returns (chunk lengths as array('I') bytes, concatenated digests).
+    """
+    lengths = array('I')
+    digests = bytearray()
+    pending = b''
+    remaining = length
+    with open(path, 'rb') as f:
+        f.seek(offset)
+        while True:
+            block = f.read(min(READ_SIZE, remaining)) if remaining else b''
+            remaining -= len(block)
+            at_end = not remaining or not block
+            data = pending + block
+            view = memoryview(data)
+            # The hash restarts at each chunk, so hashing from the start of
+            # the unfinished chunk gives the same cut points as one pass
+            cuts = _cut_points(data)
+            start = 0
+            while start < len(data):
+                k = np.searchsorted(cuts, start + MIN_CHUNK)
+                end = int(cuts[k]) if k < len(cuts) else None
+                if end is None or end - start > MAX_CHUNK:
+                    end = start + MAX_CHUNK
+                    if end > len(data):
+                        if not at_end:
+                            break
+                        end = len(data)
+                lengths.append(end - start)
+                digests += hashlib.blake2b(view[start:end], digest_size=DIGEST_SIZE).digest()
+                start = end
+            view.release()
+            pending = data[start:]
+            if at_end:
+                break
+    return lengths.tobytes(), bytes(digests)
+
+def _lower_priority():
+    from throttle import lower_priority
+    lower_priority(process=True)
+
+class ChunkIndex:
+    """Disk-backed table of the chunks of each file.
+
+    Like HashCache, a file's chunks are reused while its size and mtime match.
+    With temporary=True the database is a scratch file removed on close().
+    """
+
+    def __init__(self, db_path=None, temporary=False):
+        self._temporary = None
+        if temporary:
+            fd, db_path = tempfile.mkstemp(prefix='ssc-chunks-', suffix='.db')
+            os.close(fd)
+            self._temporary = db_path
+        elif db_path is None:
+            os.makedirs(CACHE_DIR, exist_ok=True)
+            db_path = os.path.join(CACHE_DIR, 'chunks.db')
+        self.db_path = db_path
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(db_path, check_same_thread=False)
+        with self._conn:
+            self._conn.execute("PRAGMA journal_mode=WAL")
+            self._conn.execute("PRAGMA synchronous=NORMAL")
+            self._conn.execute("CREATE TABLE IF NOT EXISTS meta (key TEXT PRIMARY KEY, value TEXT)")
+            row = self._conn.execute("SELECT value FROM meta WHERE key = 'chunker'").fetchone()
+            if row is None or row[0] != CHUNKER:
+                self._conn.execute("DROP TABLE IF EXISTS chunks")
+                self._conn.execute("DROP TABLE IF EXISTS files")
+                self._conn.execute("INSERT OR REPLACE INTO meta VALUES ('chunker', ?)", (CHUNKER,))
+            self._conn.execute(
+                "CREATE TABLE IF NOT EXISTS files ("
+                "id INTEGER PRIMARY KEY, path TEXT UNIQUE, size INTEGER, mtime_ns INTEGER)")
+            self._conn.execute(
+                "CREATE TABLE IF NOT EXISTS chunks (file_id INTEGER, digest BLOB, length INTEGER)")
+            self._conn.execute("CREATE INDEX IF NOT EXISTS chunks_file ON chunks (file_id)")
+            self._conn.execute("CREATE INDEX IF NOT EXISTS chunks_digest ON chunks (digest)")
+
+    def get_file(self, path, size, mtime_ns):
+        """Id of path if its chunks are indexed for this size and mtime, else None."""
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT id FROM files WHERE path = ? AND size = ? AND mtime_ns = ?",
+                (path, size, mtime_ns)).fetchone()
+        return row[0] if row else None
+
+    def put_file(self, path, size, mtime_ns, lengths, digests):
+        """Replace the chunks of path; returns its file id."""
+        with self._lock, self._conn:
+            row = self._conn.execute("SELECT id FROM files WHERE path = ?", (path,)).fetchone()
+            if row:
+                self._conn.execute("DELETE FROM chunks WHERE file_id = ?", row)
+            cur = self._conn.execute("INSERT OR REPLACE INTO files VALUES (?, ?, ?, ?)",
+                                     (row[0] if row else None, path, size, mtime_ns))
+            file_id = cur.lastrowid
+            self._conn.executemany(
+                "INSERT INTO chunks VALUES (?, ?, ?)",
+                ((file_id, digests[i * DIGEST_SIZE:(i + 1) * DIGEST_SIZE], length)
+                 for i, length in enumerate(lengths)))
+        return file_id
+
+    def prune(self, directory, files):
+        """Forget indexed files under directory that are not in files.
+
+        files is the current (path, size, mtime_ns) of every file under
+        directory that should stay indexed; files deleted or changed since
+        they were chunked are dropped with their chunks. Returns the number
+        of files dropped.
+        """
+        prefix = os.path.join(os.path.normpath(directory), '')
+        with self._lock, self._conn:
+            conn = self._conn
+            conn.execute("CREATE TEMP TABLE current "
+                         "(path TEXT PRIMARY KEY, size INTEGER, mtime_ns INTEGER)")
+            try:
+                conn.executemany("INSERT OR REPLACE INTO current VALUES (?, ?, ?)", files)
+                conn.execute(
+                    "CREATE TEMP TABLE stale AS SELECT id FROM files f "
+                    "WHERE substr(f.path, 1, ?) = ? AND NOT EXISTS (SELECT 1 FROM current c "
+                    "WHERE c.path = f.path AND c.size = f.size AND c.mtime_ns = f.mtime_ns)",
+                    (len(prefix), prefix))
+                conn.execute("DELETE FROM chunks WHERE file_id IN (SELECT id FROM temp.stale)")
+                pruned = conn.execute(
+                    "DELETE FROM files WHERE id IN (SELECT id FROM temp.stale)").rowcount
+            finally:
+                for table in ('current', 'stale'):
+                    conn.execute(f"DROP TABLE IF EXISTS temp.{table}")
+        return pruned
+
+    def report(self, file_ids, max_pairs=100, max_sharing=32):
+        """Shared bytes among the given files.
+
+        Returns a dict with total_bytes, unique_bytes (each distinct chunk
+        counted once), savings (their difference), pairs: [(id_a, id_b,
+        shared bytes)] for the max_pairs pairs sharing the most, and shared:
+        {file id: bytes of its chunks also found in another file}. Chunks in
+        more than max_sharing files (runs of zeros and the like) count
+        towards savings but not towards pairs, whose number would otherwise
+        grow with the square of the files holding them.
+        """
+        with self._lock, self._conn:
+            conn = self._conn
+            conn.execute("CREATE TEMP TABLE scan (file_id INTEGER PRIMARY KEY)")
+            try:
+                conn.executemany("INSERT OR IGNORE INTO scan VALUES (?)", ((i,) for i in file_ids))
+                conn.execute(
+                    "CREATE TEMP TABLE occ AS SELECT c.digest, c.file_id, "
+                    "MAX(c.length) AS length, COUNT(*) AS n "
+                    "FROM chunks c JOIN scan s ON c.file_id = s.file_id "
+                    "GROUP BY c.digest, c.file_id")
+                conn.execute("CREATE INDEX temp.occ_digest ON occ (digest)")
+                conn.execute(
+                    "CREATE TEMP TABLE multi AS SELECT digest, COUNT(*) AS files FROM occ "
+                    "GROUP BY digest HAVING COUNT(*) > 1")
+                conn.execute("CREATE INDEX temp.multi_digest ON multi (digest)")
+                total, = conn.execute("SELECT COALESCE(SUM(length * n), 0) FROM occ").fetchone()
+                unique, = conn.execute(
+                    "SELECT COALESCE(SUM(length), 0) FROM "
+                    "(SELECT MAX(length) AS length FROM occ GROUP BY digest)").fetchone()
+                shared = dict(conn.execute(
+                    "SELECT o.file_id, SUM(o.length * o.n) FROM occ o "
+                    "JOIN multi m ON o.digest = m.digest GROUP BY o.file_id"))
+                pairs = conn.execute(
+                    "SELECT a.file_id, b.file_id, SUM(a.length * MIN(a.n, b.n)) AS bytes "
+                    "FROM multi m JOIN occ a ON a.digest = m.digest "
+                    "JOIN occ b ON b.digest = m.digest AND a.file_id < b.file_id "
+                    "WHERE m.files <= ? GROUP BY a.file_id, b.file_id "
+                    "ORDER BY bytes DESC LIMIT ?", (max_sharing, max_pairs)).fetchall()
+            finally:
+                for table in ('scan', 'occ', 'multi'):
+                    conn.execute(f"DROP TABLE IF EXISTS temp.{table}")
+        return {'total_bytes': total, 'unique_bytes': unique, 'savings': total - unique,
+                'pairs': pairs, 'shared': shared}
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
+        if self._temporary:
+            for suffix in ('', '-wal', '-shm'):
+                try:
+                    os.remove(self._temporary + suffix)
+                except OSError:
+                    pass
+
+def index_files(files, index, metrics=NULL_METRICS, cancel=NEVER_CANCELLED,
+                throttle=NO_THROTTLE, max_workers=None):
+    """Chunk each (path, size, mtime_ns) not already in index.
+
+    Segments of the files are chunked on a process pool, a few per worker at
+    a time so cancellation and the throttle take effect promptly. Returns
+    ({path: file id}, [(path, error)]).
+    """
+    file_ids = {}
+    errors = []
+    pending = []
+    for path, size, mtime_ns in files:
+        file_id = index.get_file(path, size, mtime_ns)
+        if file_id is not None:
+            file_ids[path] = file_id
+            metrics.count('chunk.cache_hits')
+        else:
+            pending.append((path, size, mtime_ns))
+    if not pending:
+        return file_ids, errors
+
+    tasks = ((path, offset, min(SEGMENT_SIZE, size - offset))
+             for path, size, _ in pending for offset in range(0, size, SEGMENT_SIZE))
+    stats = {path: (size, mtime_ns) for path, size, mtime_ns in pending}
+    parts = defaultdict(dict)  # path -> {offset: (lengths, digests)}
+    failed = set()
+    workers = max_workers or os.cpu_count() or 1
+    pool = ProcessPoolExecutor(max_workers=workers,
+                               initializer=_lower_priority if throttle.enabled else None)
+    window = 2 * workers
+    running = {}
+    try:
+        for task in tasks:
+            cancel.check()
+            if task[1] == 0:
+                throttle.file()
+            running[pool.submit(chunk_segment, *task)] = task
+            while len(running) >= window:
+                _collect(running, parts, stats, failed, index, file_ids, errors,
+                         metrics, throttle, cancel)
+        while running:
+            _collect(running, parts, stats, failed, index, file_ids, errors,
+                     metrics, throttle, cancel)
+    finally:
+        # Only the bounded window is ever queued; cancel what has not started
+        # by hand (shutdown's cancel_futures needs Python 3.9)
+        for future in running:
+            future.cancel()
+        pool.shutdown(wait=True)
+    return file_ids, errors
+
+def _collect(running, parts, stats, failed, index, file_ids, errors, metrics, throttle, cancel):
+    """Wait for at least one segment; store files whose segments are all done."""
+    done, _ = wait(running, timeout=0.5, return_when=FIRST_COMPLETED)
+    cancel.check()
+    for future in done:
+        path, offset, length = running.pop(future)
+        if path in failed:
+            continue
+        try:
+            lengths, digests = future.result()
+        except Exception as e:
+            failed.add(path)
+            parts.pop(path, None)
+            errors.append((path, str(e)))
+            continue
+        throttle.io(length)
+        metrics.count('chunk.segments')
+        segments = parts[path]
+        segments[offset] = (lengths, digests)
+        size, mtime_ns = stats[path]
+        if len(segments) < -(-size // SEGMENT_SIZE):
+            continue
+        del parts[path]
+        all_lengths = array('I')
+        all_digests = bytearray()
+        for start in sorted(segments):
+            all_lengths.frombytes(segments[start][0])
+            all_digests += segments[start][1]
+        if sum(all_lengths) != size:
+            errors.append((path, "File changed while it was read"))
+            continue
+        with metrics.phase('chunk.index'):
+            file_ids[path] = index.put_file(path, size, mtime_ns, all_lengths, bytes(all_digests))
+        metrics.count('chunk.files')
+        metrics.count('chunk.bytes', size)
+        metrics.count('chunk.chunks', len(all_lengths))
+
+def find_shared_chunks(files, index, max_pairs=100, metrics=NULL_METRICS,
+                       cancel=NEVER_CANCELLED, throttle=NO_THROTTLE, max_workers=None):
+    """Report the bytes shared among (path, size, mtime_ns) entries.
+
+    Returns (report, errors). report has total_bytes, unique_bytes and
+    savings for the files chunked, pairs: [(path_a, path_b, shared bytes)]
+    largest first, and directories: [(directory, shared bytes, total bytes)]
+    for directories directly holding files with shared chunks, largest first.
+    """
+    with metrics.phase('chunk'):
+        file_ids, errors = index_files(files, index, metrics, cancel, throttle, max_workers)
+    cancel.check()
+    with metrics.phase('chunk.report'):
+        report = index.report(file_ids.values(), max_pairs)
+    paths = {file_id: path for path, file_id in file_ids.items()}
+    sizes = {path: size for path, size, _ in files}
+    directories = defaultdict(lambda: [0, 0])
+    for path in file_ids:
+        directories[os.path.dirname(path)][1] += sizes[path]
+    for file_id, shared in report.pop('shared').items():
+        directories[os.path.dirname(paths[file_id])][0] += shared
+    report['files'] = len(file_ids)
+    report['pairs'] = [(paths[a], paths[b], shared) for a, b, shared in report['pairs']]
+    report['directories'] = sorted(((d, shared, total) for d, (shared, total) in directories.items()
+                                    if shared), key=lambda x: x[1], reverse=True)
+    return report, errors
@@ -1,52 +1,18 @@
 import tkinter as tk
 from tkinter import ttk, messagebox
 import os
-import hashlib
-import send2trash
-import threading
-from collections import defaultdict
-
-def calculate_file_hash(file_path):
-    """Calculate SHA256 hash of a file."""
-    try:
-        sha256_hash = hashlib.sha256()
-        with open(file_path, "rb") as f:
-            for byte_block in iter(lambda: f.read(4096), b""):
-                sha256_hash.update(byte_block)
-        return sha256_hash.hexdigest()
-    except PermissionError:
-        messagebox.showwarning("Permission Denied", f"Cannot access file: {file_path}\nPlease check file permissions.")
-        return None
-    except Exception as e:
-        messagebox.showerror("Error", f"Failed to calculate hash for {file_path}: {str(e)}")
-        return None
+import time
+import app_cache
+import engine
+import metrics
+from scheduler import get_scheduler, PRIORITY_HIGH
 
-def find_duplicate_files(paths):
-    """Find files with same content but different names."""
-    hash_map = defaultdict(list)
-    for path in paths:
-        file_hash = calculate_file_hash(path)
-        if file_hash:  # Only add if hash calculation succeeded
-            hash_map[file_hash].append(path)
-    return {h: paths for h, paths in hash_map.items() if len(paths) > 1}
-
-def find_same_name_files(base_path, filename):
-    """Find all files with the same name across directories."""
-    same_name_files = []
-    for root, _, files in os.walk(base_path):
-        if filename in files:
-            file_path = os.path.join(root, filename)
-            try:
-                # Test file accessibility
-                with open(file_path, 'rb'):
-                    same_name_files.append(file_path)
-            except PermissionError:
-                messagebox.showwarning("Permission Denied", 
-                    f"Cannot access file: {file_path}\nSkipping this file.")
-            except Exception as e:
-                messagebox.showwarning("Access Error", 
-                    f"Cannot access file: {file_path}\nError: {str(e)}")
-    return same_name_files
+# Watcher keeping the duplicate view current after a scan with live updates
+_live = {}
+
+def _format_errors(errors, limit=5):
+    return ("\n".join(f"{path}: {error}" for path, error in errors[:limit]) +
+            ("\n..." if len(errors) > limit else ""))
 
 def setup_cleanup_tab(frame):
     # Temporary Files section
@@ -55,9 +21,9 @@ def setup_cleanup_tab(frame):
     
     temp_size_label = ttk.Label(temp_frame, text="Size: 0 MB")
     temp_size_label.grid(row=0, column=1, padx=10, pady=5)
-    scan_button = ttk.Button(temp_frame, text="Scan", command=lambda: threading.Thread(target=scan_temp_files, args=(temp_size_label, scan_button)).start())
+    scan_button = ttk.Button(temp_frame, text="Scan", command=lambda: scan_temp_files(temp_size_label, scan_button))
     scan_button.grid(row=0, column=2, padx=10, pady=5)
-    delete_button = ttk.Button(temp_frame, text="Delete", command=lambda: threading.Thread(target=delete_temp_files, args=(temp_size_label, delete_button)).start())
+    delete_button = ttk.Button(temp_frame, text="Delete", command=lambda: delete_temp_files(temp_size_label, delete_button))
     delete_button.grid(row=0, column=3, padx=10, pady=5)
 
     # Duplicate Files section
@@ -70,7 +36,9 @@ def setup_cleanup_tab(frame):
     browse_button.grid(row=0, column=2, padx=10, pady=5)
     
     # Tree view for duplicate files with multiple selection enabled
-    dup_tree = ttk.Treeview(dup_frame, columns=('Size', 'Hash', 'Status'), selectmode='extended', height=10)
+    # 'Bytes' and 'Mtime' hold the exact scan-time stat and are not displayed
+    dup_tree = ttk.Treeview(dup_frame, columns=('Size', 'Hash', 'Status', 'Bytes', 'Mtime'),
+                            displaycolumns=('Size', 'Hash', 'Status'), selectmode='extended', height=10)
     dup_tree.grid(row=1, column=0, columnspan=3, sticky='nsew', padx=10, pady=5)
     dup_tree.heading('#0', text='File Path')
     dup_tree.heading('Size', text='Size (MB)')
@@ -89,11 +57,33 @@ def setup_cleanup_tab(frame):
     btn_frame = ttk.Frame(dup_frame)
     btn_frame.grid(row=2, column=0, columnspan=3, pady=5)
     
+    # Low impact scans run throttled at reduced CPU and I/O priority
+    low_impact = tk.BooleanVar(value=False)
+    ttk.Checkbutton(btn_frame, text="Low impact", variable=low_impact).pack(side='left', padx=5)
+    live_updates = tk.BooleanVar(value=False)
+    ttk.Checkbutton(btn_frame, text="Live updates", variable=live_updates,
+                    command=lambda: _stop_watching() if not live_updates.get() else None
+                    ).pack(side='left', padx=5)
+    
     scan_dup_button = ttk.Button(btn_frame, text="Scan", 
-                                command=lambda: threading.Thread(target=scan_dup_files, 
-                                                              args=(dup_dir_entry, dup_tree, scan_dup_button)).start())
+                                command=lambda: scan_dup_files(dup_dir_entry, dup_tree, scan_dup_button,
+                                                               low_impact.get(), live_updates.get()))
     scan_dup_button.pack(side='left', padx=5)
     
+    similar_button = ttk.Button(btn_frame, text="Similar Images", 
+                               command=lambda: scan_similar_images(dup_dir_entry, dup_tree, similar_button,
+                                                                   low_impact.get()))
+    similar_button.pack(side='left', padx=5)
+    
+    partial_button = ttk.Button(btn_frame, text="Partial Duplicates", 
+                               command=lambda: scan_partial_duplicates(dup_dir_entry, dup_tree, partial_button,
+                                                                       low_impact.get()))
+    partial_button.pack(side='left', padx=5)
+    
+    cancel_button = ttk.Button(btn_frame, text="Cancel", 
+                              command=cancel_dup_jobs)
+    cancel_button.pack(side='left', padx=5)
+    
     find_same_name_button = ttk.Button(btn_frame, text="Find Same Names", 
                                       command=lambda: find_same_name_matches(dup_dir_entry, dup_tree))
     find_same_name_button.pack(side='left', padx=5)
@@ -102,6 +92,10 @@ def setup_cleanup_tab(frame):
                                   command=lambda: delete_selected_files(dup_tree))
     delete_dup_button.pack(side='left', padx=5)
     
+    dedupe_button = ttk.Button(btn_frame, text="Deduplicate In Place", 
+                              command=lambda: dedupe_selected_groups(dup_tree, dedupe_button))
+    dedupe_button.pack(side='left', padx=5)
+    
     select_all_button = ttk.Button(btn_frame, text="Select All", 
                                   command=lambda: select_all_files(dup_tree))
     select_all_button.pack(side='left', padx=5)
@@ -109,6 +103,55 @@ def setup_cleanup_tab(frame):
     # Bind Ctrl+A for select all
     dup_tree.bind('<Control-a>', lambda e: select_all_files(dup_tree))
 
+    # Application Caches section
+    cache_frame = ttk.LabelFrame(frame, text="Application Caches", padding=10)
+    cache_frame.grid(row=2, column=0, columnspan=4, sticky='nsew', padx=10, pady=5)
+
+    # One row per app_cache target; 'Bytes' holds the exact size and is not displayed
+    cache_tree = ttk.Treeview(cache_frame, columns=('Size', 'Files', 'Safety', 'Sized', 'Bytes'),
+                              displaycolumns=('Size', 'Files', 'Safety', 'Sized'),
+                              selectmode='extended', height=6)
+    cache_tree.grid(row=0, column=0, columnspan=3, sticky='nsew', padx=10, pady=5)
+    cache_tree.heading('#0', text='Target')
+    cache_tree.heading('Size', text='Size (MB)')
+    cache_tree.heading('Files', text='Files')
+    cache_tree.heading('Safety', text='Safety')
+    cache_tree.heading('Sized', text='Sized')
+    cache_tree.column('Size', width=100)
+    cache_tree.column('Files', width=80)
+    cache_tree.column('Safety', width=80)
+    cache_tree.column('Sized', width=120)
+
+    cache_status = ttk.Label(cache_frame, text="Selected: 0.00 MB")
+    cache_status.grid(row=1, column=0, padx=10, pady=5, sticky='w')
+    cache_btn_frame = ttk.Frame(cache_frame)
+    cache_btn_frame.grid(row=1, column=1, columnspan=2, pady=5, sticky='e')
+    cache_low_impact = tk.BooleanVar(value=False)
+    ttk.Checkbutton(cache_btn_frame, text="Low impact", variable=cache_low_impact).pack(side='left', padx=5)
+    rescan_cache_button = ttk.Button(cache_btn_frame, text="Rescan",
+                                     command=lambda: size_app_caches(cache_tree, cache_status, rescan_cache_button,
+                                                                     cache_low_impact.get()))
+    rescan_cache_button.pack(side='left', padx=5)
+    clean_cache_button = ttk.Button(cache_btn_frame, text="Clean Selected",
+                                    command=lambda: clean_app_caches(cache_tree, cache_status, clean_cache_button,
+                                                                     cache_low_impact.get()))
+    clean_cache_button.pack(side='left', padx=5)
+    ttk.Button(cache_btn_frame, text="Cancel",
+               command=lambda: [get_scheduler().cancel(key) for key in ('caches.size', 'caches.clean')]
+               ).pack(side='left', padx=5)
+    cache_tree.bind('<<TreeviewSelect>>', lambda e: _show_cache_selection(cache_tree, cache_status))
+
+    # Show the cached sizes at once. Sizing walks ~ and /var/log, so it only
+    # runs when asked for with Rescan; old sizes are marked stale.
+    cached = app_cache.load_sizes()
+    for target in app_cache.TARGETS:
+        cache_tree.insert('', 'end', iid=target.name, text=target.title,
+                          values=('', '', target.safety, 'Never', 0))
+        if target.name in cached:
+            _show_cache_size(cache_tree, target.name, cached[target.name]['bytes'],
+                             cached[target.name]['files'], cached[target.name]['sized_at'])
+    cache_tree.selection_set([t.name for t in app_cache.TARGETS if t.safety == app_cache.SAFE])
+
 def select_all_files(tree):
     """Select all files in the tree view."""
     tree.selection_set(tree.get_children())
@@ -116,49 +159,147 @@ def select_all_files(tree):
         for child in tree.get_children(parent):
             tree.selection_add(child)
 
+def _enable(button):
+    return lambda job: button.config(state='normal')
+
+def _clear_tree(tree):
+    for item in tree.get_children():
+        tree.delete(item)
+
+def _stop_watching():
+    watcher = _live.pop('dups', None)
+    if watcher:
+        watcher.stop()
+
 def scan_temp_files(temp_size_label, scan_button):
     scan_button.config(state='disabled')
-    temp_dir = os.path.join(os.environ.get('TEMP', '/tmp') if os.name == 'nt' else '/tmp')
-    total_size = 0
-    if os.path.exists(temp_dir):
-        for root, _, files in os.walk(temp_dir):
-            for file in files:
-                try:
-                    total_size += os.path.getsize(os.path.join(root, file))
-                except PermissionError:
-                    messagebox.showwarning("Permission Denied", 
-                        f"Cannot access some temporary files.\nSkipping inaccessible files.")
-                except Exception as e:
-                    messagebox.showwarning("Error", 
-                        f"Error accessing files: {str(e)}\nSkipping problematic files.")
-    temp_size_label.config(text=f"Size: {total_size / (1024*1024):.2f} MB")
-    scan_button.config(state='normal')
+
+    def show_size(job):
+        total_size, errors = job.result
+        temp_size_label.config(text=f"Size: {total_size / (1024*1024):.2f} MB")
+        if errors:
+            messagebox.showwarning("Permission Denied", 
+                f"Cannot access some temporary files.\nSkipped {len(errors)} inaccessible files.")
+
+    get_scheduler().submit('scan_temp_files',
+                           lambda job: engine.scan_temp_files(metrics=job.metrics, cancel=job.token),
+                           key='temp.scan', params=(), on_done=show_size, on_finish=_enable(scan_button))
 
 def delete_temp_files(temp_size_label, delete_button):
     delete_button.config(state='disabled')
-    temp_dir = os.path.join(os.environ.get('TEMP', '/tmp') if os.name == 'nt' else '/tmp')
-    skipped_files = []
-    
-    if os.path.exists(temp_dir):
-        for root, _, files in os.walk(temp_dir):
-            for file in files:
-                file_path = os.path.join(root, file)
-                try:
-                    send2trash.send2trash(file_path)
-                except PermissionError:
-                    skipped_files.append(file_path)
-                except Exception as e:
-                    messagebox.showwarning("Error", 
-                        f"Failed to delete {file_path}: {str(e)}")
-    
-    if skipped_files:
-        messagebox.showwarning("Permission Denied",
-            "The following files could not be deleted due to insufficient permissions:\n" +
-            "\n".join(skipped_files[:5]) +
-            ("\n..." if len(skipped_files) > 5 else ""))
-    
-    scan_temp_files(temp_size_label, delete_button)
-    delete_button.config(state='normal')
+
+    def delete_and_rescan(job):
+        _, failed = engine.delete_temp_files(cancel=job.token)
+        return failed, engine.scan_temp_files(metrics=job.metrics, cancel=job.token)
+
+    def show_result(job):
+        failed, (total_size, _) = job.result
+        temp_size_label.config(text=f"Size: {total_size / (1024*1024):.2f} MB")
+        if failed:
+            messagebox.showwarning("Permission Denied",
+                "The following files could not be deleted:\n" + _format_errors(failed))
+
+    get_scheduler().submit('delete_temp_files', delete_and_rescan, key='temp.delete',
+                           on_done=show_result, on_error=_show_job_error,
+                           on_finish=_enable(delete_button))
+
+def _show_job_error(job):
+    messagebox.showerror("Error", f"{job.name} failed: {str(job.error)}")
+
+def _sized_ago(sized_at):
+    minutes = int((time.time() - sized_at) // 60)
+    if minutes < 1:
+        return "Just now"
+    if minutes < 60:
+        return f"{minutes} min ago"
+    if minutes < 48 * 60:
+        return f"{minutes // 60} h ago"
+    return f"{minutes // (24 * 60)} days ago"
+
+def _show_cache_size(cache_tree, name, total, files, sized_at):
+    values = list(cache_tree.item(name, 'values'))
+    sized = _sized_ago(sized_at)
+    if time.time() - sized_at > app_cache.SIZE_TTL:
+        sized += " (stale)"
+    cache_tree.item(name, values=(f"{total / (1024*1024):.2f}", files, values[2], sized, total))
+
+def _show_cache_selection(cache_tree, cache_status):
+    total = sum(int(cache_tree.item(name, 'values')[4] or 0) for name in cache_tree.selection())
+    cache_status.config(text=f"Selected: {total / (1024*1024):.2f} MB")
+
+def size_app_caches(cache_tree, cache_status, rescan_button, background=False):
+    """Size every cache target concurrently, filling in rows as they finish."""
+    rescan_button.config(state='disabled')
+    scheduler = get_scheduler()
+
+    def show_size(name, total, files):
+        _show_cache_size(cache_tree, name, total, files, time.time())
+        _show_cache_selection(cache_tree, cache_status)
+
+    def size(job):
+        sizes, errors = app_cache.size_targets(
+            metrics=job.metrics, cancel=job.token, throttle=job.throttle,
+            on_sized=lambda *args: scheduler.call_in_ui(show_size, *args))
+        app_cache.save_sizes(sizes)
+        return errors
+
+    def show_errors(job):
+        if job.result:
+            cache_status.config(text=f"{cache_status.cget('text')} "
+                                     f"({len(job.result)} paths could not be read)")
+
+    # A rescan supersedes a sizing already under way (e.g. a low impact one)
+    scheduler.submit('size_app_caches', size, key='caches.size', params=(), replace=True,
+                     background=background,
+                     on_done=show_errors, on_error=_show_job_error,
+                     on_finish=_enable(rescan_button))
+
+def clean_app_caches(cache_tree, cache_status, clean_button, background=False):
+    """Delete the files of the selected cache targets in one job."""
+    targets = [app_cache.get_target(name) for name in cache_tree.selection()]
+    if not targets:
+        messagebox.showwarning("Warning", "Please select the caches to clean")
+        return
+    total = sum(int(cache_tree.item(t.name, 'values')[4] or 0) for t in targets)
+    message = (f"Permanently delete {total / (1024*1024):.2f} MB from:\n" +
+               "\n".join(t.title for t in targets))
+    caution = [t.title for t in targets if t.safety != app_cache.SAFE]
+    if caution:
+        message += ("\n\nLogs and crash dumps may still be needed for troubleshooting:\n" +
+                    "\n".join(caution))
+    if not messagebox.askyesno("Confirm", message + "\n\nThis action cannot be undone."):
+        return
+    clean_button.config(state='disabled')
+
+    def clean(job):
+        cleaned, failed = app_cache.clean_targets(targets, job.metrics, job.token, job.throttle)
+        # Whatever the filters kept is the new size
+        sizes, _ = app_cache.size_targets(targets, cancel=job.token, throttle=job.throttle)
+        app_cache.save_sizes(sizes)
+        return cleaned, failed, sizes
+
+    def show_result(job):
+        cleaned, failed, sizes = job.result
+        now = time.time()
+        for name, (size, files) in sizes.items():
+            _show_cache_size(cache_tree, name, size, files, now)
+        _show_cache_selection(cache_tree, cache_status)
+        freed = sum(freed for freed, _ in cleaned.values())
+        messagebox.showinfo("Cleaned", f"Freed {freed / (1024*1024):.2f} MB")
+        if failed:
+            messagebox.showwarning("Permission Denied",
+                "The following files could not be deleted:\n" + _format_errors(failed))
+
+    get_scheduler().submit('clean_app_caches', clean, key='caches.clean', background=background,
+                           on_done=show_result, on_error=_show_job_error,
+                           on_finish=_enable(clean_button))
+
+def cancel_dup_jobs():
+    """Cancel any running duplicate, similar-image or same-name scan."""
+    _stop_watching()
+    scheduler = get_scheduler()
+    for key in ('dups.scan', 'dups.similar', 'dups.partial', 'dups.same_name', 'dups.dedupe'):
+        scheduler.cancel(key)
 
 def browse_dup_dir(dup_dir_entry):
     dir_path = tk.filedialog.askdirectory()
@@ -167,47 +308,24 @@ def browse_dup_dir(dup_dir_entry):
         dup_dir_entry.insert(0, dir_path)
         messagebox.showinfo("Selected", f"Selected directory: {dir_path}")
 
-def scan_dup_files(dup_dir_entry, dup_tree, scan_dup_button):
-    scan_dup_button.config(state='disabled')
+def _valid_dir(dup_dir_entry):
     dir_path = dup_dir_entry.get()
     if not dir_path or not os.path.exists(dir_path):
         messagebox.showerror("Error", "Please select a valid directory.")
-        scan_dup_button.config(state='normal')
-        return
-
-    for item in dup_tree.get_children():
-        dup_tree.delete(item)
-
-    # Collect all files
-    all_files = []
-    inaccessible_files = []
-    for root, _, files in os.walk(dir_path):
-        for file in files:
-            file_path = os.path.join(root, file)
-            try:
-                file_size = os.path.getsize(file_path)
-                file_hash = calculate_file_hash(file_path)
-                if file_hash:  # Only add if hash calculation succeeded
-                    all_files.append((file_path, file_size, file_hash))
-            except PermissionError:
-                inaccessible_files.append(file_path)
-            except Exception as e:
-                messagebox.showwarning("Error", 
-                    f"Error processing {file_path}: {str(e)}")
+        return None
+    return dir_path
 
-    # Group by hash
-    hash_groups = defaultdict(list)
-    for file_path, size, file_hash in all_files:
-        hash_groups[file_hash].append((file_path, size))
+def _show_dup_groups(dup_tree, hash_groups, inaccessible_files):
+    _clear_tree(dup_tree)
 
     # Display duplicates
     for file_hash, files in hash_groups.items():
-        if len(files) > 1:
-            parent = dup_tree.insert('', 'end', text=f"Hash: {file_hash[:8]}...", 
-                                   values=('', file_hash, ''))
-            for file_path, size in files:
-                dup_tree.insert(parent, 'end', text=file_path, 
-                              values=(f"{size / (1024*1024):.2f}", file_hash, 'Accessible'))
+        parent = dup_tree.insert('', 'end', text=f"Hash: {file_hash[:8]}...", 
+                               values=('', file_hash, ''))
+        for file_path, size, mtime_ns in files:
+            dup_tree.insert(parent, 'end', text=file_path, 
+                          values=(f"{size / (1024*1024):.2f}", file_hash, 'Accessible',
+                                  size, mtime_ns))
 
     if inaccessible_files:
         parent = dup_tree.insert('', 'end', text="Inaccessible Files", 
@@ -216,7 +334,169 @@ def scan_dup_files(dup_dir_entry, dup_tree, scan_dup_button):
             dup_tree.insert(parent, 'end', text=file_path, 
                           values=('N/A', 'N/A', 'Permission Denied'))
 
-    scan_dup_button.config(state='normal')
+def scan_dup_files(dup_dir_entry, dup_tree, scan_dup_button, background=False, live=False):
+    dir_path = _valid_dir(dup_dir_entry)
+    if not dir_path:
+        return
+    scan_dup_button.config(state='disabled')
+    _stop_watching()
+
+    def scan(job):
+        cache = engine.open_hash_cache()
+        try:
+            if not live:
+                return engine.scan_duplicates(dir_path, cache, job.metrics, job.token, job.throttle)
+
+            from watcher import Watcher, DuplicateIndex
+
+            def apply_changes(batch):
+                batch_job = metrics.new_job('watch.duplicates', profile=False).start()
+                batch_cache = engine.open_hash_cache()
+                try:
+                    # Files still being written are hashed once they settle
+                    watcher.recheck(index.apply(batch, batch_job, batch_cache))
+                finally:
+                    if batch_cache:
+                        batch_cache.close()
+                    batch_job.finish()
+                get_scheduler().call_in_ui(show_live_update, watcher, index.groups(), inaccessible)
+
+            # Start watching before the walk so changes made during it are not lost
+            watcher = Watcher(dir_path, apply_changes).open(job.token, job.throttle)
+            try:
+                index, inaccessible, errors = DuplicateIndex.scan(dir_path, cache, job.metrics,
+                                                                  job.token, job.throttle)
+            except BaseException:
+                watcher.stop()
+                raise
+            _live['dups'] = watcher.start()
+            return index.groups(), inaccessible, errors
+        finally:
+            if cache:
+                cache.close()
+
+    def show_groups(job):
+        hash_groups, inaccessible_files, errors = job.result
+        _show_dup_groups(dup_tree, hash_groups, inaccessible_files)
+        if errors:
+            messagebox.showwarning("Error", "Some files could not be processed:\n" + _format_errors(errors))
+
+    def show_live_update(watcher, hash_groups, inaccessible):
+        # Ignore batches from a watcher stopped or replaced since they were applied
+        if _live.get('dups') is watcher:
+            _show_dup_groups(dup_tree, hash_groups, inaccessible)
+
+    get_scheduler().submit('scan_dup_files', scan, key='dups.scan', params=(dir_path, live),
+                           replace=True, background=background,
+                           on_done=show_groups,
+                           on_error=_show_job_error, on_finish=_enable(scan_dup_button))
+
+def scan_similar_images(dup_dir_entry, dup_tree, similar_button, background=False):
+    """Group resized or re-encoded copies of the same image by perceptual hash."""
+    dir_path = _valid_dir(dup_dir_entry)
+    if not dir_path:
+        return
+    similar_button.config(state='disabled')
+
+    def scan(job):
+        cache = engine.open_hash_cache()
+        try:
+            return engine.scan_similar_images(dir_path, cache=cache, metrics=job.metrics,
+                                              cancel=job.token, throttle=job.throttle)
+        finally:
+            if cache:
+                cache.close()
+
+    def show_groups(job):
+        groups, failed = job.result
+        _stop_watching()  # the view no longer shows duplicate groups
+        _clear_tree(dup_tree)
+        for group in groups:
+            parent = dup_tree.insert('', 'end', text=f"Similar: {len(group)} images",
+                                   values=('', f"{group[0][3]:016x}", ''))
+            for file_path, size, mtime_ns, image_hash in group:
+                dup_tree.insert(parent, 'end', text=file_path,
+                              values=(f"{size / (1024*1024):.2f}", f"{image_hash:016x}",
+                                      'Accessible', size, mtime_ns))
+
+        if failed:
+            parent = dup_tree.insert('', 'end', text="Unreadable Images",
+                                   values=('', '', 'Unreadable'))
+            for file_path in failed:
+                dup_tree.insert(parent, 'end', text=file_path,
+                              values=('N/A', 'N/A', 'Unreadable'))
+
+    def show_error(job):
+        if isinstance(job.error, ImportError):
+            messagebox.showerror("Missing Dependency",
+                f"Similar image detection requires numpy and Pillow: {str(job.error)}")
+        else:
+            _show_job_error(job)
+
+    get_scheduler().submit('scan_similar_images', scan, key='dups.similar', params=(dir_path,),
+                           replace=True, background=background,
+                           on_done=show_groups,
+                           on_error=show_error, on_finish=_enable(similar_button))
+
+def scan_partial_duplicates(dup_dir_entry, dup_tree, partial_button, background=False):
+    """Show how many bytes large files share, by content-defined chunks."""
+    dir_path = _valid_dir(dup_dir_entry)
+    if not dir_path:
+        return
+    partial_button.config(state='disabled')
+
+    def scan(job):
+        index = engine.open_chunk_index()
+        try:
+            return engine.scan_partial_duplicates(dir_path, index=index, metrics=job.metrics,
+                                                  cancel=job.token, throttle=job.throttle)
+        finally:
+            if index:
+                index.close()
+
+    def show_report(job):
+        report, errors = job.result
+        _stop_watching()  # the view no longer shows duplicate groups
+        _clear_tree(dup_tree)
+        total = report['total_bytes']
+        percent = 100 * report['savings'] / total if total else 0
+        dup_tree.insert('', 'end',
+                        text=f"Achievable savings: {report['savings'] / (1024*1024):.2f} MB "
+                             f"of {total / (1024*1024):.2f} MB in {report['files']} files",
+                        values=(f"{report['savings'] / (1024*1024):.2f}", f"{percent:.1f}% saved", ''))
+
+        for path_a, path_b, shared in report['pairs']:
+            parent = dup_tree.insert('', 'end', text=f"Shared: {shared / (1024*1024):.2f} MB",
+                                   values=(f"{shared / (1024*1024):.2f}", '', 'Partial'))
+            for file_path in (path_a, path_b):
+                try:
+                    size = os.path.getsize(file_path)
+                    values = (f"{size / (1024*1024):.2f}", _shared_percent(shared, size),
+                              'Accessible')
+                except OSError:
+                    values = ('N/A', '', 'Missing')
+                dup_tree.insert(parent, 'end', text=file_path, values=values)
+
+        if report['directories']:
+            parent = dup_tree.insert('', 'end', text="Directories", values=('', '', ''))
+            for directory, shared, dir_total in report['directories']:
+                dup_tree.insert(parent, 'end', text=directory,
+                              values=(f"{shared / (1024*1024):.2f}",
+                                      _shared_percent(shared, dir_total), 'Directory'))
+        if errors:
+            messagebox.showwarning("Error", "Some files could not be processed:\n" + _format_errors(errors))
+
+    def show_error(job):
+        if isinstance(job.error, ImportError):
+            messagebox.showerror("Missing Dependency",
+                f"Partial duplicate detection requires numpy: {str(job.error)}")
+        else:
+            _show_job_error(job)
+
+    get_scheduler().submit('scan_partial_duplicates', scan, key='dups.partial', params=(dir_path,),
+                           replace=True, background=background,
+                           on_done=show_report,
+                           on_error=show_error, on_finish=_enable(partial_button))
 
 def find_same_name_matches(dup_dir_entry, dup_tree):
     selected = dup_tree.selection()
@@ -224,9 +504,8 @@ def find_same_name_matches(dup_dir_entry, dup_tree):
         messagebox.showwarning("Warning", "Please select a file first")
         return
 
-    dir_path = dup_dir_entry.get()
-    if not dir_path or not os.path.exists(dir_path):
-        messagebox.showerror("Error", "Please select a valid directory.")
+    dir_path = _valid_dir(dup_dir_entry)
+    if not dir_path:
         return
 
     file_path = dup_tree.item(selected[0], 'text')
@@ -235,29 +514,35 @@ def find_same_name_matches(dup_dir_entry, dup_tree):
         return
 
     filename = os.path.basename(file_path)
-    same_name_files = find_same_name_files(dir_path, filename)
 
-    # Clear existing items and show same-name files
-    for item in dup_tree.get_children():
-        dup_tree.delete(item)
+    def scan(job):
+        same_name_files, inaccessible = engine.find_same_name_files(dir_path, filename, job.token)
+        rows = []
+        for path in same_name_files:
+            job.token.check()
+            try:
+                size = os.path.getsize(path)
+                file_hash = engine.calculate_file_hash(path, metrics=job.metrics)
+                rows.append((path, (f"{size / (1024*1024):.2f}", file_hash, 'Accessible')))
+            except PermissionError:
+                rows.append((path, ('N/A', 'N/A', 'Permission Denied')))
+            except Exception as e:
+                rows.append((path, ('N/A', 'N/A', f'Error: {str(e)}')))
+        rows.extend((path, ('N/A', 'N/A', 'Permission Denied')) for path in inaccessible)
+        return rows
 
-    parent = dup_tree.insert('', 'end', text=f"Files named: {filename}", 
-                           values=('', '', ''))
-    for path in same_name_files:
-        try:
-            size = os.path.getsize(path)
-            file_hash = calculate_file_hash(path)
-            status = 'Accessible' if file_hash else 'Permission Denied'
-            dup_tree.insert(parent, 'end', text=path, 
-                          values=(f"{size / (1024*1024):.2f}", 
-                                 file_hash if file_hash else 'N/A',
-                                 status))
-        except PermissionError:
-            dup_tree.insert(parent, 'end', text=path, 
-                          values=('N/A', 'N/A', 'Permission Denied'))
-        except Exception as e:
-            dup_tree.insert(parent, 'end', text=path, 
-                          values=('N/A', 'N/A', f'Error: {str(e)}'))
+    def show_matches(job):
+        # Clear existing items and show same-name files
+        _stop_watching()  # the view no longer shows duplicate groups
+        _clear_tree(dup_tree)
+        parent = dup_tree.insert('', 'end', text=f"Files named: {filename}", 
+                               values=('', '', ''))
+        for path, values in job.result:
+            dup_tree.insert(parent, 'end', text=path, values=values)
+
+    get_scheduler().submit('find_same_name_files', scan, key='dups.same_name',
+                           params=(dir_path, filename), replace=True,
+                           on_done=show_matches, on_error=_show_job_error)
 
 def delete_selected_files(dup_tree):
     selected = dup_tree.selection()
@@ -279,17 +564,83 @@ def delete_selected_files(dup_tree):
         return
 
     if messagebox.askyesno("Confirm", "Delete selected files? This action cannot be undone."):
-        for item in selected:
-            file_path = dup_tree.item(item, 'text')
-            if os.path.exists(file_path):
+        items = {dup_tree.item(item, 'text'): item for item in selected
+                 if os.path.isfile(dup_tree.item(item, 'text'))}
+        deleted, failed = engine.trash_files(list(items))
+        for file_path in deleted:
+            dup_tree.delete(items[file_path])
+        if failed:
+            messagebox.showerror("Error", "Failed to delete some files:\n" + _format_errors(failed))
+
+def _shared_percent(shared, total):
+    # A file may have been truncated to zero bytes since it was chunked
+    return f"{100 * shared / total:.1f}% shared" if total else ''
+
+def dedupe_selected_groups(dup_tree, dedupe_button):
+    """Replace duplicates in the selected hash groups with links to one copy."""
+    groups = []
+    for item in dup_tree.selection():
+        parent = dup_tree.parent(item) or item
+        if parent not in groups and dup_tree.item(parent, 'text').startswith("Hash: "):
+            groups.append(parent)
+    if not groups:
+        messagebox.showwarning("Warning", "Please select a duplicate group or one of its files")
+        return
+
+    if not messagebox.askyesno("Confirm",
+            f"Replace redundant copies in {len(groups)} group(s) with links to a single copy?\n"
+            "All paths remain valid, but the copies will share the same contents."):
+        return
+    dedupe_button.config(state='disabled')
+
+    # Read the scan-time stats on the UI thread; the worker only sees plain data
+    group_files = []
+    for parent in groups:
+        files = []
+        for child in dup_tree.get_children(parent):
+            values = dup_tree.item(child, 'values')
+            files.append((dup_tree.item(child, 'text'), int(values[3]), int(values[4])))
+        group_files.append((parent, tuple(files)))
+
+    def dedupe(job):
+        results = []
+        for parent, files in group_files:
+            deduplicated, failed, reclaimed = engine.deduplicate_files(files, cancel=job.token)
+            # A hardlink takes the kept file's mtime; later dedupes compare against it
+            mtimes = {}
+            for path, _ in deduplicated:
                 try:
-                    # Normalize the path to handle special characters
-                    normalized_path = os.path.normpath(file_path)
-                    send2trash.send2trash(normalized_path)
-                    dup_tree.delete(item)
-                except PermissionError:
-                    messagebox.showerror("Permission Denied", 
-                        f"Cannot delete {file_path}\nPlease check file permissions.")
-                except Exception as e:
-                    messagebox.showerror("Error", 
-                        f"Failed to delete {file_path}: {str(e)}")
\ No newline at end of file
+                    mtimes[path] = os.stat(path).st_mtime_ns
+                except OSError:
+                    pass
+            results.append((parent, deduplicated, failed, reclaimed, mtimes))
+        return results
+
+    def show_result(job):
+        total_reclaimed = 0
+        all_failed = []
+        for parent, deduplicated, failed, reclaimed, mtimes in job.result:
+            total_reclaimed += reclaimed
+            all_failed.extend(failed)
+            if not dup_tree.exists(parent):
+                continue  # redrawn by a live update, which already shows the links
+            linked = dict(deduplicated)
+            for child in dup_tree.get_children(parent):
+                path = dup_tree.item(child, 'text')
+                if path in linked:
+                    values = list(dup_tree.item(child, 'values'))
+                    values[2] = linked[path].capitalize()
+                    if path in mtimes:
+                        values[4] = mtimes[path]
+                    dup_tree.item(child, values=values)
+
+        messagebox.showinfo("Deduplicated",
+            f"Reclaimed {total_reclaimed / (1024*1024):.2f} MB")
+        if all_failed:
+            messagebox.showwarning("Skipped",
+                "Some files were not deduplicated:\n" + _format_errors(all_failed))
+
+    get_scheduler().submit('deduplicate_files', dedupe, key='dups.dedupe',
+                           params=tuple(files for _, files in group_files),
+                           priority=PRIORITY_HIGH, on_done=show_result,
+                           on_error=_show_job_error, on_finish=_enable(dedupe_button))
@@ -0,0 +1,353 @@
+"""Command-line interface to the cleanup engine.
+
+Runs without Tk or matplotlib, e.g. from cron on a headless server:
+
+    python -m cli storage /home
+    python -m cli --format ndjson dups ~/Pictures
+    python -m cli temp --delete
+    python -m cli bin list
+    python -m cli --background --bytes-per-s 10M dups /srv
+    python -m cli dups /srv --export srv.table && python -m cli query srv.table --duplicates
+    python -m cli dups /var/lib/libvirt/images --partial
+    python -m cli caches --clean pip npm pycache --dry-run
+
+Exit codes: 0 on success, 1 if some files could not be processed,
+2 on invalid usage or arguments, 3 if the command could not run at all
+(e.g. a missing optional dependency).
+"""
+import argparse
+import json
+import os
+import sys
+import app_cache
+import engine
+import metrics
+import throttle
+from columnar import FileTable, open_table
+
+EXIT_OK = 0
+EXIT_PARTIAL = 1
+EXIT_USAGE = 2
+EXIT_FAILURE = 3
+
+class Output:
+    """Writes records as one JSON document or as NDJSON lines.
+
+    In ndjson mode every record is flushed as soon as it is emitted; in json
+    mode records are collected and written as a single object on close.
+    """
+
+    def __init__(self, fmt, stream=sys.stdout):
+        self.fmt = fmt
+        self.stream = stream
+        self.records = []
+        self.error_count = 0
+
+    def emit(self, record):
+        if self.fmt == 'ndjson':
+            self.stream.write(json.dumps(record) + "\n")
+            self.stream.flush()
+        else:
+            self.records.append(record)
+
+    def errors(self, errors):
+        for path, error in errors:
+            self.error_count += 1
+            self.emit({'type': 'error', 'path': path, 'error': error})
+
+    def close(self, summary):
+        if self.fmt == 'ndjson':
+            self.emit(dict(summary, type='summary'))
+        else:
+            json.dump(dict(summary, records=self.records), self.stream, indent=2)
+            self.stream.write("\n")
+        return EXIT_PARTIAL if self.error_count else EXIT_OK
+
+def cmd_storage(args, out):
+    path = args.path or engine.default_scan_root()
+    categories = engine.scan_directory(path, metrics=args.metrics, throttle=args.throttle)
+    total = sum(categories.values())
+    for category, size in sorted(categories.items(), key=lambda x: x[1], reverse=True):
+        out.emit({'type': 'category', 'category': category, 'size': size})
+    return out.close({'path': path, 'total_size': total})
+
+def cmd_dups(args, out):
+    cache = None if args.no_cache else engine.open_hash_cache()
+    try:
+        if args.similar:
+            groups, failed = engine.scan_similar_images(
+                args.path, args.threshold, args.method, cache, args.metrics,
+                throttle=args.throttle)
+            for group in groups:
+                out.emit({'type': 'similar_group', 'files': [
+                    {'path': path, 'size': size, 'hash': f"{h:016x}"}
+                    for path, size, _, h in group]})
+            out.errors((path, "Unreadable image") for path in failed)
+            return out.close({'path': args.path, 'groups': len(groups)})
+
+        if args.partial:
+            index = None if args.no_cache else engine.open_chunk_index()
+            try:
+                report, errors = engine.scan_partial_duplicates(
+                    args.path, args.min_size, index, args.max_pairs, args.metrics,
+                    throttle=args.throttle)
+            finally:
+                if index:
+                    index.close()
+            for path_a, path_b, shared in report['pairs']:
+                out.emit({'type': 'shared_pair', 'files': [path_a, path_b], 'shared_bytes': shared})
+            for directory, shared, total in report['directories']:
+                out.emit({'type': 'shared_directory', 'path': directory, 'shared_bytes': shared,
+                          'total_bytes': total})
+            out.errors(errors)
+            return out.close({'path': args.path, 'files': report['files'],
+                              'total_bytes': report['total_bytes'],
+                              'unique_bytes': report['unique_bytes'],
+                              'savings_bytes': report['savings']})
+
+        table = FileTable(digest_size=32) if args.export else None
+        groups, inaccessible, errors = engine.scan_duplicates(args.path, cache, args.metrics,
+                                                              throttle=args.throttle, table=table)
+        if table is not None:
+            table.save(args.export)
+    finally:
+        if cache:
+            cache.close()
+
+    reclaimable = 0
+    reclaimed = 0
+    for digest, files in groups.items():
+        record = {'type': 'duplicate_group', 'hash': digest,
+                  'files': [{'path': path, 'size': size} for path, size, _ in files]}
+        reclaimable += engine.reclaimable_bytes(files)
+        if args.dedupe:
+            deduplicated, failed, group_reclaimed = engine.deduplicate_files(files, args.dedupe)
+            record['linked'] = [{'path': path, 'method': method} for path, method in deduplicated]
+            reclaimed += group_reclaimed
+            out.errors(failed)
+        out.emit(record)
+    out.errors((path, "Permission denied") for path in inaccessible)
+    out.errors(errors)
+
+    summary = {'path': args.path, 'groups': len(groups), 'reclaimable_bytes': reclaimable}
+    if args.dedupe:
+        summary['reclaimed_bytes'] = reclaimed
+    return out.close(summary)
+
+def cmd_query(args, out):
+    try:
+        table = open_table(args.table)
+    except ValueError as e:
+        raise OSError(str(e))
+    with table:
+        if args.duplicates:
+            rows = None
+            if args.min_size is not None or args.under or args.digest:
+                candidates = table.find_digest(args.digest) if args.digest else None
+                rows = set(table.select(args.min_size, args.under, candidates))
+            for digest, files in table.duplicate_groups(rows).items():
+                out.emit({'type': 'duplicate_group', 'hash': digest,
+                          'files': [{'path': path, 'size': size} for path, size, _ in files]})
+        else:
+            candidates = table.find_digest(args.digest) if args.digest else None
+            for i in table.select(args.min_size, args.under, candidates):
+                path, size, mtime_ns, inode, digest = table.row(i)
+                out.emit({'type': 'file', 'path': path, 'size': size, 'mtime_ns': mtime_ns,
+                          'inode': inode, 'hash': digest})
+        return out.close({'table': args.table, 'rows': len(table),
+                          'directories': table.directory_count()})
+
+def cmd_temp(args, out):
+    temp_dir = args.dir or engine.get_temp_dir()
+    if args.delete:
+        deleted, failed = engine.delete_temp_files(temp_dir)
+        for path in deleted:
+            out.emit({'type': 'deleted', 'path': path})
+        out.errors(failed)
+    total_size, errors = engine.scan_temp_files(temp_dir, args.metrics, throttle=args.throttle)
+    out.errors(errors)
+    return out.close({'path': temp_dir, 'total_size': total_size})
+
+def cmd_caches(args, out):
+    if args.clean is not None:
+        names = args.clean or [t.name for t in app_cache.TARGETS if t.safety == app_cache.SAFE]
+        targets = [app_cache.get_target(name) for name in names]
+        cleaned, failed = app_cache.clean_targets(targets, args.metrics, throttle=args.throttle,
+                                                  dry_run=args.dry_run)
+        if args.dry_run:
+            for name, (size, files) in cleaned.items():
+                out.emit({'type': 'would_clean', 'target': name, 'size': size, 'files': files})
+            out.errors(failed)
+            return out.close({'dry_run': True,
+                              'total_size': sum(size for size, _ in cleaned.values())})
+        for name, (freed, removed) in cleaned.items():
+            out.emit({'type': 'cleaned', 'target': name, 'freed_bytes': freed, 'files': removed})
+        out.errors(failed)
+    else:
+        targets = app_cache.TARGETS
+    sizes, errors = app_cache.size_targets(targets, args.metrics, throttle=args.throttle)
+    app_cache.save_sizes(sizes)
+    for target in targets:
+        size, files = sizes[target.name]
+        out.emit({'type': 'target', 'target': target.name, 'title': target.title,
+                  'safety': target.safety, 'size': size, 'files': files})
+    if args.clean is None:
+        out.errors(errors)
+    return out.close({'total_size': sum(size for size, _ in sizes.values())})
+
+def cmd_bin(args, out):
+    recycle_bin = engine.RecycleBin(args.metrics)
+    if args.action == 'list':
+        for bin_name, info in recycle_bin.get_bin_contents().items():
+            out.emit({'type': 'bin_item', 'bin_name': bin_name,
+                      'original_path': info['original_path'],
+                      'deleted_date': info['deleted_date'],
+                      'size': info['size'],
+                      'is_directory': info.get('is_directory', False)})
+        return out.close({'bin_dir': recycle_bin.bin_dir})
+
+    if args.action == 'restore':
+        for bin_name in args.names:
+            try:
+                recycle_bin.restore_file(bin_name, custom_path=args.to)
+                out.emit({'type': 'restored', 'bin_name': bin_name})
+            except Exception as e:
+                out.errors([(bin_name, str(e))])
+        return out.close({'bin_dir': recycle_bin.bin_dir})
+
+    deleted, failed = recycle_bin.permanently_delete(args.names)
+    for bin_name in deleted:
+        out.emit({'type': 'deleted', 'bin_name': bin_name})
+    out.errors(failed)
+    return out.close({'bin_dir': recycle_bin.bin_dir})
+
+def parse_rate(text):
+    """Parse a rate such as 500, 64K or 10M (binary multiples); 0 means unlimited."""
+    multiplier = {'K': 1 << 10, 'M': 1 << 20, 'G': 1 << 30}.get(text[-1:].upper())
+    try:
+        value = float(text[:-1] if multiplier else text) * (multiplier or 1)
+    except ValueError:
+        raise argparse.ArgumentTypeError(f"invalid rate: {text}")
+    if value < 0:
+        raise argparse.ArgumentTypeError(f"invalid rate: {text}")
+    return value
+
+def build_parser():
+    parser = argparse.ArgumentParser(prog='python -m cli', description="Smart System Cleaner (headless)")
+    parser.add_argument('--format', choices=('json', 'ndjson'), default='json',
+                        help="json writes one document at the end; ndjson streams one record per line")
+    parser.add_argument('--metrics', metavar='FILE',
+                        help="Append the job's counters, phase times and latencies to FILE as NDJSON")
+    parser.add_argument('--profile', choices=('cprofile', 'sample'),
+                        help="Profile the job with cProfile or a stack sampler")
+    parser.add_argument('--profile-output', metavar='FILE',
+                        help="Where to write the profile (default: cli-<command>.prof or .folded)")
+    parser.add_argument('--background', action='store_true',
+                        help="Low-impact mode: lower CPU and I/O priority, rate-limit reads and "
+                             "back off while the system is busy")
+    parser.add_argument('--bytes-per-s', type=parse_rate, metavar='RATE',
+                        help=f"Read/write limit in background mode, e.g. 10M "
+                             f"(default {throttle.bytes_per_s >> 20}M, 0 for none)")
+    parser.add_argument('--files-per-s', type=parse_rate, metavar='RATE',
+                        help=f"File limit in background mode (default {throttle.files_per_s}, 0 for none)")
+    sub = parser.add_subparsers(dest='command', required=True)
+
+    p = sub.add_parser('storage', help="Disk usage by file category")
+    p.add_argument('path', nargs='?', help="Directory to scan (default: filesystem root)")
+    p.set_defaults(func=cmd_storage)
+
+    p = sub.add_parser('dups', help="Find duplicate files")
+    p.add_argument('path')
+    p.add_argument('--similar', action='store_true', help="Find visually similar images instead")
+    p.add_argument('--threshold', type=int, default=4, help="Max Hamming distance for --similar")
+    p.add_argument('--method', choices=('dhash', 'ahash'), default='dhash')
+    p.add_argument('--partial', action='store_true',
+                   help="Report bytes shared by large files that are not identical "
+                        "(content-defined chunks)")
+    p.add_argument('--min-size', type=int,
+                   help="Smallest file for --partial, in bytes (default 1 MiB)")
+    p.add_argument('--max-pairs', type=int, default=100,
+                   help="File pairs to report with --partial")
+    p.add_argument('--dedupe', choices=('auto', 'reflink', 'hardlink'),
+                   help="Replace redundant copies with links in place")
+    p.add_argument('--no-cache', action='store_true', help="Do not read or write the hash cache")
+    p.add_argument('--export', metavar='FILE',
+                   help="Save every hashed file as a columnar table for later queries")
+    p.set_defaults(func=cmd_dups)
+
+    p = sub.add_parser('query', help="Query a table saved with dups --export")
+    p.add_argument('table')
+    p.add_argument('--duplicates', action='store_true',
+                   help="List duplicate groups among the files the other options select")
+    p.add_argument('--digest', help="Files with this SHA256 digest")
+    p.add_argument('--min-size', type=int, help="Files of at least this many bytes")
+    p.add_argument('--under', help="Files inside this directory")
+    p.set_defaults(func=cmd_query)
+
+    p = sub.add_parser('temp', help="Size or delete temporary files")
+    p.add_argument('--dir', help="Temporary directory (default: system temp)")
+    p.add_argument('--delete', action='store_true', help="Send temporary files to the trash")
+    p.set_defaults(func=cmd_temp)
+
+    p = sub.add_parser('caches', help="Size or clean application caches, bytecode, old logs and core dumps")
+    p.add_argument('--clean', nargs='*', metavar='TARGET',
+                   choices=[t.name for t in app_cache.TARGETS],
+                   help="Permanently delete the files of these targets "
+                        "(none named: every safe target, which needs --yes)")
+    p.add_argument('--yes', action='store_true',
+                   help="Confirm --clean without target names")
+    p.add_argument('--dry-run', action='store_true',
+                   help="With --clean, report what would be deleted without deleting it")
+    p.set_defaults(func=cmd_caches)
+
+    p = sub.add_parser('bin', help="Manage the recycle bin")
+    p.add_argument('action', choices=('list', 'restore', 'purge'))
+    p.add_argument('names', nargs='*', help="Bin item names for restore/purge")
+    p.add_argument('--to', help="Custom restore location")
+    p.set_defaults(func=cmd_bin)
+    return parser
+
+def main(argv=None):
+    parser = build_parser()
+    args = parser.parse_args(argv)
+    path = getattr(args, 'path', None)
+    if path and not os.path.isdir(path):
+        parser.error(f"not a directory: {path}")
+    if args.command == 'bin' and args.action != 'list' and not args.names:
+        parser.error(f"bin {args.action} requires at least one item name")
+    if args.command == 'caches':
+        if (args.yes or args.dry_run) and args.clean is None:
+            parser.error("--yes and --dry-run require --clean")
+        if args.clean == [] and not (args.yes or args.dry_run):
+            parser.error("caches --clean with no target names deletes every safe target; "
+                         "name the targets, or pass --yes (or --dry-run to preview)")
+    if (args.bytes_per_s is not None or args.files_per_s is not None) and not args.background:
+        parser.error("--bytes-per-s and --files-per-s require --background")
+    if args.metrics:
+        metrics.collect = True
+        metrics.log_path = args.metrics
+    metrics.profile_next = args.profile
+    args.metrics = metrics.new_job(f"cli.{args.command}").start()
+    args.throttle = throttle.NO_THROTTLE
+    if args.background:
+        if args.bytes_per_s is not None:
+            throttle.bytes_per_s = args.bytes_per_s
+        if args.files_per_s is not None:
+            throttle.files_per_s = args.files_per_s
+        for setting in throttle.lower_priority(process=True):
+            args.metrics.count(f'background.{setting}')
+        args.metrics.count('background')
+        args.throttle = throttle.Throttle.from_settings(args.metrics)
+    try:
+        return args.func(args, Output(args.format))
+    except (ImportError, OSError) as e:
+        print(f"{parser.prog}: error: {e}", file=sys.stderr)
+        return EXIT_FAILURE
+    finally:
+        args.metrics.finish()
+        if args.profile:
+            suffix = '.prof' if args.profile == 'cprofile' else '.folded'
+            args.metrics.dump_profile(args.profile_output or f"cli-{args.command}{suffix}")
+
+if __name__ == '__main__':
+    sys.exit(main())
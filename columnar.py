@@ -0,0 +1,315 @@
+"""Compact columnar storage for per-file scan results.
+
+A FileTable keeps one row per file in flat arrays instead of a Python tuple
+(and strings) per file:
+
+- an interned directory table with the device of each directory, and a
+  32-bit directory id per row;
+- basenames as one UTF-8 blob plus 64-bit offsets;
+- sizes, mtimes (ns) and inodes as array('Q') / array('q') columns;
+- optionally a raw digest column (32 bytes per row for SHA256).
+
+That is roughly 80 bytes per hashed file plus its basename, against several
+hundred for tuples of str and int. Tables are saved in a binary format whose
+sections are the same arrays, 8-byte aligned, so open_table() can mmap a
+saved table and query it without reading it all into memory.
+"""
+import mmap
+import os
+import struct
+import sys
+from array import array
+
+MAGIC = b'SSCTABLE'
+VERSION = 1
+
+# Sections in file order, with the array type code used to read each one
+SECTIONS = (
+    ('dir_offsets', 'Q'),
+    ('dir_blob', 'B'),
+    ('dir_devices', 'Q'),
+    ('dir_ids', 'I'),
+    ('name_offsets', 'Q'),
+    ('name_blob', 'B'),
+    ('sizes', 'Q'),
+    ('mtimes', 'q'),
+    ('inodes', 'Q'),
+    ('digests', 'B'),
+    ('digest_order', 'Q'),
+)
+
+# magic, version, byte order ('<' or '>'), digest size, rows, directories,
+# then (offset, length) for each section
+_HEADER = struct.Struct('8sIcxxxIQQ')
+_SECTION = struct.Struct('QQ')
+_BYTE_ORDER = b'<' if sys.byteorder == 'little' else b'>'
+
+class _TableView:
+    """Row access and queries shared by in-memory and memory-mapped tables."""
+
+    digest_size = 0
+
+    def __len__(self):
+        return len(self.sizes)
+
+    def name(self, i):
+        return os.fsdecode(bytes(self.name_blob[self.name_offsets[i]:self.name_offsets[i + 1]]))
+
+    def path(self, i):
+        return os.path.join(self.directory(self.dir_ids[i]), self.name(i))
+
+    def digest(self, i):
+        """Raw digest bytes of row i, or None if the table has no digests."""
+        if not self.digest_size:
+            return None
+        return bytes(self.digests[i * self.digest_size:(i + 1) * self.digest_size])
+
+    def row(self, i):
+        """(path, size, mtime_ns, inode, hex digest or None)."""
+        digest = self.digest(i)
+        return (self.path(i), self.sizes[i], self.mtimes[i], self.inodes[i],
+                digest.hex() if digest is not None else None)
+
+    def rows(self):
+        for i in range(len(self)):
+            yield self.row(i)
+
+    def select(self, min_size=None, under=None, rows=None):
+        """Indices of rows at least min_size bytes and inside directory under.
+
+        rows limits the search to those indices (by default every row).
+        """
+        dir_ok = None
+        if under is not None:
+            under = os.path.normpath(under)
+            prefix = under.rstrip(os.sep) + os.sep
+            dir_ok = {d for d in range(self.directory_count())
+                      if self.directory(d) == under or self.directory(d).startswith(prefix)}
+        sizes = self.sizes
+        dir_ids = self.dir_ids
+        for i in range(len(self)) if rows is None else rows:
+            if min_size is not None and sizes[i] < min_size:
+                continue
+            if dir_ok is not None and dir_ids[i] not in dir_ok:
+                continue
+            yield i
+
+    def find_digest(self, hexdigest):
+        """Indices of rows whose digest is hexdigest, by binary search."""
+        target = bytes.fromhex(hexdigest)
+        order = self.digest_order()
+        lo, hi = 0, len(order)
+        while lo < hi:
+            mid = (lo + hi) // 2
+            if self.digest(order[mid]) < target:
+                lo = mid + 1
+            else:
+                hi = mid
+        found = []
+        while lo < len(order) and self.digest(order[lo]) == target:
+            found.append(order[lo])
+            lo += 1
+        return found
+
+    def device(self, i):
+        """Device (st_dev) of row i's directory, or 0 if it was not given."""
+        return self.dir_devices[self.dir_ids[i]]
+
+    def duplicate_groups(self, rows=None):
+        """Hex digest -> [(path, size, mtime_ns)] for digests shared by several files.
+
+        rows limits the groups to those row indices (a set, e.g. from select()).
+
+        Rows that are hardlinks of one another (same device and inode) count
+        as one file, so a digest only held by links to a single inode is not
+        a group. Groups and their files come in scan order, like
+        engine.scan_duplicates.
+        """
+        runs = []
+        order = self.digest_order()
+        start = 0
+        for k in range(1, len(order) + 1):
+            if k == len(order) or self.digest(order[k]) != self.digest(order[start]):
+                if k - start > 1:
+                    run = sorted(order[start:k])
+                    if rows is not None:
+                        run = [i for i in run if i in rows]
+                    if self._distinct_files(run) > 1:
+                        runs.append(run)
+                start = k
+        runs.sort(key=lambda run: run[0])
+        return {self.digest(run[0]).hex(): [(self.path(i), self.sizes[i], self.mtimes[i])
+                                            for i in run]
+                for run in runs}
+
+    def _distinct_files(self, rows):
+        # Rows without an inode (0) are always counted as separate files
+        return len({(self.device(i), self.inodes[i]) if self.inodes[i] else (None, i)
+                    for i in rows})
+
+class FileTable(_TableView):
+    """Growable in-memory table of files; see the module docstring."""
+
+    def __init__(self, digest_size=0):
+        self.digest_size = digest_size
+        self.dirs = []
+        self.dir_devices = array('Q')
+        self._dir_ids = {}
+        self.dir_ids = array('I')
+        self.name_offsets = array('Q', [0])
+        self.name_blob = bytearray()
+        self.sizes = array('Q')
+        self.mtimes = array('q')
+        self.inodes = array('Q')
+        self.digests = bytearray()
+        self._order = None
+
+    def append(self, directory, name, size, mtime_ns, inode, digest=None, device=0):
+        """Add a row; digest is hex text or raw bytes when the table has digests.
+
+        device (st_dev) is recorded once per directory, from its first row.
+        """
+        dir_id = self._dir_ids.get(directory)
+        if dir_id is None:
+            dir_id = self._dir_ids[directory] = len(self.dirs)
+            self.dirs.append(directory)
+            self.dir_devices.append(device)
+        self.dir_ids.append(dir_id)
+        self.name_blob += os.fsencode(name)
+        self.name_offsets.append(len(self.name_blob))
+        self.sizes.append(size)
+        self.mtimes.append(mtime_ns)
+        self.inodes.append(inode)
+        if self.digest_size:
+            if isinstance(digest, str):
+                digest = bytes.fromhex(digest)
+            if digest is None or len(digest) != self.digest_size:
+                raise ValueError(f"expected a {self.digest_size}-byte digest")
+            self.digests += digest
+        self._order = None
+
+    def directory(self, dir_id):
+        return self.dirs[dir_id]
+
+    def directory_count(self):
+        return len(self.dirs)
+
+    def digest_order(self):
+        """Row indices sorted by digest (stable), as array('Q')."""
+        if self._order is None:
+            self._order = _sort_by_digest(self.digests, self.digest_size, len(self))
+        return self._order
+
+    def nbytes(self):
+        """Approximate memory used by the columns (excluding the directory table)."""
+        return (len(self.dir_ids) * self.dir_ids.itemsize +
+                len(self.name_offsets) * self.name_offsets.itemsize + len(self.name_blob) +
+                len(self.sizes) * 8 + len(self.mtimes) * 8 + len(self.inodes) * 8 +
+                len(self.digests))
+
+    def save(self, path):
+        """Write the table in the mmap-able binary format (atomically)."""
+        dir_blob = bytearray()
+        dir_offsets = array('Q', [0])
+        for directory in self.dirs:
+            dir_blob += os.fsencode(directory)
+            dir_offsets.append(len(dir_blob))
+        order = self.digest_order() if self.digest_size else array('Q')
+        sections = [dir_offsets, dir_blob, self.dir_devices, self.dir_ids, self.name_offsets,
+                    self.name_blob, self.sizes, self.mtimes, self.inodes, self.digests, order]
+
+        table_size = _HEADER.size + _SECTION.size * len(SECTIONS)
+        offset = _align(table_size)
+        layout = []
+        for data in sections:
+            length = memoryview(data).nbytes
+            layout.append((offset, length))
+            offset = _align(offset + length)
+
+        tmp_path = path + '.tmp'
+        with open(tmp_path, 'wb') as f:
+            f.write(_HEADER.pack(MAGIC, VERSION, _BYTE_ORDER, self.digest_size, len(self),
+                                 len(self.dirs)))
+            for section in layout:
+                f.write(_SECTION.pack(*section))
+            for (offset, _), data in zip(layout, sections):
+                f.write(b'\0' * (offset - f.tell()))
+                f.write(data)
+        os.replace(tmp_path, path)
+
+class MappedTable(_TableView):
+    """A saved table, memory-mapped read-only. Use as a context manager or close()."""
+
+    def __init__(self, path):
+        with open(path, 'rb') as f:
+            self._mmap = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        self._views = []
+        try:
+            magic, version, byte_order, self.digest_size, rows, dirs = _HEADER.unpack_from(self._mmap)
+            if magic != MAGIC or version != VERSION:
+                raise ValueError(f"not a scan table: {path}")
+            if byte_order != _BYTE_ORDER:
+                raise ValueError(f"scan table has the wrong byte order: {path}")
+            self._dir_count = dirs
+            base = memoryview(self._mmap)
+            self._views.append(base)
+            for k, (name, code) in enumerate(SECTIONS):
+                offset, length = _SECTION.unpack_from(self._mmap, _HEADER.size + k * _SECTION.size)
+                view = base[offset:offset + length]
+                self._views.append(view)
+                if code != 'B':
+                    view = view.cast(code)
+                    self._views.append(view)
+                # The saved sort order backs digest_order(), as on FileTable
+                setattr(self, '_order' if name == 'digest_order' else name, view)
+        except BaseException:
+            self.close()
+            raise
+
+    def directory(self, dir_id):
+        return os.fsdecode(bytes(self.dir_blob[self.dir_offsets[dir_id]:self.dir_offsets[dir_id + 1]]))
+
+    def directory_count(self):
+        return self._dir_count
+
+    def digest_order(self):
+        return self._order
+
+    def close(self):
+        for view in reversed(self._views):
+            view.release()
+        self._views = []
+        self._mmap.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+        return False
+
+def open_table(path):
+    """Memory-map a table written by FileTable.save()."""
+    return MappedTable(path)
+
+def _align(offset):
+    return (offset + 7) & ~7
+
+def _sort_by_digest(digests, digest_size, rows):
+    """Stable argsort of fixed-size digests, with numpy when it is installed."""
+    if not rows:
+        return array('Q')
+    try:
+        import numpy as np
+    except ImportError:
+        np = None
+    if np is None or digest_size % 8:
+        key = lambda i: digests[i * digest_size:(i + 1) * digest_size]
+        return array('Q', sorted(range(rows), key=key))
+    # Compare as big-endian 64-bit words; lexsort is stable and takes the
+    # most significant key last
+    words = np.frombuffer(digests, dtype='>u8').reshape(rows, digest_size // 8)
+    order = np.lexsort(words.T[::-1]).astype(np.uint64)
+    result = array('Q')
+    result.frombytes(order.tobytes())
+    return result
@@ -2,7 +2,7 @@ import tkinter as tk
 from tkinter import ttk, messagebox
 import os
 from utils import secure_delete
-import threading
+from scheduler import get_scheduler
 
 def setup_deep_clean_tab(frame):
     ttk.Label(frame, text="Select File or Folder for Deep Cleaning", font=('Helvetica', 14, 'bold')).pack(pady=10)
@@ -12,8 +12,10 @@ def setup_deep_clean_tab(frame):
     browse_frame.pack(pady=5)
     ttk.Button(browse_frame, text="Browse File", command=lambda: browse_file(path_entry)).grid(row=0, column=0, padx=5)
     ttk.Button(browse_frame, text="Browse Folder", command=lambda: browse_folder(path_entry)).grid(row=0, column=1, padx=5)
-    deep_clean_button = ttk.Button(frame, text="Start Deep Clean", command=lambda: threading.Thread(target=start_deep_clean, args=(path_entry, deep_clean_button, progress)).start())
+    deep_clean_button = ttk.Button(frame, text="Start Deep Clean", command=lambda: start_deep_clean(path_entry, deep_clean_button, progress, low_impact.get()))
     deep_clean_button.pack(pady=10)
+    low_impact = tk.BooleanVar(value=False)
+    ttk.Checkbutton(frame, text="Low impact (throttle writes, lower priority)", variable=low_impact).pack()
 
     progress = ttk.Progressbar(frame, length=300, mode='indeterminate')
     progress.pack(pady=5)
@@ -32,7 +34,7 @@ def browse_folder(path_entry):
         path_entry.insert(0, dir_path)
         messagebox.showinfo("Selected", f"Selected folder: {dir_path}")
 
-def start_deep_clean(path_entry, deep_clean_button, progress):
+def start_deep_clean(path_entry, deep_clean_button, progress, background=False):
     path = path_entry.get()
     if not path or not os.path.exists(path):
         messagebox.showerror("Error", "Please select a valid file or folder.")
@@ -40,11 +42,13 @@ def start_deep_clean(path_entry, deep_clean_button, progress):
     if messagebox.askyesno("Confirm", f"Permanently erase {path}? This is irreversible."):
         deep_clean_button.config(state='disabled')
         progress.start()
-        try:
-            secure_delete(path)
-            messagebox.showinfo("Success", "Deep cleaning completed.")
-        except Exception as e:
-            messagebox.showerror("Error", f"Deep cleaning failed: {str(e)}")
-        finally:
+
+        def finished(job):
             progress.stop()
-            deep_clean_button.config(state='normal')
\ No newline at end of file
+            deep_clean_button.config(state='normal')
+
+        get_scheduler().submit('secure_delete',
+                               lambda job: secure_delete(path, metrics=job.metrics, throttle=job.throttle),
+                               key='deep_clean', background=background, on_finish=finished,
+                               on_done=lambda job: messagebox.showinfo("Success", "Deep cleaning completed."),
+                               on_error=lambda job: messagebox.showerror("Error", f"Deep cleaning failed: {str(job.error)}"))
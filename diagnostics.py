@@ -0,0 +1,135 @@
+import tkinter as tk
+from tkinter import ttk, messagebox, filedialog
+from datetime import datetime
+import metrics
+
+def setup_diagnostics_tab(frame):
+    settings_frame = ttk.LabelFrame(frame, text="Instrumentation", padding=10)
+    settings_frame.pack(fill='x', padx=10, pady=10)
+
+    collect_var = tk.BooleanVar(value=metrics.collect)
+
+    def toggle_collect():
+        metrics.collect = collect_var.get()
+
+    ttk.Checkbutton(settings_frame, text="Collect metrics for every job",
+                    variable=collect_var, command=toggle_collect).grid(row=0, column=0, padx=5, sticky='w')
+
+    profile_mode = ttk.Combobox(settings_frame, values=('cprofile', 'sample'), state='readonly', width=10)
+    profile_mode.set('cprofile')
+    profile_mode.grid(row=0, column=1, padx=5)
+    profile_label = ttk.Label(settings_frame, text="")
+    profile_label.grid(row=0, column=3, padx=5, sticky='w')
+
+    def profile_next_job():
+        metrics.profile_next = profile_mode.get()
+        profile_label.config(text=f"Next job will be profiled ({metrics.profile_next})")
+
+    ttk.Button(settings_frame, text="Profile Next Job",
+               command=profile_next_job).grid(row=0, column=2, padx=5)
+
+    # Recent jobs
+    jobs_frame = ttk.LabelFrame(frame, text="Recent Jobs", padding=10)
+    jobs_frame.pack(fill='both', expand=True, padx=10, pady=5)
+    jobs_tree = ttk.Treeview(jobs_frame, columns=('Started', 'Wall', 'Files', 'Errors', 'Profile'),
+                             show='tree headings', height=6, selectmode='browse')
+    jobs_tree.heading('#0', text='Job')
+    jobs_tree.heading('Started', text='Started')
+    jobs_tree.heading('Wall', text='Wall (s)')
+    jobs_tree.heading('Files', text='Files')
+    jobs_tree.heading('Errors', text='Errors')
+    jobs_tree.heading('Profile', text='Profile')
+    for column in ('Wall', 'Files', 'Errors', 'Profile'):
+        jobs_tree.column(column, width=90)
+    jobs_tree.pack(fill='both', expand=True)
+
+    # Details of the selected job
+    details_frame = ttk.LabelFrame(frame, text="Job Details", padding=10)
+    details_frame.pack(fill='both', expand=True, padx=10, pady=5)
+    details_tree = ttk.Treeview(details_frame, columns=('Value',), show='tree headings', height=8)
+    details_tree.heading('#0', text='Metric')
+    details_tree.heading('Value', text='Value')
+    details_tree.pack(fill='both', expand=True)
+
+    jobs = {}
+    shown = []
+
+    def refresh_jobs():
+        recent = metrics.get_recent_jobs()
+        if recent == shown:
+            return
+        shown[:] = recent
+        selected = jobs_tree.selection()
+        selected_job = jobs.get(selected[0]) if selected else None
+        for item in jobs_tree.get_children():
+            jobs_tree.delete(item)
+        jobs.clear()
+        for job in reversed(recent):
+            item = jobs_tree.insert('', 'end', text=job.job, values=(
+                datetime.fromtimestamp(job.started).strftime("%H:%M:%S"),
+                f"{job.wall:.3f}" if job.wall is not None else '',
+                job.counters.get('files', ''),
+                job.counters.get('errors', ''),
+                job.profile or '',
+            ))
+            jobs[item] = job
+            if job is selected_job:
+                jobs_tree.selection_set(item)
+
+    def show_details(event=None):
+        for item in details_tree.get_children():
+            details_tree.delete(item)
+        selected = jobs_tree.selection()
+        if not selected:
+            return
+        snapshot = jobs[selected[0]].snapshot()
+        counters = details_tree.insert('', 'end', text='Counters', open=True)
+        for name, value in sorted(snapshot['counters'].items()):
+            details_tree.insert(counters, 'end', text=name, values=(value,))
+        timers = details_tree.insert('', 'end', text='Phase times (s)', open=True)
+        for name, value in sorted(snapshot['timers_s'].items(), key=lambda x: -x[1]):
+            details_tree.insert(timers, 'end', text=name, values=(f"{value:.4f}",))
+        for name, hist in sorted(snapshot['histograms'].items()):
+            parent = details_tree.insert('', 'end', text=f"Latency: {name}", open=True)
+            details_tree.insert(parent, 'end', text='count', values=(hist['count'],))
+            for key in ('p50_s', 'p90_s', 'p99_s', 'max_s'):
+                details_tree.insert(parent, 'end', text=key[:-2],
+                                    values=(f"{hist[key] * 1000:.3f} ms",))
+
+    def export_ndjson():
+        path = filedialog.asksaveasfilename(title="Export Metrics", defaultextension='.ndjson',
+                                            filetypes=[('NDJSON', '*.ndjson'), ('All files', '*')])
+        if path:
+            open(path, 'w').close()
+            for job in metrics.get_recent_jobs():
+                job.export_ndjson(path)
+            messagebox.showinfo("Exported", f"Exported {len(metrics.get_recent_jobs())} jobs to {path}")
+
+    def save_profile():
+        selected = jobs_tree.selection()
+        job = jobs.get(selected[0]) if selected else None
+        if not job or not job.profile:
+            messagebox.showwarning("Warning", "Please select a profiled job")
+            return
+        default = '.prof' if job.profile == 'cprofile' else '.folded'
+        path = filedialog.asksaveasfilename(title="Save Profile", defaultextension=default,
+                                            initialfile=f"{job.job}{default}")
+        if path:
+            job.dump_profile(path)
+            messagebox.showinfo("Saved", f"Profile saved to {path}")
+
+    jobs_tree.bind('<<TreeviewSelect>>', show_details)
+
+    btn_frame = ttk.Frame(frame)
+    btn_frame.pack(pady=5)
+    ttk.Button(btn_frame, text="Refresh", command=refresh_jobs).pack(side='left', padx=5)
+    ttk.Button(btn_frame, text="Export NDJSON", command=export_ndjson).pack(side='left', padx=5)
+    ttk.Button(btn_frame, text="Save Profile", command=save_profile).pack(side='left', padx=5)
+
+    def auto_refresh():
+        refresh_jobs()
+        if not metrics.profile_next:
+            profile_label.config(text="")
+        frame.after(2000, auto_refresh)
+
+    auto_refresh()
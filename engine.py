@@ -0,0 +1,740 @@
+"""UI-free scanning and cleanup engine.
+
+Everything here runs without Tk or matplotlib so it can be driven from the
+GUI, the command line (see cli.py) or cron. Functions never show dialogs;
+problems are returned to the caller as lists of (path, error) pairs.
+
+Long-running functions take an optional metrics=... (see metrics.py) and
+record counters and phase times on it; by default nothing is recorded. They
+also take cancel=..., a CancelToken from scheduler.py that is polled between
+directories or files and raises scheduler.Cancelled when set. The walker,
+hashing and overwrite loops take throttle=... (see throttle.py) to run as
+low-impact background jobs.
+"""
+import os
+import hashlib
+import shutil
+import tempfile
+import filecmp
+import json
+import time
+from datetime import datetime
+from collections import defaultdict
+from columnar import FileTable, open_table
+from metrics import NULL_METRICS
+from scheduler import NEVER_CANCELLED
+from throttle import NO_THROTTLE
+
+# ioctl request number for FICLONE (_IOW(0x94, 9, int)), Linux only.
+FICLONE = 0x40049409
+
+CATEGORY_EXTENSIONS = {
+    'Images': {'.jpg', '.jpeg', '.png', '.gif', '.bmp', '.webp'},
+    'Videos': {'.mp4', '.avi', '.mov', '.mkv', '.wmv'},
+    'Audio': {'.mp3', '.wav', '.flac', '.m4a', '.ogg'},
+    'Documents': {'.doc', '.docx', '.pdf', '.txt', '.xlsx', '.csv'},
+    'Applications': {'.exe', '.msi', '.app', '.dmg', '.deb', '.rpm'},
+    'System': {'.dll', '.sys', '.driver'},
+}
+
+def get_file_category(file_path):
+    """Determine the category of a file based on its extension."""
+    try:
+        ext = os.path.splitext(file_path)[1].lower()
+        for category, extensions in CATEGORY_EXTENSIONS.items():
+            if ext in extensions:
+                return category
+        return 'Other'
+    except:
+        return 'Other'
+
+def calculate_file_hash(file_path, cache=None, stat=None, metrics=NULL_METRICS,
+                        throttle=NO_THROTTLE):
+    """Calculate SHA256 hash of a file. Raises OSError if it cannot be read.
+
+    With a HashCache, a digest recorded for the same size and mtime is reused.
+    """
+    timed = metrics.enabled
+    if timed:
+        start = time.perf_counter()
+    if cache is not None:
+        stat = stat or os.stat(file_path)
+        cached = cache.get_content_hash(file_path, stat.st_size, stat.st_mtime_ns)
+        if cached:
+            if timed:
+                metrics.count('hash.cache_hits')
+                metrics.add_time('hash.cache', time.perf_counter() - start)
+            return cached
+    sha256_hash = hashlib.sha256()
+    hashed = 0
+    throttled = throttle.enabled
+    unpaid = 0
+    with open(file_path, "rb") as f:
+        for byte_block in iter(lambda: f.read(4096), b""):
+            sha256_hash.update(byte_block)
+            hashed += len(byte_block)
+            if throttled:
+                # Pay for reads in 1 MiB steps rather than per block
+                unpaid += len(byte_block)
+                if unpaid >= 1 << 20:
+                    throttle.io(unpaid)
+                    unpaid = 0
+    if unpaid:
+        throttle.io(unpaid)
+    digest = sha256_hash.hexdigest()
+    if timed:
+        elapsed = time.perf_counter() - start
+        metrics.count('hash.files')
+        metrics.count('hash.bytes', hashed)
+        metrics.add_time('hash', elapsed)
+        metrics.observe('hash.latency', elapsed)
+    if cache is not None:
+        cache.put_content_hash(file_path, stat.st_size, stat.st_mtime_ns, digest)
+    return digest
+
+def open_hash_cache():
+    """Open the persistent hash cache, or return None if it is unavailable."""
+    try:
+        from hash_cache import HashCache
+        return HashCache()
+    except Exception:
+        return None
+
+# Storage
+
+def scan_directory(path, categories=None, metrics=NULL_METRICS, cancel=NEVER_CANCELLED,
+                   throttle=NO_THROTTLE, per_dir=None):
+    """Add the size of every file under path to its category total.
+
+    If per_dir is a dict, it also receives {category: bytes} for the files
+    directly inside each directory walked (see watcher.StorageIndex).
+    """
+    if categories is None:
+        categories = defaultdict(int)
+    timed = metrics.enabled
+    throttled = throttle.enabled
+    clock = time.perf_counter
+    start = clock()
+    stat_time = classify_time = 0.0
+    file_count = byte_count = error_count = 0
+    try:
+        for root, _, files in os.walk(path):
+            cancel.check()
+            dir_totals = None
+            if per_dir is not None:
+                dir_totals = per_dir[root] = defaultdict(int)
+            for file in files:
+                try:
+                    file_path = os.path.join(root, file)
+                    if timed:
+                        t0 = clock()
+                    size = os.stat(file_path).st_size
+                    if timed:
+                        t1 = clock()
+                        stat_time += t1 - t0
+                    category = get_file_category(file_path)
+                    categories[category] += size
+                    if dir_totals is not None:
+                        dir_totals[category] += size
+                    if timed:
+                        classify_time += clock() - t1
+                    file_count += 1
+                    byte_count += size
+                    if throttled:
+                        throttle.file()
+                except (PermissionError, OSError):
+                    error_count += 1
+                    continue
+    except (PermissionError, OSError):
+        pass
+    if timed:
+        metrics.count('files', file_count)
+        metrics.count('bytes', byte_count)
+        metrics.count('errors', error_count)
+        metrics.add_time('stat', stat_time)
+        metrics.add_time('classify', classify_time)
+        metrics.add_time('walk', clock() - start - stat_time - classify_time)
+    return categories
+
+def default_scan_root():
+    return 'C:\\' if os.name == 'nt' else '/'
+
+# Temporary files
+
+def get_temp_dir():
+    return os.environ.get('TEMP', '/tmp') if os.name == 'nt' else '/tmp'
+
+def scan_temp_files(temp_dir=None, metrics=NULL_METRICS, cancel=NEVER_CANCELLED,
+                    throttle=NO_THROTTLE):
+    """Total size of the temporary directory. Returns (total_size, errors)."""
+    temp_dir = temp_dir or get_temp_dir()
+    total_size = 0
+    file_count = 0
+    errors = []
+    with metrics.phase('walk'):
+        if os.path.exists(temp_dir):
+            for root, _, files in os.walk(temp_dir):
+                cancel.check()
+                for file in files:
+                    file_path = os.path.join(root, file)
+                    try:
+                        total_size += os.path.getsize(file_path)
+                        file_count += 1
+                        throttle.file()
+                    except OSError as e:
+                        errors.append((file_path, str(e)))
+    metrics.count('files', file_count)
+    metrics.count('bytes', total_size)
+    metrics.count('errors', len(errors))
+    return total_size, errors
+
+def delete_temp_files(temp_dir=None, cancel=NEVER_CANCELLED):
+    """Send every temporary file to the trash. Returns (deleted, failed)."""
+    import send2trash
+    temp_dir = temp_dir or get_temp_dir()
+    deleted = []
+    failed = []
+    if os.path.exists(temp_dir):
+        for root, _, files in os.walk(temp_dir):
+            cancel.check()
+            for file in files:
+                file_path = os.path.join(root, file)
+                try:
+                    send2trash.send2trash(file_path)
+                    deleted.append(file_path)
+                except Exception as e:
+                    failed.append((file_path, str(e)))
+    return deleted, failed
+
+# Duplicates
+
+def scan_duplicates(dir_path, cache=None, metrics=NULL_METRICS, cancel=NEVER_CANCELLED,
+                    throttle=NO_THROTTLE, per_dir=None, table=None):
+    """Find byte-identical files under dir_path.
+
+    Returns (groups, inaccessible, errors): groups maps each SHA256 digest
+    shared by two or more files to a list of (path, size, mtime_ns).
+    Hardlinks of one inode count as one file: they are listed, but do not
+    make a group on their own (see reclaimable_bytes).
+    If per_dir is a dict, it also receives {name: (size, mtime_ns, inode,
+    digest)} for every file hashed in each directory walked, duplicated or
+    not (see watcher.DuplicateIndex).
+
+    Every hashed file is recorded in a columnar.FileTable, which is only
+    kept if the caller passes one in as table= (e.g. to save it).
+    """
+    if table is None:
+        table = FileTable(digest_size=32)
+    inaccessible = []
+    errors = []
+    file_count = 0
+    for root, _, files in os.walk(dir_path):
+        dir_files = None
+        if per_dir is not None:
+            dir_files = per_dir[root] = {}
+        for file in files:
+            cancel.check()
+            file_path = os.path.join(root, file)
+            try:
+                throttle.file()
+                st = os.stat(file_path)
+                file_hash = calculate_file_hash(file_path, cache, st, metrics, throttle)
+                table.append(root, file, st.st_size, st.st_mtime_ns, st.st_ino, file_hash,
+                             st.st_dev)
+                if dir_files is not None:
+                    dir_files[file] = (st.st_size, st.st_mtime_ns, st.st_ino, file_hash)
+                file_count += 1
+            except PermissionError:
+                inaccessible.append(file_path)
+            except Exception as e:
+                errors.append((file_path, str(e)))
+    with metrics.phase('group'):
+        groups = table.duplicate_groups()
+    metrics.count('table.bytes', table.nbytes())
+    metrics.count('files', file_count)
+    metrics.count('errors', len(inaccessible) + len(errors))
+    metrics.count('duplicate_groups', len(groups))
+    return groups, inaccessible, errors
+
+def scan_similar_images(dir_path, threshold=4, method='dhash', cache=None, metrics=NULL_METRICS,
+                        cancel=NEVER_CANCELLED, throttle=NO_THROTTLE):
+    """Group visually similar images under dir_path by perceptual hash.
+
+    Requires numpy and Pillow. Returns (groups, failed) where each group is
+    a list of (path, size, mtime_ns, hash).
+    """
+    from image_dups import find_similar_images
+
+    images = []
+    with metrics.phase('walk'):
+        for root, _, files in os.walk(dir_path):
+            cancel.check()
+            for file in files:
+                file_path = os.path.join(root, file)
+                if get_file_category(file_path) != 'Images':
+                    continue
+                try:
+                    throttle.file()
+                    st = os.stat(file_path)
+                    images.append((file_path, st.st_size, st.st_mtime_ns))
+                except OSError:
+                    continue
+
+    cancel.check()
+    with metrics.phase('image_hash'):
+        groups, failed = find_similar_images(images, threshold, method, cache, throttle=throttle)
+    metrics.count('files', len(images))
+    metrics.count('errors', len(failed))
+    metrics.count('similar_groups', len(groups))
+    stats = {path: (size, mtime_ns) for path, size, mtime_ns in images}
+    return [[(path, *stats[path], h) for path, h in group] for group in groups], failed
+
+def open_chunk_index():
+    """Open the persistent chunk index, or return None if it is unavailable."""
+    try:
+        from chunk_dups import ChunkIndex
+        return ChunkIndex()
+    except Exception:
+        return None
+
+def scan_partial_duplicates(dir_path, min_size=None, index=None, max_pairs=100,
+                            metrics=NULL_METRICS, cancel=NEVER_CANCELLED, throttle=NO_THROTTLE):
+    """Measure the bytes shared by files under dir_path that are not identical.
+
+    Files of at least min_size bytes (default chunk_dups.MIN_FILE_SIZE) are
+    split into content-defined chunks on a process pool and indexed in a
+    chunk_dups.ChunkIndex; without one, a temporary index is used. Files
+    under dir_path that were indexed before but have since been deleted or
+    changed are pruned from the index. Requires numpy. Returns (report,
+    errors) as for chunk_dups.find_shared_chunks.
+    """
+    import chunk_dups
+
+    if min_size is None:
+        min_size = chunk_dups.MIN_FILE_SIZE
+    files = []
+    errors = []
+    with metrics.phase('walk'):
+        for root, _, names in os.walk(dir_path):
+            cancel.check()
+            for name in names:
+                file_path = os.path.join(root, name)
+                try:
+                    st = os.stat(file_path)
+                except OSError as e:
+                    errors.append((file_path, str(e)))
+                    continue
+                if st.st_size >= max(min_size, 1):
+                    files.append((file_path, st.st_size, st.st_mtime_ns))
+
+    own_index = index is None
+    if own_index:
+        index = chunk_dups.ChunkIndex(temporary=True)
+    else:
+        with metrics.phase('chunk.prune'):
+            metrics.count('chunk.pruned', index.prune(dir_path, files))
+    try:
+        report, chunk_errors = chunk_dups.find_shared_chunks(files, index, max_pairs, metrics,
+                                                             cancel, throttle)
+    finally:
+        if own_index:
+            index.close()
+    errors.extend(chunk_errors)
+    metrics.count('files', len(files))
+    metrics.count('errors', len(errors))
+    metrics.count('shared_pairs', len(report['pairs']))
+    return report, errors
+
+def find_same_name_files(base_path, filename, cancel=NEVER_CANCELLED):
+    """Find all files with the same name across directories.
+
+    Returns (accessible, inaccessible) lists of paths.
+    """
+    same_name_files = []
+    inaccessible = []
+    for root, _, files in os.walk(base_path):
+        cancel.check()
+        if filename in files:
+            file_path = os.path.join(root, filename)
+            try:
+                # Test file accessibility
+                with open(file_path, 'rb'):
+                    same_name_files.append(file_path)
+            except OSError:
+                inaccessible.append(file_path)
+    return same_name_files, inaccessible
+
+def _reflink(src, fd):
+    """Make the empty file open as fd a copy-on-write clone of src.
+
+    Raises OSError if the filesystem does not support it.
+    """
+    import fcntl
+    with open(src, 'rb') as s:
+        fcntl.ioctl(fd, FICLONE, s.fileno())
+
+def _link_over(keep_path, dup_path, method, keep_st, dup_st):
+    """Atomically replace dup_path with a link to keep_path.
+
+    method is 'reflink', 'hardlink' or 'auto' (reflink, then hardlink).
+    A reflinked copy keeps the owner, mode and times of dup_path. A hardlink
+    shares those of keep_path, so it is refused unless they already match.
+    The link is made under a unique temporary name next to dup_path, which
+    is removed if anything fails. Returns the method actually used.
+    """
+    directory, name = os.path.split(dup_path)
+    fd, tmp_path = tempfile.mkstemp(prefix=f".{name}.", suffix='.dedup', dir=directory or None)
+    try:
+        used = None
+        try:
+            if method in ('reflink', 'auto') and os.name != 'nt':
+                try:
+                    _reflink(keep_path, fd)
+                    if hasattr(os, 'fchown'):
+                        os.fchown(fd, dup_st.st_uid, dup_st.st_gid)
+                    used = 'reflink'
+                except OSError:
+                    if method == 'reflink':
+                        raise
+        finally:
+            os.close(fd)
+        if used == 'reflink':
+            shutil.copystat(dup_path, tmp_path)
+        else:
+            if (keep_st.st_uid, keep_st.st_gid, keep_st.st_mode) != \
+                    (dup_st.st_uid, dup_st.st_gid, dup_st.st_mode):
+                raise OSError("Owner or permissions differ from the kept file; not hardlinking")
+            # os.link() does not overwrite, so the placeholder makes way for the link
+            os.remove(tmp_path)
+            os.link(keep_path, tmp_path)
+            used = 'hardlink'
+        os.replace(tmp_path, dup_path)
+    except BaseException:
+        try:
+            os.remove(tmp_path)
+        except OSError:
+            pass
+        raise
+    return used
+
+def reclaimable_bytes(files):
+    """Bytes freed by linking every file of a duplicate group to the first.
+
+    Each inode other than the first file's is counted once; files that can
+    no longer be read are counted at their scan-time size.
+    """
+    inodes = set()
+    total = 0
+    for k, (path, size, _) in enumerate(files):
+        try:
+            st = os.stat(path)
+            key = (st.st_dev, st.st_ino)
+        except OSError:
+            key = path
+        if key not in inodes:
+            inodes.add(key)
+            if k:
+                total += size
+    return total
+
+def deduplicate_files(files, method='auto', cancel=NEVER_CANCELLED):
+    """Replace redundant copies with links to the first file.
+
+    files is a list of (path, size, mtime_ns) as recorded at scan time; the
+    first entry is kept. Each copy is checked to be unchanged since the scan
+    and byte-identical to the kept file, and both to still be the same inode
+    with the same size and mtime after comparing, before it is replaced. A copy that
+    is already a hardlink of the kept file counts as deduplicated, with
+    method 'already linked', and reclaims nothing; the bytes of a copy with
+    several links are counted once.
+    Returns (deduplicated, failed, bytes_reclaimed).
+    """
+    deduplicated = []
+    failed = []
+    bytes_reclaimed = 0
+    if len(files) < 2:
+        return deduplicated, failed, bytes_reclaimed
+
+    def changed(path, size, mtime_ns):
+        st = os.stat(path)
+        return st, (st.st_size != size or st.st_mtime_ns != mtime_ns)
+
+    def identity(st):
+        return st.st_dev, st.st_ino, st.st_size, st.st_mtime_ns
+
+    keep_path, keep_size, keep_mtime = files[0]
+    try:
+        keep_st, keep_changed = changed(keep_path, keep_size, keep_mtime)
+    except OSError as e:
+        return deduplicated, [(p, str(e)) for p, _, _ in files[1:]], 0
+    if keep_changed:
+        return deduplicated, [(p, "Kept file changed since scan") for p, _, _ in files[1:]], 0
+
+    linked_inodes = set()
+    for dup_path, size, mtime_ns in files[1:]:
+        cancel.check()
+        try:
+            dup_st, dup_changed = changed(dup_path, size, mtime_ns)
+            if dup_changed:
+                failed.append((dup_path, "File changed since scan"))
+                continue
+            if (dup_st.st_dev, dup_st.st_ino) == (keep_st.st_dev, keep_st.st_ino):
+                deduplicated.append((dup_path, 'already linked'))
+                continue
+            if not filecmp.cmp(keep_path, dup_path, shallow=False):
+                failed.append((dup_path, "Contents differ"))
+                continue
+            # Either path may have been replaced or written while comparing
+            if (identity(os.stat(keep_path)) != identity(keep_st)
+                    or identity(os.stat(dup_path)) != identity(dup_st)):
+                failed.append((dup_path, "File changed during comparison"))
+                continue
+            used = _link_over(keep_path, dup_path, method, keep_st, dup_st)
+            deduplicated.append((dup_path, used))
+            if (dup_st.st_dev, dup_st.st_ino) not in linked_inodes:
+                linked_inodes.add((dup_st.st_dev, dup_st.st_ino))
+                bytes_reclaimed += size
+        except Exception as e:
+            failed.append((dup_path, str(e)))
+
+    return deduplicated, failed, bytes_reclaimed
+
+def trash_files(file_paths):
+    """Send files to the system trash. Returns (deleted, failed)."""
+    import send2trash
+    deleted = []
+    failed = []
+    for file_path in file_paths:
+        try:
+            send2trash.send2trash(os.path.normpath(file_path))
+            deleted.append(file_path)
+        except Exception as e:
+            failed.append((file_path, str(e)))
+    return deleted, failed
+
+# Recycle bin
+
+class RecycleBin:
+    def __init__(self, metrics=NULL_METRICS):
+        self.bin_dir = os.path.join(os.path.expanduser('~'), '.smart_cleaner_bin')
+        self.metadata_file = os.path.join(self.bin_dir, 'metadata.json')
+        # Folder manifests are columnar tables kept outside metadata.json, so
+        # loading the metadata stays cheap however many files a folder had
+        self.manifest_dir = os.path.join(self.bin_dir, '.manifests')
+        self.metrics = metrics
+        self._ensure_bin_exists()
+
+    def _ensure_bin_exists(self):
+        if not os.path.exists(self.bin_dir):
+            os.makedirs(self.bin_dir)
+        if not os.path.exists(self.manifest_dir):
+            os.makedirs(self.manifest_dir)
+        if not os.path.exists(self.metadata_file):
+            self._save_metadata({})
+
+    def _load_metadata(self):
+        with self.metrics.phase('metadata_io'):
+            try:
+                with open(self.metadata_file, 'r') as f:
+                    return json.load(f)
+            except:
+                return {}
+
+    def _save_metadata(self, metadata):
+        with self.metrics.phase('metadata_io'):
+            with open(self.metadata_file, 'w') as f:
+                json.dump(metadata, f)
+
+    def move_to_bin(self, file_paths):
+        if not isinstance(file_paths, list):
+            file_paths = [file_paths]
+
+        moved_files = []
+        failed_files = []
+        metadata = self._load_metadata()
+
+        for file_path in file_paths:
+            try:
+                if not os.path.exists(file_path):
+                    failed_files.append((file_path, "File not found"))
+                    continue
+
+                file_name = os.path.basename(file_path)
+                timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
+                bin_name = f"{timestamp}_{file_name}"
+                bin_path = os.path.join(self.bin_dir, bin_name)
+
+                # Store original structure for folders
+                table = None
+                if os.path.isdir(file_path):
+                    with self.metrics.phase('manifest'):
+                        table = FileTable()
+                        for root, dirs, files in os.walk(file_path):
+                            rel_dir = os.path.relpath(root, file_path)
+                            rel_dir = '' if rel_dir == '.' else rel_dir
+                            for f in files:
+                                st = os.stat(os.path.join(root, f))
+                                table.append(rel_dir, f, st.st_size, st.st_mtime_ns, st.st_ino)
+
+                with self.metrics.phase('move'):
+                    shutil.move(file_path, bin_path)
+                # Written only once the folder is in the bin, so a failed move
+                # leaves no manifest behind
+                manifest = None
+                if table is not None:
+                    with self.metrics.phase('manifest'):
+                        try:
+                            table.save(os.path.join(self.manifest_dir, f"{bin_name}.table"))
+                            manifest = f"{bin_name}.table"
+                        except OSError:
+                            self.metrics.count('bin.manifest_errors')
+                with self.metrics.phase('size'):
+                    size = os.path.getsize(bin_path) if os.path.isfile(bin_path) else self._get_dir_size(bin_path)
+                metadata[bin_name] = {
+                    'original_path': file_path,
+                    'deleted_date': datetime.now().isoformat(),
+                    'size': size,
+                    'is_directory': os.path.isdir(bin_path),
+                    'original_structure': None,
+                    'manifest': manifest
+                }
+                moved_files.append(file_path)
+                self.metrics.count('bin.moved')
+                self.metrics.count('bin.bytes', size)
+            except Exception as e:
+                failed_files.append((file_path, str(e)))
+
+        self.metrics.count('bin.failed', len(failed_files))
+        self._save_metadata(metadata)
+        return moved_files, failed_files
+
+    def iter_manifest(self, bin_name, info):
+        """Yield (relative path, size) for each file recorded for a binned folder."""
+        if info.get('manifest'):
+            try:
+                table = open_table(os.path.join(self.manifest_dir, info['manifest']))
+            except (OSError, ValueError):
+                return
+            with table:
+                for i in range(len(table)):
+                    yield table.path(i), table.sizes[i]
+        else:
+            # Entries binned before manifests were tables
+            for item in info.get('original_structure') or ():
+                yield item['path'], item['size']
+
+    def _remove_from_manifest(self, info, file_path):
+        if not info.get('manifest'):
+            info['original_structure'] = [
+                item for item in info.get('original_structure') or ()
+                if item['path'] != file_path
+            ]
+            return
+        manifest_path = os.path.join(self.manifest_dir, info['manifest'])
+        table = FileTable()
+        with open_table(manifest_path) as old:
+            for i in range(len(old)):
+                if old.path(i) != file_path:
+                    table.append(old.directory(old.dir_ids[i]), old.name(i), old.sizes[i],
+                                 old.mtimes[i], old.inodes[i])
+        table.save(manifest_path)
+
+    def _delete_manifest(self, info):
+        if info.get('manifest'):
+            try:
+                os.remove(os.path.join(self.manifest_dir, info['manifest']))
+            except OSError:
+                pass
+
+    def _get_dir_size(self, path):
+        total_size = 0
+        for dirpath, _, filenames in os.walk(path):
+            for f in filenames:
+                fp = os.path.join(dirpath, f)
+                total_size += os.path.getsize(fp)
+        return total_size
+
+    def restore_file(self, bin_name, file_path=None, custom_path=None):
+        metadata = self._load_metadata()
+        if bin_name not in metadata:
+            raise ValueError(f"File not found in recycle bin: {bin_name}")
+
+        bin_path = os.path.join(self.bin_dir, bin_name)
+        original_path = metadata[bin_name]['original_path']
+
+        # Handle individual file restoration from a folder
+        if metadata[bin_name]['is_directory'] and file_path:
+            bin_file_path = os.path.join(bin_path, file_path)
+            if not os.path.exists(bin_file_path):
+                raise ValueError(f"File not found in folder: {file_path}")
+
+            restore_path = custom_path if custom_path else os.path.join(
+                os.path.dirname(original_path),
+                file_path
+            )
+            restore_dir = os.path.dirname(restore_path)
+
+            if not os.path.exists(restore_dir):
+                os.makedirs(restore_dir)
+
+            shutil.copy2(bin_file_path, restore_path)
+            os.remove(bin_file_path)
+
+            # Update the metadata to remove the restored file
+            with self.metrics.phase('manifest'):
+                self._remove_from_manifest(metadata[bin_name], file_path)
+            metadata[bin_name]['size'] = self._get_dir_size(bin_path)
+
+            # If the folder is empty after restoration, remove it
+            if not os.listdir(bin_path):
+                os.rmdir(bin_path)
+                self._delete_manifest(metadata[bin_name])
+                del metadata[bin_name]
+        else:
+            # Regular file or full folder restoration
+            restore_path = custom_path if custom_path else original_path
+            restore_dir = os.path.dirname(restore_path)
+
+            if not os.path.exists(restore_dir):
+                os.makedirs(restore_dir)
+
+            with self.metrics.phase('move'):
+                shutil.move(bin_path, restore_path)
+            self._delete_manifest(metadata[bin_name])
+            del metadata[bin_name]
+
+        self.metrics.count('bin.restored')
+        self._save_metadata(metadata)
+
+    def permanently_delete(self, bin_names):
+        if not isinstance(bin_names, list):
+            bin_names = [bin_names]
+
+        metadata = self._load_metadata()
+        deleted = []
+        failed = []
+
+        for bin_name in bin_names:
+            try:
+                if bin_name not in metadata:
+                    failed.append((bin_name, "File not found in recycle bin"))
+                    continue
+
+                bin_path = os.path.join(self.bin_dir, bin_name)
+                with self.metrics.phase('delete'):
+                    if os.path.isdir(bin_path):
+                        shutil.rmtree(bin_path)
+                    else:
+                        os.remove(bin_path)
+                self._delete_manifest(metadata[bin_name])
+                del metadata[bin_name]
+                deleted.append(bin_name)
+                self.metrics.count('bin.deleted')
+            except Exception as e:
+                failed.append((bin_name, str(e)))
+
+        self._save_metadata(metadata)
+        return deleted, failed
+
+    def get_bin_contents(self):
+        return self._load_metadata()
@@ -0,0 +1,70 @@
+import os
+import sqlite3
+import threading
+
+CACHE_DIR = os.path.join(os.path.expanduser('~'), '.smart_cleaner_cache')
+
+def _to_signed(value):
+    """SQLite integers are signed 64-bit; store 64-bit hashes two's-complement."""
+    return value - (1 << 64) if value >= (1 << 63) else value
+
+def _to_unsigned(value):
+    return value + (1 << 64) if value < 0 else value
+
+class HashCache:
+    """Persistent cache of content and perceptual hashes.
+
+    Entries are keyed by path and are only valid while the file's size and
+    mtime match the values recorded alongside the hash.
+    """
+
+    def __init__(self, db_path=None):
+        if db_path is None:
+            os.makedirs(CACHE_DIR, exist_ok=True)
+            db_path = os.path.join(CACHE_DIR, 'hashes.db')
+        self.db_path = db_path
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(db_path, check_same_thread=False)
+        with self._conn:
+            self._conn.execute("PRAGMA journal_mode=WAL")
+            self._conn.execute("PRAGMA synchronous=NORMAL")
+            self._conn.execute(
+                "CREATE TABLE IF NOT EXISTS content_hash ("
+                "path TEXT PRIMARY KEY, size INTEGER, mtime_ns INTEGER, digest TEXT)")
+            self._conn.execute(
+                "CREATE TABLE IF NOT EXISTS image_hash ("
+                "path TEXT, method TEXT, size INTEGER, mtime_ns INTEGER, hash INTEGER, "
+                "PRIMARY KEY (path, method))")
+
+    def get_content_hash(self, path, size, mtime_ns):
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT digest FROM content_hash WHERE path = ? AND size = ? AND mtime_ns = ?",
+                (path, size, mtime_ns)).fetchone()
+        return row[0] if row else None
+
+    def put_content_hash(self, path, size, mtime_ns, digest):
+        with self._lock, self._conn:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO content_hash VALUES (?, ?, ?, ?)",
+                (path, size, mtime_ns, digest))
+
+    def get_image_hash(self, path, method, size, mtime_ns):
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT hash FROM image_hash WHERE path = ? AND method = ? "
+                "AND size = ? AND mtime_ns = ?",
+                (path, method, size, mtime_ns)).fetchone()
+        return _to_unsigned(row[0]) if row else None
+
+    def put_image_hashes(self, method, rows):
+        """Store many (path, size, mtime_ns, hash) rows in one transaction."""
+        with self._lock, self._conn:
+            self._conn.executemany(
+                "INSERT OR REPLACE INTO image_hash VALUES (?, ?, ?, ?, ?)",
+                ((path, method, size, mtime_ns, _to_signed(h))
+                 for path, size, mtime_ns, h in rows))
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
@@ -0,0 +1,210 @@
+from concurrent.futures import ProcessPoolExecutor
+from collections import defaultdict, deque
+import os
+import numpy as np
+from PIL import Image
+from throttle import NO_THROTTLE
+
+HASH_METHODS = ('dhash', 'ahash')
+HASH_SIZE = 8  # 8x8 bits -> 64-bit hash
+BATCH_SIZE = 256
+
+# Number of set bits for every byte value, used to popcount uint64 arrays
+_POPCOUNT_TABLE = np.array([bin(i).count('1') for i in range(256)], dtype=np.uint8)
+
+def _popcount64(values):
+    """Number of set bits in each element of a uint64 array."""
+    if hasattr(np, 'bitwise_count'):
+        return np.bitwise_count(values)
+    as_bytes = values.reshape(values.shape + (1,)).view(np.uint8)
+    return _POPCOUNT_TABLE[as_bytes].sum(axis=-1, dtype=np.uint16)
+
+def _load_thumbnail(path, method):
+    """Decode an image as a small grayscale array sized for the hash method."""
+    width = HASH_SIZE + 1 if method == 'dhash' else HASH_SIZE
+    with Image.open(path) as im:
+        # Let JPEG decode at reduced scale; a large speedup for photos
+        im.draft('L', (width * 8, HASH_SIZE * 8))
+        im = im.convert('L').resize((width, HASH_SIZE), Image.BILINEAR)
+        return np.asarray(im, dtype=np.int16)
+
+def _hash_pixels(pixels, method):
+    """Vectorized hashes for a stack of thumbnails shaped (n, rows, cols)."""
+    if method == 'dhash':
+        bits = pixels[:, :, 1:] > pixels[:, :, :-1]
+    else:
+        bits = pixels > pixels.mean(axis=(1, 2), keepdims=True)
+    packed = np.packbits(bits.reshape(len(pixels), -1), axis=1)
+    return packed.view('>u8').ravel().astype(np.uint64)
+
+def _hash_batch(paths, method):
+    """Process-pool worker: returns [(path, hash or None)] for a batch of files."""
+    thumbnails = []
+    loaded = []
+    results = []
+    for path in paths:
+        try:
+            thumbnails.append(_load_thumbnail(path, method))
+            loaded.append(path)
+        except Exception:
+            results.append((path, None))
+    if thumbnails:
+        hashes = _hash_pixels(np.stack(thumbnails), method)
+        results.extend(zip(loaded, (int(h) for h in hashes)))
+    return results
+
+def _lower_priority():
+    from throttle import lower_priority
+    lower_priority(process=True)
+
+def compute_image_hashes(files, method='dhash', cache=None, max_workers=None,
+                         throttle=NO_THROTTLE):
+    """Perceptual hash for each (path, size, mtime_ns) in files.
+
+    Cached hashes are reused when size and mtime match; the rest are computed
+    in batches on a process pool and written back to the cache. Only a few
+    batches per worker are queued at a time, so a throttle paces the pool
+    (whose workers then also run at low priority).
+    Returns ({path: hash}, [unreadable paths]).
+    """
+    if method not in HASH_METHODS:
+        raise ValueError(f"Unknown hash method: {method}")
+
+    hashes = {}
+    stats = {}
+    pending = []
+    for path, size, mtime_ns in files:
+        cached = cache.get_image_hash(path, method, size, mtime_ns) if cache else None
+        if cached is not None:
+            hashes[path] = cached
+        else:
+            stats[path] = (size, mtime_ns)
+            pending.append(path)
+
+    failed = []
+
+    def store(results):
+        computed = []
+        for path, h in results:
+            if h is None:
+                failed.append(path)
+                continue
+            hashes[path] = h
+            computed.append((path, *stats[path], h))
+        if cache and computed:
+            cache.put_image_hashes(method, computed)
+        throttle.io(sum(stats[path][0] for path, _ in results))
+
+    if pending:
+        batches = [pending[i:i + BATCH_SIZE] for i in range(0, len(pending), BATCH_SIZE)]
+        workers = max_workers or os.cpu_count() or 1
+        running = deque()
+        with ProcessPoolExecutor(max_workers=workers,
+                                 initializer=_lower_priority if throttle.enabled else None) as pool:
+            for batch in batches:
+                running.append(pool.submit(_hash_batch, batch, method))
+                if len(running) >= 2 * workers:
+                    store(running.popleft().result())
+            while running:
+                store(running.popleft().result())
+    return hashes, failed
+
+def _segments(threshold):
+    """Split 64 bits into threshold + 1 (shift, mask) segments.
+
+    By the pigeonhole principle, two hashes within `threshold` bits of each
+    other agree exactly on at least one segment.
+    """
+    count = min(threshold + 1, 64)
+    base, extra = divmod(64, count)
+    segments = []
+    shift = 0
+    for i in range(count):
+        width = base + (1 if i < extra else 0)
+        segments.append((shift, (1 << width) - 1))
+        shift += width
+    return segments
+
+def _roots(parent, indices):
+    """Union-find roots of indices, vectorized; parent[i] <= i for every i."""
+    roots = parent[indices]
+    while True:
+        up = parent[roots]
+        if np.array_equal(up, roots):
+            return roots
+        roots = up
+
+def _union_close(parent, rows, cols, close):
+    """Merge the groups of rows[i] and cols[j] wherever close[i, j].
+
+    Each pass links every row's root to the lowest root among the columns it
+    is close to and still apart from, until no such pair is left.
+    """
+    apart = len(parent)
+    while True:
+        row_roots = _roots(parent, rows)
+        col_roots = _roots(parent, cols)
+        pending = close & (row_roots[:, None] != col_roots[None, :])
+        if not pending.any():
+            return
+        lowest = np.where(pending, col_roots[None, :], apart).min(axis=1)
+        linked = lowest < apart
+        low = np.minimum(row_roots[linked], lowest[linked])
+        high = np.maximum(row_roots[linked], lowest[linked])
+        np.minimum.at(parent, high, low)
+
+def group_similar_hashes(hashes, threshold=4, block=1024):
+    """Group 64-bit hashes whose Hamming distance is at most threshold.
+
+    Identical hashes are collapsed first, then multi-index hashing compares
+    candidates only within buckets of identical hash segments, so the work
+    grows with the number of distinct hashes per bucket rather than with all
+    n^2 pairs. Buckets whose members are already in one group are skipped.
+    Returns lists of indices, one per group of 2 or more.
+    """
+    values, inverse = np.unique(np.asarray(hashes, dtype=np.uint64), return_inverse=True)
+    inverse = inverse.ravel()
+    # Union-find over distinct values, always linking to the lower index
+    parent = np.arange(len(values))
+
+    for shift, mask in _segments(threshold):
+        keys = (values >> np.uint64(shift)) & np.uint64(mask)
+        order = np.argsort(keys, kind='stable')
+        bounds = np.flatnonzero(np.diff(keys[order])) + 1
+        for bucket in np.split(order, bounds):
+            if len(bucket) < 2:
+                continue
+            roots = _roots(parent, bucket)
+            parent[bucket] = roots
+            if (roots == roots[0]).all():
+                continue
+            bucket_values = values[bucket]
+            # Compare in block x block tiles to bound memory on huge buckets
+            for row_start in range(0, len(bucket), block):
+                rows = bucket[row_start:row_start + block]
+                row_values = bucket_values[row_start:row_start + block]
+                for col_start in range(row_start, len(bucket), block):
+                    cols = bucket[col_start:col_start + block]
+                    col_values = bucket_values[col_start:col_start + block]
+                    close = _popcount64(row_values[:, None] ^ col_values[None, :]) <= threshold
+                    if col_start == row_start:
+                        np.fill_diagonal(close, False)
+                    if close.any():
+                        _union_close(parent, rows, cols, close)
+
+    labels = _roots(parent, np.arange(len(values)))[inverse]
+    groups = defaultdict(list)
+    for i, label in enumerate(labels.tolist()):
+        groups[label].append(i)
+    return [members for members in groups.values() if len(members) > 1]
+
+def find_similar_images(files, threshold=4, method='dhash', cache=None, max_workers=None,
+                        throttle=NO_THROTTLE):
+    """Find groups of visually similar images among (path, size, mtime_ns) entries.
+
+    Returns (groups, failed) where each group is a list of (path, hash).
+    """
+    hashes, failed = compute_image_hashes(files, method, cache, max_workers, throttle)
+    paths = list(hashes)
+    groups = group_similar_hashes([hashes[p] for p in paths], threshold)
+    return [[(paths[i], hashes[paths[i]]) for i in members] for members in groups], failed
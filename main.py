@@ -1,7 +1,20 @@
+import time
+_start = time.perf_counter()
+
+import sys
 import tkinter as tk
 from ui import create_ui
 
+def report_startup_time(root):
+    """Print the time until the window is first drawn and exit (--startup-time)."""
+    root.update()
+    print(f'{{"startup_ms": {(time.perf_counter() - _start) * 1000:.1f}}}')
+    root.destroy()
+
 if __name__ == "__main__":
     root = tk.Tk()
     create_ui(root)
-    root.mainloop()
\ No newline at end of file
+    if '--startup-time' in sys.argv:
+        report_startup_time(root)
+    else:
+        root.mainloop()
\ No newline at end of file
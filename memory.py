@@ -1,10 +1,12 @@
 import tkinter as tk
 from tkinter import ttk
 import psutil
-import matplotlib.pyplot as plt
-from matplotlib.backends.backend_tkagg import FigureCanvasTkAgg
 
 def setup_memory_tab(frame):
+    # Deferred until the tab is first shown to keep matplotlib off the startup path
+    import matplotlib.pyplot as plt
+    from matplotlib.backends.backend_tkagg import FigureCanvasTkAgg
+
     details_frame = ttk.LabelFrame(frame, text="Memory Details", padding=10)
     details_frame.pack(fill='x', padx=10, pady=10)
 
@@ -0,0 +1,248 @@
+"""Lightweight instrumentation for scan and cleanup jobs.
+
+A job gets a Metrics object from new_job() and passes it to the engine
+functions as metrics=...; they record counters, per-phase times and latency
+histograms on it. When collection is off, new_job() returns NULL_METRICS,
+whose methods do nothing, and the engine skips its timing calls entirely by
+checking metrics.enabled once per job.
+
+Finished jobs are kept in recent_jobs for the diagnostics tab and can be
+appended to an NDJSON log. A single job can be profiled with cProfile or a
+low-overhead stack sampler.
+"""
+import json
+import sys
+import threading
+import time
+from collections import defaultdict, deque
+
+# Collection settings, changed from the diagnostics tab or the CLI
+collect = False
+log_path = None
+profile_next = None  # 'cprofile' or 'sample': profile the next job only
+
+recent_jobs = deque(maxlen=50)
+_recent_lock = threading.Lock()
+
+class Histogram:
+    """Latency histogram with power-of-two microsecond buckets."""
+
+    def __init__(self):
+        self.buckets = defaultdict(int)
+        self.count = 0
+        self.total = 0.0
+        self.min = None
+        self.max = None
+
+    def observe(self, seconds):
+        self.buckets[int(seconds * 1e6).bit_length()] += 1
+        self.count += 1
+        self.total += seconds
+        if self.min is None or seconds < self.min:
+            self.min = seconds
+        if self.max is None or seconds > self.max:
+            self.max = seconds
+
+    def percentile(self, q):
+        """Upper bound in seconds of the bucket holding the q-th percentile."""
+        if not self.count:
+            return None
+        rank = q / 100 * self.count
+        seen = 0
+        for bucket in sorted(self.buckets):
+            seen += self.buckets[bucket]
+            if seen >= rank:
+                return min((1 << bucket) / 1e6, self.max)
+        return self.max
+
+    def snapshot(self):
+        return {
+            'count': self.count,
+            'total_s': self.total,
+            'min_s': self.min,
+            'max_s': self.max,
+            'p50_s': self.percentile(50),
+            'p90_s': self.percentile(90),
+            'p99_s': self.percentile(99),
+        }
+
+class _Phase:
+    __slots__ = ('metrics', 'name', 'start')
+
+    def __init__(self, metrics, name):
+        self.metrics = metrics
+        self.name = name
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        self.metrics.add_time(self.name, time.perf_counter() - self.start)
+        return False
+
+class StackSampler:
+    """Samples one thread's Python stack at a fixed interval.
+
+    Stacks are counted in collapsed form ("outer;inner;leaf"), which flame
+    graph tools read directly.
+    """
+
+    def __init__(self, thread_id, interval=0.005):
+        self.thread_id = thread_id
+        self.interval = interval
+        self.stacks = defaultdict(int)
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, daemon=True)
+
+    def _run(self):
+        while not self._stop.wait(self.interval):
+            frame = sys._current_frames().get(self.thread_id)
+            stack = []
+            while frame is not None:
+                code = frame.f_code
+                stack.append(f"{code.co_name} ({code.co_filename}:{frame.f_lineno})")
+                frame = frame.f_back
+            if stack:
+                self.stacks[";".join(reversed(stack))] += 1
+
+    def start(self):
+        self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+        self._thread.join()
+
+    def dump(self, path):
+        with open(path, 'w') as f:
+            for stack, count in sorted(self.stacks.items(), key=lambda x: -x[1]):
+                f.write(f"{stack} {count}\n")
+
+class Metrics:
+    enabled = True
+
+    def __init__(self, job, profile=None):
+        self.job = job
+        self.counters = defaultdict(int)
+        self.timers = defaultdict(float)
+        self.histograms = defaultdict(Histogram)
+        self.profile = profile
+        self.profiler = None
+        self.started = time.time()
+        self.wall = None
+        self._start = None
+
+    def count(self, name, n=1):
+        self.counters[name] += n
+
+    def add_time(self, name, seconds):
+        self.timers[name] += seconds
+
+    def observe(self, name, seconds):
+        self.histograms[name].observe(seconds)
+
+    def phase(self, name):
+        """Context manager adding the time spent inside it to timer name."""
+        return _Phase(self, name)
+
+    def start(self):
+        """Start the wall clock and, if requested, the profiler for this thread."""
+        self._start = time.perf_counter()
+        if self.profile == 'cprofile':
+            import cProfile
+            self.profiler = cProfile.Profile()
+            self.profiler.enable()
+        elif self.profile == 'sample':
+            self.profiler = StackSampler(threading.get_ident())
+            self.profiler.start()
+        return self
+
+    def finish(self):
+        """Stop timing and profiling, then publish the job to recent_jobs and the log."""
+        if self._start is not None:
+            self.wall = time.perf_counter() - self._start
+        if self.profile == 'cprofile' and self.profiler:
+            self.profiler.disable()
+        elif self.profile == 'sample' and self.profiler:
+            self.profiler.stop()
+        with _recent_lock:
+            recent_jobs.append(self)
+        if log_path:
+            self.export_ndjson(log_path)
+        return self
+
+    def dump_profile(self, path):
+        """Write cProfile stats (pstats format) or collapsed sampled stacks."""
+        if self.profile == 'cprofile' and self.profiler:
+            self.profiler.dump_stats(path)
+        elif self.profile == 'sample' and self.profiler:
+            self.profiler.dump(path)
+
+    def snapshot(self):
+        return {
+            'job': self.job,
+            'started': self.started,
+            'wall_s': self.wall,
+            'counters': dict(self.counters),
+            'timers_s': dict(self.timers),
+            'histograms': {name: h.snapshot() for name, h in self.histograms.items()},
+            'profile': self.profile,
+        }
+
+    def export_ndjson(self, path):
+        """Append this job's snapshot as one line of NDJSON."""
+        with open(path, 'a') as f:
+            f.write(json.dumps(self.snapshot()) + "\n")
+
+class _NullMetrics:
+    """Stand-in used when collection is off; every operation is a no-op."""
+    enabled = False
+
+    def count(self, name, n=1):
+        pass
+
+    def add_time(self, name, seconds):
+        pass
+
+    def observe(self, name, seconds):
+        pass
+
+    def phase(self, name):
+        return _NULL_PHASE
+
+    def start(self):
+        return self
+
+    def finish(self):
+        return self
+
+class _NullPhase:
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+NULL_METRICS = _NullMetrics()
+_NULL_PHASE = _NullPhase()
+
+def new_job(job, profile=True):
+    """Metrics for a new job, or NULL_METRICS when collection is off.
+
+    Consumes profile_next, so a requested profile applies to one job only.
+    With profile=False the job is never profiled and profile_next is left
+    for the next one (e.g. for watcher batches, which run unasked).
+    Call start() on the result before running the job and finish() after.
+    """
+    global profile_next
+    if profile:
+        profile, profile_next = profile_next, None
+    else:
+        profile = None
+    if not collect and not profile:
+        return NULL_METRICS
+    return Metrics(job, profile)
+
+def get_recent_jobs():
+    with _recent_lock:
+        return list(recent_jobs)
@@ -0,0 +1,288 @@
+"""Central job scheduler for scans and cleanup work.
+
+All background work goes through one JobScheduler instead of ad-hoc
+threads:
+
+- a bounded pool of worker threads, so concurrent jobs cannot saturate the
+  disk;
+- priorities (lower runs first) with FIFO order within a priority;
+- coalescing: submitting the same request (key, params, priority and mode)
+  as a pending or running job returns that job and attaches the new
+  callbacks to it; a different request with the same key is queued, or
+  with replace=True cancels the earlier jobs;
+- cooperative cancellation through a CancelToken that engine functions poll;
+- a single dispatch queue drained on the Tk main loop, so job callbacks are
+  the only code that touches widgets and always run on the UI thread;
+- background (low-impact) jobs, which run on their own worker thread with
+  lowered CPU and I/O priority and get a throttle (see throttle.py).
+
+Job functions are called as func(job, *args, **kwargs) on a worker thread
+and should pass job.token, job.metrics and job.throttle to the engine.
+"""
+import itertools
+import logging
+import queue
+import threading
+import time
+import metrics
+
+log = logging.getLogger(__name__)
+
+PRIORITY_HIGH = 0
+PRIORITY_NORMAL = 10
+PRIORITY_LOW = 20
+
+class Cancelled(Exception):
+    """Raised inside a job when its CancelToken has been cancelled."""
+
+class CancelToken:
+    def __init__(self):
+        self._event = threading.Event()
+
+    def cancel(self):
+        self._event.set()
+
+    @property
+    def cancelled(self):
+        return self._event.is_set()
+
+    def check(self):
+        """Raise Cancelled if cancellation was requested."""
+        if self._event.is_set():
+            raise Cancelled()
+
+    def wait(self, timeout):
+        """Sleep up to timeout seconds; returns True if cancelled meanwhile."""
+        return self._event.wait(timeout)
+
+class _NeverCancelled:
+    """Default token for callers outside the scheduler; never cancels."""
+    cancelled = False
+
+    def check(self):
+        pass
+
+    def wait(self, timeout):
+        time.sleep(timeout)
+        return False
+
+NEVER_CANCELLED = _NeverCancelled()
+
+class Job:
+    def __init__(self, scheduler, name, func, args, kwargs, key, priority, background=False,
+                 params=None):
+        self.scheduler = scheduler
+        self.name = name
+        self.func = func
+        self.args = args
+        self.kwargs = kwargs
+        self.key = key
+        self.priority = priority
+        self.background = background
+        self.params = params
+        self.token = CancelToken()
+        self.metrics = metrics.NULL_METRICS
+        self.throttle = None  # set when the job starts
+        self.state = 'pending'
+        self.result = None
+        self.error = None
+        self._callbacks = []
+        self._done = threading.Event()
+
+    def add_callbacks(self, on_done=None, on_error=None, on_finish=None):
+        self._callbacks.append((on_done, on_error, on_finish))
+
+    def cancel(self):
+        """Request cancellation; a pending job will not start."""
+        self.token.cancel()
+
+    @property
+    def finished(self):
+        return self._done.is_set()
+
+    def wait(self, timeout=None):
+        return self._done.wait(timeout)
+
+class JobScheduler:
+    def __init__(self, max_workers=2):
+        self.max_workers = max_workers
+        self._queue = queue.PriorityQueue()
+        self._counter = itertools.count()
+        self._active = {}  # key -> pending or running Jobs, oldest first
+        self._lock = threading.Lock()
+        self._workers = []
+        self._background_queue = queue.PriorityQueue()
+        self._background_worker = None
+        self._background_priority = []
+        self._ui_queue = None
+
+    # Submitting and cancelling
+
+    def submit(self, name, func, *args, key=None, params=None, replace=False,
+               priority=PRIORITY_NORMAL, background=False,
+               on_done=None, on_error=None, on_finish=None, **kwargs):
+        """Queue func(job, *args, **kwargs) and return its Job.
+
+        on_done(job) runs after success, on_error(job) after an exception
+        other than cancellation, and on_finish(job) always; all three run on
+        the UI thread once attach() has been called.
+
+        params describes what the job will do (e.g. the directory it scans).
+        A job is only joined by a later submit with the same key, params,
+        priority and background mode; jobs without params are never joined.
+        Otherwise the new job is queued as well, after cancelling the jobs
+        with the same key if replace is true.
+
+        Background jobs run one at a time on a low-priority worker thread and
+        are throttled with the settings in throttle.py.
+        """
+        with self._lock:
+            same_key = self._active.get(key, []) if key is not None else []
+            for existing in same_key:
+                if (params is not None and existing.params == params
+                        and existing.priority == priority and existing.background == background
+                        and not existing.token.cancelled):
+                    existing.add_callbacks(on_done, on_error, on_finish)
+                    return existing
+            if replace:
+                for existing in same_key:
+                    existing.cancel()
+            job = Job(self, name, func, args, kwargs, key, priority, background, params)
+            job.add_callbacks(on_done, on_error, on_finish)
+            if key is not None:
+                self._active.setdefault(key, []).append(job)
+            if background:
+                self._background_queue.put((priority, next(self._counter), job))
+                if self._background_worker is None:
+                    self._background_worker = threading.Thread(
+                        target=self._work, args=(self._background_queue, True),
+                        name="job-worker-background", daemon=True)
+                    self._background_worker.start()
+            else:
+                self._queue.put((priority, next(self._counter), job))
+                if len(self._workers) < self.max_workers:
+                    worker = threading.Thread(target=self._work, args=(self._queue,),
+                                              name=f"job-worker-{len(self._workers)}", daemon=True)
+                    self._workers.append(worker)
+                    worker.start()
+        return job
+
+    def cancel(self, key):
+        """Cancel every pending or running job with this key; returns them."""
+        with self._lock:
+            jobs = list(self._active.get(key, []))
+        for job in jobs:
+            job.cancel()
+        return jobs
+
+    def is_active(self, key):
+        with self._lock:
+            return key in self._active
+
+    # Workers
+
+    def _work(self, jobs, background=False):
+        if background:
+            from throttle import lower_priority
+            # Nice values cannot be raised again without privileges, so this
+            # thread only ever runs background jobs
+            self._background_priority = lower_priority()
+        while True:
+            _, _, job = jobs.get()
+            if job.token.cancelled:
+                job.state = 'cancelled'
+            else:
+                self._run(job)
+            with self._lock:
+                same_key = self._active.get(job.key, [])
+                if job in same_key:
+                    same_key.remove(job)
+                    if not same_key:
+                        del self._active[job.key]
+            self._dispatch(self._complete, job)
+
+    def _run(self, job):
+        job.state = 'running'
+        job.metrics = metrics.new_job(job.name).start()
+        if job.background:
+            from throttle import Throttle
+            job.throttle = Throttle.from_settings(job.metrics, job.token)
+            job.metrics.count('background')
+            for setting in self._background_priority:
+                job.metrics.count(f'background.{setting}')
+        else:
+            from throttle import NO_THROTTLE
+            job.throttle = NO_THROTTLE
+        try:
+            job.result = job.func(job, *job.args, **job.kwargs)
+            job.state = 'done'
+        except Cancelled:
+            job.state = 'cancelled'
+        except Exception as e:
+            job.error = e
+            job.state = 'failed'
+
+    def _complete(self, job):
+        """Run the job's callbacks (on the UI thread when attached)."""
+        with job.metrics.phase('ui'):
+            for on_done, on_error, on_finish in job._callbacks:
+                callbacks = [on_done if job.state == 'done' else
+                             on_error if job.state == 'failed' else None, on_finish]
+                # on_finish runs even if on_done or on_error failed, so
+                # buttons it re-enables never stay disabled
+                for callback in callbacks:
+                    if callback is None:
+                        continue
+                    try:
+                        callback(job)
+                    except Exception:
+                        job.metrics.count('ui.callback_errors')
+                        log.exception("Error in callback for job %s", job.name)
+        if job.state == 'cancelled':
+            job.metrics.count('cancelled')
+        job.metrics.finish()
+        job._done.set()
+
+    # UI thread dispatch
+
+    def attach(self, root, interval=50):
+        """Deliver callbacks on root's Tk main loop, polling every interval ms."""
+        self._ui_queue = queue.Queue()
+
+        def pump():
+            # A failing callback must not stop delivery to every later job
+            try:
+                while True:
+                    try:
+                        callback, args = self._ui_queue.get_nowait()
+                    except queue.Empty:
+                        break
+                    try:
+                        callback(*args)
+                    except Exception:
+                        log.exception("Error in UI callback %r", callback)
+            finally:
+                root.after(interval, pump)
+
+        root.after(interval, pump)
+
+    def _dispatch(self, callback, *args):
+        if self._ui_queue is None:
+            callback(*args)
+        else:
+            self._ui_queue.put((callback, args))
+
+    def call_in_ui(self, callback, *args):
+        """Run callback(*args) on the UI thread (immediately if not attached)."""
+        self._dispatch(callback, *args)
+
+_scheduler = None
+_scheduler_lock = threading.Lock()
+
+def get_scheduler():
+    """The application-wide scheduler, created on first use."""
+    global _scheduler
+    with _scheduler_lock:
+        if _scheduler is None:
+            _scheduler = JobScheduler()
+        return _scheduler
@@ -1,35 +1,12 @@
 import tkinter as tk
 from tkinter import ttk
 import psutil
-import matplotlib.pyplot as plt
-from matplotlib.backends.backend_tkagg import FigureCanvasTkAgg
-import os
-import threading
 from collections import defaultdict
 import mimetypes
-
-def get_file_category(file_path):
-    """Determine the category of a file based on its extension."""
-    try:
-        ext = os.path.splitext(file_path)[1].lower()
-        
-        # Quick extension mapping for common file types
-        if ext in {'.jpg', '.jpeg', '.png', '.gif', '.bmp', '.webp'}:
-            return 'Images'
-        elif ext in {'.mp4', '.avi', '.mov', '.mkv', '.wmv'}:
-            return 'Videos'
-        elif ext in {'.mp3', '.wav', '.flac', '.m4a', '.ogg'}:
-            return 'Audio'
-        elif ext in {'.doc', '.docx', '.pdf', '.txt', '.xlsx', '.csv'}:
-            return 'Documents'
-        elif ext in {'.exe', '.msi', '.app', '.dmg', '.deb', '.rpm'}:
-            return 'Applications'
-        elif ext in {'.dll', '.sys', '.driver'}:
-            return 'System'
-        
-        return 'Other'
-    except:
-        return 'Other'
+import time
+import engine
+import metrics
+from scheduler import get_scheduler, PRIORITY_LOW
 
 def setup_storage_tab(frame):
     details_frame = ttk.LabelFrame(frame, text="Storage Details", padding=10)
@@ -37,7 +14,19 @@ def setup_storage_tab(frame):
 
     # Status label for scanning
     status_label = ttk.Label(details_frame, text="")
-    status_label.pack(fill='x', padx=5, pady=2)
+    status_label.pack(side='left', fill='x', expand=True, padx=5, pady=2)
+    cancel_button = ttk.Button(details_frame, text="Cancel",
+                               command=lambda: get_scheduler().cancel('storage.scan'))
+    cancel_button.pack(side='right', padx=5, pady=2)
+    scan_button = ttk.Button(details_frame, text="Scan Now", command=lambda: update_storage_info())
+    scan_button.pack(side='right', padx=5, pady=2)
+    low_impact = tk.BooleanVar(value=False)
+    ttk.Checkbutton(details_frame, text="Low impact", variable=low_impact).pack(side='right', padx=5, pady=2)
+    # Live updates keep the totals current from filesystem events after a scan
+    live_updates = tk.BooleanVar(value=False)
+    ttk.Checkbutton(details_frame, text="Live updates", variable=live_updates,
+                    command=lambda: stop_watching() if not live_updates.get() else None
+                    ).pack(side='right', padx=5, pady=2)
 
     # Category frame with Treeview
     category_frame = ttk.LabelFrame(frame, text="Usage by Category", padding=10)
@@ -59,45 +48,99 @@ def setup_storage_tab(frame):
     category_tree.column('Size', width=100)
     category_tree.column('Percentage', width=100)
 
-    # Create figure for category chart
-    fig, ax = plt.subplots(figsize=(8, 6))
-    canvas = FigureCanvasTkAgg(fig, master=frame)
-    canvas.get_tk_widget().pack(fill='both', expand=True, padx=10, pady=10)
-
-    def scan_directory(path, categories, status_label):
-        try:
-            for root, _, files in os.walk(path):
-                for file in files:
-                    try:
-                        file_path = os.path.join(root, file)
-                        if os.path.exists(file_path):
-                            size = os.path.getsize(file_path)
-                            category = get_file_category(file_path)
-                            categories[category] += size
-                    except (PermissionError, OSError):
-                        continue
-        except (PermissionError, OSError):
-            pass
-
-    def update_storage_info():
-        drive = 'C:\\' if os.name == 'nt' else '/'
+    # The category chart is created on first draw so matplotlib is only
+    # imported once there is something to show
+    chart = {}
+
+    def get_chart():
+        if not chart:
+            import matplotlib.pyplot as plt
+            from matplotlib.backends.backend_tkagg import FigureCanvasTkAgg
+            fig, ax = plt.subplots(figsize=(8, 6))
+            canvas = FigureCanvasTkAgg(fig, master=frame)
+            canvas.get_tk_widget().pack(fill='both', expand=True, padx=10, pady=10)
+            chart.update(plt=plt, fig=fig, ax=ax, canvas=canvas)
+        return chart['plt'], chart['ax'], chart['canvas']
+
+    live = {}
+
+    def stop_watching():
+        watcher = live.pop('watcher', None)
+        if watcher:
+            watcher.stop()
+
+    def update_storage_info(priority=None, background=None):
+        drive = engine.default_scan_root()
         status_label.config(text="Scanning storage...")
-
+        watch = live_updates.get()
+        stop_watching()
+
+        def scan(job):
+            if not watch:
+                categories = defaultdict(int)
+                engine.scan_directory(drive, categories, job.metrics, job.token, job.throttle)
+                return categories
+
+            from watcher import Watcher, StorageIndex
+
+            def apply_changes(batch):
+                batch_job = metrics.new_job('watch.storage', profile=False).start()
+                try:
+                    index.apply(batch, batch_job)
+                finally:
+                    batch_job.finish()
+                get_scheduler().call_in_ui(show_live_update, watcher, index.totals())
+
+            # Start watching before the walk so changes made during it are not
+            # lost. Only the root's own filesystem is watched: other mounts
+            # (including /proc and /sys) are picked up by the next refresh.
+            watcher = Watcher(drive, apply_changes, poll_interval=300,
+                              one_filesystem=True).open(job.token, job.throttle)
+            try:
+                index = StorageIndex.scan(drive, job.metrics, job.token, job.throttle)
+            except BaseException:
+                watcher.stop()
+                raise
+            live['watcher'] = watcher.start()
+            return index.totals()
+
+        # Refreshing with the same settings joins a running scan; otherwise
+        # the new scan replaces it
+        kwargs = {'priority': priority} if priority is not None else {}
+        if background is None:
+            background = low_impact.get()
+        get_scheduler().submit('scan_directory', scan, key='storage.scan', params=(drive, watch),
+                               replace=True, background=background,
+                               on_done=update_ui, on_finish=scan_finished, **kwargs)
+
+    def update_ui(job):
         # Clear previous data
         for item in category_tree.get_children():
             category_tree.delete(item)
-
-        # Initialize categories
-        categories = defaultdict(int)
-
-        # Start scanning in a separate thread
-        def scan_thread():
-            scan_directory(drive, categories, status_label)
-            frame.after(0, lambda: update_ui(categories))
-
-        threading.Thread(target=scan_thread, daemon=True).start()
-
-    def update_ui(categories):
+        draw_results(job.result)
+        if not live_updates.get():
+            stop_watching()  # unticked while the scan was running
+        elif 'watcher' in live:
+            status_label.config(text=f"Scan complete! Watching for changes ({live['watcher'].mode})")
+
+    def show_live_update(watcher, categories):
+        if live.get('watcher') is not watcher:
+            return  # stopped or replaced since this batch was applied
+        for item in category_tree.get_children():
+            category_tree.delete(item)
+        draw_results(categories)
+        status = f"Updated {time.strftime('%H:%M:%S')} ({watcher.mode})"
+        if watcher.errors:
+            status += f", {len(watcher.errors)} failed updates, last: {watcher.errors[-1][1]}"
+        status_label.config(text=status)
+
+    def scan_finished(job):
+        if job.state == 'cancelled':
+            status_label.config(text="Scan cancelled")
+        elif job.state == 'failed':
+            status_label.config(text=f"Scan failed: {str(job.error)}")
+
+    def draw_results(categories):
         # Calculate percentages and sort by size
         total_size = sum(categories.values())
         sorted_categories = sorted(categories.items(), key=lambda x: x[1], reverse=True)
@@ -112,6 +155,7 @@ def setup_storage_tab(frame):
             ), text=category)
 
         # Update category chart
+        plt, ax, canvas = get_chart()
         ax.clear()
         categories_to_plot = sorted_categories[:6]  # Show top 6 categories
         sizes = [size / (1024**3) for _, size in categories_to_plot]
@@ -127,8 +171,15 @@ def setup_storage_tab(frame):
 
         status_label.config(text="Scan complete!")
 
-    # Initial update
+    # The tab is built when first opened, so this scan starts on demand
     update_storage_info()
 
     # Schedule periodic updates
-    frame.after(300000, update_storage_info)  # Update every 5 minutes
\ No newline at end of file
+    def periodic_refresh():
+        # Unattended refreshes always run in low impact mode, and are not
+        # needed while live updates keep the totals current or a scan is running
+        if 'watcher' not in live and not get_scheduler().is_active('storage.scan'):
+            update_storage_info(PRIORITY_LOW, background=True)
+        frame.after(300000, periodic_refresh)  # Update every 5 minutes
+
+    frame.after(300000, periodic_refresh)
@@ -0,0 +1,38 @@
+import numpy as np
+import pytest
+import chunk_dups
+
+@pytest.fixture
+def sample(tmp_path):
+    rng = np.random.default_rng(0)
+    data = rng.integers(0, 256, size=3 << 20, dtype=np.uint8).tobytes()
+    path = tmp_path / 'sample.bin'
+    path.write_bytes(data)
+    return str(path), data
+
+def test_gear_hashes_match_the_recurrence():
+    data = bytes(range(256)) * 2
+    h = 0
+    expected = []
+    for byte in data:
+        h = ((h << 1) + int(chunk_dups._GEAR[byte])) % (1 << 64)
+        expected.append(h)
+    assert chunk_dups.gear_hashes(data).tolist() == expected
+
+@pytest.mark.parametrize('read_size', [4096, 65537, 300_000, 1 << 20])
+def test_boundaries_do_not_depend_on_read_size(sample, monkeypatch, read_size):
+    path, data = sample
+    # One read of the whole segment is the reference
+    monkeypatch.setattr(chunk_dups, 'READ_SIZE', len(data))
+    expected = chunk_dups.chunk_segment(path, 0, len(data))
+    monkeypatch.setattr(chunk_dups, 'READ_SIZE', read_size)
+    assert chunk_dups.chunk_segment(path, 0, len(data)) == expected
+
+def test_chunks_cover_the_segment_within_limits(sample):
+    path, data = sample
+    offset, length = 12345, 2 << 20
+    lengths, digests = chunk_dups.chunk_segment(path, offset, length)
+    lengths = np.frombuffer(lengths, dtype=np.uint32).tolist()
+    assert sum(lengths) == length
+    assert all(chunk_dups.MIN_CHUNK <= n <= chunk_dups.MAX_CHUNK for n in lengths[:-1])
+    assert len(digests) == len(lengths) * chunk_dups.DIGEST_SIZE
@@ -0,0 +1,44 @@
+import hashlib
+import os
+from columnar import FileTable, open_table
+
+def _table():
+    table = FileTable(digest_size=32)
+    rows = [
+        ('/data', 'a.bin', 10, 1_000, 11, b'x', 1),
+        ('/data/sub', 'b.bin', 10, 2_000, 12, b'x', 1),
+        ('/data/sub', 'café.txt', 3, -5, 13, b'y', 1),
+        ('/other', 'link', 10, 1_000, 11, b'x', 2),
+        ('/data', 'a-link', 10, 1_000, 11, b'x', 1),
+    ]
+    for directory, name, size, mtime_ns, inode, data, device in rows:
+        table.append(directory, name, size, mtime_ns, inode,
+                     hashlib.sha256(data).digest(), device)
+    return table
+
+def test_save_and_open_round_trip(tmp_path):
+    table = _table()
+    path = str(tmp_path / 'scan.table')
+    table.save(path)
+    assert not os.path.exists(path + '.tmp')
+
+    with open_table(path) as mapped:
+        assert len(mapped) == len(table)
+        assert mapped.digest_size == table.digest_size
+        assert list(mapped.rows()) == list(table.rows())
+        assert [mapped.device(i) for i in range(len(mapped))] == \
+            [table.device(i) for i in range(len(table))]
+        assert list(mapped.digest_order()) == list(table.digest_order())
+        assert mapped.duplicate_groups() == table.duplicate_groups()
+        x = hashlib.sha256(b'x').hexdigest()
+        assert sorted(mapped.find_digest(x)) == [0, 1, 3, 4]
+        assert list(mapped.select(min_size=5, under='/data')) == [0, 1, 4]
+
+def test_duplicate_groups_count_hardlinks_once():
+    table = _table()
+    groups = table.duplicate_groups()
+    # Rows 0 and 4 are one inode, row 3 has the same inode on another device
+    assert [path for path, _, _ in groups[hashlib.sha256(b'x').hexdigest()]] == \
+        ['/data/a.bin', '/data/sub/b.bin', '/other/link', '/data/a-link']
+    assert table.duplicate_groups(rows={0, 4}) == {}
+    assert len(table.duplicate_groups(rows={0, 3})) == 1
@@ -0,0 +1,33 @@
+import os
+import pytest
+import engine
+
+def _write(path, data, mode):
+    with open(path, 'wb') as f:
+        f.write(data)
+    os.chmod(path, mode)
+    return os.stat(path)
+
+def test_link_over_refuses_hardlink_with_different_mode(tmp_path):
+    keep = tmp_path / 'keep'
+    dup = tmp_path / 'dup'
+    keep_st = _write(keep, b'same contents', 0o644)
+    dup_st = _write(dup, b'same contents', 0o600)
+
+    with pytest.raises(OSError, match="permissions differ"):
+        engine._link_over(str(keep), str(dup), 'hardlink', keep_st, dup_st)
+
+    # The copy is untouched and no temporary file is left behind
+    after = os.stat(dup)
+    assert (after.st_ino, after.st_mode) == (dup_st.st_ino, dup_st.st_mode)
+    assert sorted(os.listdir(tmp_path)) == ['dup', 'keep']
+
+def test_link_over_hardlinks_when_metadata_matches(tmp_path):
+    keep = tmp_path / 'keep'
+    dup = tmp_path / 'dup'
+    keep_st = _write(keep, b'same contents', 0o644)
+    dup_st = _write(dup, b'same contents', 0o644)
+
+    assert engine._link_over(str(keep), str(dup), 'hardlink', keep_st, dup_st) == 'hardlink'
+    assert os.stat(dup).st_ino == keep_st.st_ino
+    assert sorted(os.listdir(tmp_path)) == ['dup', 'keep']
@@ -0,0 +1,47 @@
+import random
+import pytest
+from image_dups import group_similar_hashes
+
+def _brute_force(hashes, threshold):
+    """Connected components of the graph of pairs within threshold bits."""
+    parent = list(range(len(hashes)))
+
+    def find(i):
+        while parent[i] != i:
+            i = parent[i]
+        return i
+
+    for i in range(len(hashes)):
+        for j in range(i + 1, len(hashes)):
+            if bin(hashes[i] ^ hashes[j]).count('1') <= threshold:
+                parent[find(j)] = find(i)
+    groups = {}
+    for i in range(len(hashes)):
+        groups.setdefault(find(i), []).append(i)
+    return sorted(sorted(g) for g in groups.values() if len(g) > 1)
+
+def _clustered_hashes(rng, clusters, per_cluster, max_flips):
+    hashes = []
+    for _ in range(clusters):
+        base = rng.getrandbits(64)
+        for _ in range(per_cluster):
+            h = base
+            for bit in rng.sample(range(64), rng.randint(0, max_flips)):
+                h ^= 1 << bit
+            hashes.append(h)
+    rng.shuffle(hashes)
+    return hashes
+
+@pytest.mark.parametrize('threshold', [0, 2, 4, 10])
+@pytest.mark.parametrize('block', [3, 1024])
+def test_matches_brute_force(threshold, block):
+    rng = random.Random(threshold * 1000 + block)
+    hashes = _clustered_hashes(rng, clusters=40, per_cluster=6, max_flips=6)
+    hashes += [rng.getrandbits(64) for _ in range(60)]
+    result = sorted(sorted(g) for g in group_similar_hashes(hashes, threshold, block))
+    assert result == _brute_force(hashes, threshold)
+
+def test_chains_are_grouped_transitively():
+    # Each hash is 3 bits from the next, but the ends are 9 bits apart
+    hashes = [0, 0b111, 0b111111, 0b111111111]
+    assert sorted(sorted(g) for g in group_similar_hashes(hashes, threshold=3)) == [[0, 1, 2, 3]]
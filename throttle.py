@@ -0,0 +1,189 @@
+"""Low-impact background mode for scans and cleanup jobs.
+
+A background job gets a Throttle and passes it to the engine functions as
+throttle=...; they report every file and the bytes they read or write, and
+the throttle sleeps as needed to keep the job under its files/s and bytes/s
+token-bucket limits. Every check_interval seconds it also samples the
+1-minute load average and disk busy time, and backs off while either is
+above its threshold. When a job is not throttled it uses NO_THROTTLE, whose
+methods do nothing; the engine checks throttle.enabled once per job.
+
+Time spent waiting is recorded on the job's metrics as throttle.wait and
+throttle.backoff, with the number of waits in the throttle.* counters.
+
+lower_priority() drops the CPU and I/O priority of the calling thread; the
+scheduler runs background jobs on a worker thread that calls it once.
+"""
+import os
+import sys
+import threading
+import time
+from metrics import NULL_METRICS
+from scheduler import NEVER_CANCELLED
+
+# Background mode settings, changed from the CLI
+bytes_per_s = 20 * 1024 * 1024
+files_per_s = 2000
+load_threshold = 1.0       # 1-minute load average per CPU
+disk_busy_threshold = 0.5  # fraction of wall time the busiest disk was busy
+niceness = 10
+
+class TokenBucket:
+    """Allows rate units per second on average, with bursts of up to one second."""
+
+    def __init__(self, rate):
+        self.rate = rate
+        self.tokens = rate
+        self.updated = time.monotonic()
+
+    def take(self, n):
+        """Take n tokens; returns how long to sleep to stay under the rate.
+
+        The balance may go negative, so a large request is paid for by the
+        wait that follows it rather than refused.
+        """
+        now = time.monotonic()
+        self.tokens = min(self.rate, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+        self.tokens -= n
+        return -self.tokens / self.rate if self.tokens < 0 else 0.0
+
+class _SystemLoad:
+    """Samples load average and disk busy time; shared by all throttles."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._last_disk = None
+
+    def load_per_cpu(self):
+        try:
+            return os.getloadavg()[0] / (os.cpu_count() or 1)
+        except (AttributeError, OSError):
+            return None
+
+    def disk_busy(self):
+        """Busy fraction of the busiest disk since the previous call, if known."""
+        try:
+            import psutil
+            counters = psutil.disk_io_counters(perdisk=True)
+        except Exception:
+            return None
+        now = time.monotonic()
+        busy = {disk: c.busy_time for disk, c in (counters or {}).items()
+                if hasattr(c, 'busy_time')}
+        with self._lock:
+            last, self._last_disk = self._last_disk, (now, busy)
+        if not busy or last is None or now <= last[0]:
+            return None
+        elapsed_ms = (now - last[0]) * 1000
+        return max((ms - last[1].get(disk, ms)) / elapsed_ms for disk, ms in busy.items())
+
+_system = _SystemLoad()
+
+class Throttle:
+    enabled = True
+
+    def __init__(self, bytes_per_s=None, files_per_s=None, load_threshold=None,
+                 disk_busy_threshold=None, metrics=NULL_METRICS, cancel=NEVER_CANCELLED,
+                 check_interval=0.5, max_backoff=5.0):
+        self.bytes = TokenBucket(bytes_per_s) if bytes_per_s else None
+        self.files = TokenBucket(files_per_s) if files_per_s else None
+        self.load_threshold = load_threshold
+        self.disk_busy_threshold = disk_busy_threshold
+        self.metrics = metrics
+        self.cancel = cancel
+        self.check_interval = check_interval
+        self.max_backoff = max_backoff
+        self._next_check = 0.0
+
+    @classmethod
+    def from_settings(cls, metrics=NULL_METRICS, cancel=NEVER_CANCELLED):
+        """A throttle using the module-level background mode settings."""
+        return cls(bytes_per_s, files_per_s, load_threshold, disk_busy_threshold,
+                   metrics, cancel)
+
+    def file(self, nbytes=0):
+        """Account for one file (and nbytes read or written for it)."""
+        delay = self.files.take(1) if self.files else 0.0
+        if nbytes and self.bytes:
+            delay = max(delay, self.bytes.take(nbytes))
+        self._pace(delay)
+
+    def io(self, nbytes):
+        """Account for nbytes read or written within a file."""
+        self._pace(self.bytes.take(nbytes) if self.bytes else 0.0)
+
+    def _pace(self, delay):
+        if delay > 0:
+            self.metrics.count('throttle.waits')
+            with self.metrics.phase('throttle.wait'):
+                self._sleep(delay)
+        if time.monotonic() >= self._next_check:
+            self._back_off()
+            self._next_check = time.monotonic() + self.check_interval
+
+    def _sleep(self, seconds):
+        if self.cancel.wait(seconds):
+            self.cancel.check()
+
+    def _busy(self):
+        if self.load_threshold is not None:
+            load = _system.load_per_cpu()
+            if load is not None and load > self.load_threshold:
+                return 'load'
+        if self.disk_busy_threshold is not None:
+            busy = _system.disk_busy()
+            if busy is not None and busy > self.disk_busy_threshold:
+                return 'disk'
+        return None
+
+    def _back_off(self):
+        """Sleep with exponential backoff while the system is busy."""
+        delay = self.check_interval
+        reason = self._busy()
+        while reason:
+            self.metrics.count('throttle.backoffs')
+            self.metrics.count(f'throttle.backoffs.{reason}')
+            with self.metrics.phase('throttle.backoff'):
+                self._sleep(delay)
+            delay = min(delay * 2, self.max_backoff)
+            reason = self._busy()
+
+class _NoThrottle:
+    """Stand-in for jobs that run at full speed; every operation is a no-op."""
+    enabled = False
+
+    def file(self, nbytes=0):
+        pass
+
+    def io(self, nbytes):
+        pass
+
+NO_THROTTLE = _NoThrottle()
+
+def lower_priority(process=False):
+    """Lower the CPU and I/O priority of the calling thread.
+
+    Only Linux keeps nice values and I/O priorities per thread, so elsewhere
+    nothing is changed unless process=True, which lowers the whole process
+    (as the command line does). Returns the names of the settings applied.
+    """
+    applied = []
+    per_thread = sys.platform.startswith('linux')
+    if not (per_thread or process):
+        return applied
+    try:
+        os.nice(niceness)
+        applied.append('nice')
+    except (AttributeError, OSError):
+        pass
+    try:
+        import psutil
+        if per_thread:
+            psutil.Process(threading.get_native_id()).ionice(psutil.IOPRIO_CLASS_IDLE)
+        else:
+            psutil.Process().ionice(psutil.IOPRIO_VERYLOW)
+        applied.append('ionice')
+    except Exception:
+        pass
+    return applied
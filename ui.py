@@ -1,10 +1,18 @@
 import tkinter as tk
 from tkinter import ttk
-from cleanup import setup_cleanup_tab
-from storage import setup_storage_tab
-from memory import setup_memory_tab
-from deep_clean import setup_deep_clean_tab
-from recycle_bin import setup_recycle_bin_tab
+import importlib
+from scheduler import get_scheduler
+
+# (tab title, module, setup function). Modules are imported and tabs built
+# the first time a tab is selected, so startup only pays for the visible tab.
+TABS = [
+    ('Cleanup', 'cleanup', 'setup_cleanup_tab'),
+    ('Storage', 'storage', 'setup_storage_tab'),
+    ('Memory', 'memory', 'setup_memory_tab'),
+    ('Deep Clean', 'deep_clean', 'setup_deep_clean_tab'),
+    ('Recycle Bin', 'recycle_bin', 'setup_recycle_bin_tab'),
+    ('Diagnostics', 'diagnostics', 'setup_diagnostics_tab'),
+]
 
 def create_ui(root):
     root.title("Smart System Cleaner")
@@ -22,29 +30,27 @@ def create_ui(root):
     style.configure('TButton', background="#E0E0E0", font=('Helvetica', 12), relief='flat')
     style.map('TButton', background=[('active', '#D0D0D0')])
 
+    # Job callbacks from the worker threads are delivered on this main loop
+    get_scheduler().attach(root)
+
     notebook = ttk.Notebook(root)
     notebook.pack(fill='both', expand=True, padx=20, pady=20)
 
     # Tabs
-    cleanup_frame = ttk.Frame(notebook)
-    notebook.add(cleanup_frame, text='Cleanup')
-    setup_cleanup_tab(cleanup_frame)
-
-    storage_frame = ttk.Frame(notebook)
-    notebook.add(storage_frame, text='Storage')
-    setup_storage_tab(storage_frame)
-
-    memory_frame = ttk.Frame(notebook)
-    notebook.add(memory_frame, text='Memory')
-    setup_memory_tab(memory_frame)
-
-    deep_clean_frame = ttk.Frame(notebook)
-    notebook.add(deep_clean_frame, text='Deep Clean')
-    setup_deep_clean_tab(deep_clean_frame)
-
-    recycle_bin_frame = ttk.Frame(notebook)
-    notebook.add(recycle_bin_frame, text='Recycle Bin')
-    setup_recycle_bin_tab(recycle_bin_frame)
+    pending = {}
+    for title, module_name, setup_name in TABS:
+        tab_frame = ttk.Frame(notebook)
+        notebook.add(tab_frame, text=title)
+        pending[str(tab_frame)] = (tab_frame, module_name, setup_name)
+
+    def build_selected_tab(event=None):
+        tab = pending.pop(notebook.select(), None)
+        if tab:
+            tab_frame, module_name, setup_name = tab
+            getattr(importlib.import_module(module_name), setup_name)(tab_frame)
+
+    notebook.bind('<<NotebookTabChanged>>', build_selected_tab)
+    build_selected_tab()
 
     # Subtle shadow effect
     shadow = tk.Frame(root, bg="#D0D0D0", height=2)
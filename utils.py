@@ -1,26 +1,48 @@
 import os
 import random
-from recycle_bin import RecycleBin
+from engine import RecycleBin
+from metrics import NULL_METRICS
+from throttle import NO_THROTTLE
 
-def secure_delete(path, passes=3):
+# Overwrite in chunks so large files do not need a buffer of their full size
+OVERWRITE_CHUNK = 1 << 20
+
+def secure_delete(path, passes=3, metrics=NULL_METRICS, throttle=NO_THROTTLE):
     try:
         # Move to recycle bin first
-        recycle_bin = RecycleBin()
-        recycle_bin.move_to_bin(path)
+        with metrics.phase('recycle'):
+            recycle_bin = RecycleBin(metrics)
+            recycle_bin.move_to_bin(path)
     except Exception as e:
         print(f"Failed to move to recycle bin: {str(e)}")
         # If recycling fails, proceed with secure deletion
-        if os.path.isfile(path):
-            length = os.path.getsize(path)
-            with open(path, "ba+") as f:
+        overwrite_and_remove(path, passes, metrics, throttle)
+
+def overwrite_and_remove(path, passes=3, metrics=NULL_METRICS, throttle=NO_THROTTLE):
+    """Overwrite a file, or every file under a directory, with random data and remove it.
+
+    Each pass is flushed to disk before the next one starts.
+    """
+    if os.path.isfile(path):
+        length = os.path.getsize(path)
+        with metrics.phase('overwrite'):
+            with open(path, "r+b") as f:
                 for _ in range(passes):
                     f.seek(0)
-                    f.write(os.urandom(length))
-            os.remove(path)
-        elif os.path.isdir(path):
-            for root, dirs, files in os.walk(path, topdown=False):
-                for file in files:
-                    secure_delete(os.path.join(root, file), passes)
-                for d in dirs:
-                    os.rmdir(os.path.join(root, d))
-            os.rmdir(path)
\ No newline at end of file
+                    for offset in range(0, length, OVERWRITE_CHUNK):
+                        chunk = min(OVERWRITE_CHUNK, length - offset)
+                        f.write(os.urandom(chunk))
+                        throttle.io(chunk)
+                    f.flush()
+                    os.fsync(f.fileno())
+        throttle.file()
+        metrics.count('overwrite.files')
+        metrics.count('overwrite.bytes', length * passes)
+        os.remove(path)
+    elif os.path.isdir(path):
+        for root, dirs, files in os.walk(path, topdown=False):
+            for file in files:
+                overwrite_and_remove(os.path.join(root, file), passes, metrics, throttle)
+            for d in dirs:
+                os.rmdir(os.path.join(root, d))
+        os.rmdir(path)
@@ -0,0 +1,620 @@
+"""Live filesystem change tracking for scan results.
+
+A Watcher reports which directories under a root changed, coalesced into
+batches, so the Storage and Duplicate views can be kept current without a
+full rescan. On Linux it uses inotify through ctypes, one watch per
+directory. It falls back to re-walking the tree every poll_interval seconds
+and comparing a signature of each directory's listing when inotify is
+unavailable, when the tree has more directories than max_watches, or when
+the kernel runs out of watches.
+
+StorageIndex and DuplicateIndex keep the results of engine.scan_directory
+and engine.scan_duplicates per directory. apply(batch) re-lists only the
+changed directories: files that appeared, changed or vanished update the
+category totals and duplicate groups, new subdirectories are walked and
+removed ones dropped. Moves are a removal plus an addition; DuplicateIndex
+reuses the digest of a file that was moved (same inode, size and mtime)
+instead of hashing it again.
+"""
+import ctypes
+import ctypes.util
+import errno
+import os
+import select
+import struct
+import sys
+import threading
+import time
+from collections import defaultdict, deque
+import engine
+from metrics import NULL_METRICS
+from scheduler import NEVER_CANCELLED
+from throttle import NO_THROTTLE, lower_priority
+
+# inotify(7) event bits
+IN_MODIFY = 0x00000002
+IN_ATTRIB = 0x00000004
+IN_CLOSE_WRITE = 0x00000008
+IN_MOVED_FROM = 0x00000040
+IN_MOVED_TO = 0x00000080
+IN_CREATE = 0x00000100
+IN_DELETE = 0x00000200
+IN_Q_OVERFLOW = 0x00004000
+IN_IGNORED = 0x00008000
+IN_ONLYDIR = 0x01000000
+IN_DONT_FOLLOW = 0x02000000
+IN_ISDIR = 0x40000000
+IN_CLOEXEC = 0o2000000
+IN_NONBLOCK = 0o4000
+
+WATCH_MASK = (IN_MODIFY | IN_ATTRIB | IN_CLOSE_WRITE | IN_MOVED_FROM | IN_MOVED_TO |
+              IN_CREATE | IN_DELETE | IN_ONLYDIR | IN_DONT_FOLLOW)
+
+# struct inotify_event header: wd, mask, cookie, len (name follows)
+_EVENT = struct.Struct('iIII')
+
+class Batch:
+    """Directories that changed since the previous batch.
+
+    overflow means events were lost and every directory must be re-listed.
+    """
+
+    def __init__(self):
+        self.dirs = set()
+        self.overflow = False
+        self.events = 0
+
+    def __bool__(self):
+        return bool(self.dirs) or self.overflow
+
+def watch_root(path):
+    """The form of path used for a watched tree and the directories under it.
+
+    Paths in batches and index entries are joined onto the root, so a
+    trailing slash or a symbolic link to the tree would make them differ
+    from what os.walk() and inotify report.
+    """
+    return os.path.realpath(path)
+
+def _walk(path, device=None):
+    """os.walk(path), not descending into other filesystems if device is given."""
+    for root, dirs, files in os.walk(path):
+        if device is not None:
+            dirs[:] = [d for d in dirs if _device(os.path.join(root, d)) == device]
+        yield root, dirs, files
+
+def _device(path):
+    try:
+        return os.lstat(path).st_dev
+    except OSError:
+        return None
+
+class WatchLimitExceeded(Exception):
+    """The tree needs more inotify watches than the watcher may use."""
+
+def default_max_watches():
+    """Half of the per-user inotify watch limit, leaving the rest to other programs."""
+    try:
+        with open('/proc/sys/fs/inotify/max_user_watches') as f:
+            return int(f.read()) // 2
+    except (OSError, ValueError):
+        return 8192
+
+class _Inotify:
+    def __init__(self, root, max_watches, device=None, cancel=NEVER_CANCELLED,
+                 throttle=NO_THROTTLE):
+        self._libc = ctypes.CDLL(ctypes.util.find_library('c'), use_errno=True)
+        self.fd = self._libc.inotify_init1(IN_NONBLOCK | IN_CLOEXEC)
+        if self.fd < 0:
+            err = ctypes.get_errno()
+            raise OSError(err, os.strerror(err))
+        self.max_watches = max_watches
+        self.device = device
+        self.paths = {}  # watch descriptor -> directory
+        self.wds = {}    # directory -> watch descriptor
+        try:
+            self._watch_tree(root, cancel, throttle)
+        except BaseException:
+            self.close()
+            raise
+
+    def _watch_tree(self, path, cancel=NEVER_CANCELLED, throttle=NO_THROTTLE):
+        if self.device is not None and _device(path) != self.device:
+            return
+        for root, _, _ in _walk(path, self.device):
+            cancel.check()
+            throttle.file()
+            if len(self.wds) >= self.max_watches:
+                raise WatchLimitExceeded(root)
+            wd = self._libc.inotify_add_watch(self.fd, os.fsencode(root), WATCH_MASK)
+            if wd < 0:
+                if ctypes.get_errno() == errno.ENOSPC:
+                    raise WatchLimitExceeded(root)
+                continue  # vanished or unreadable; the walk skips it too
+            self.paths[wd] = root
+            self.wds[root] = wd
+
+    def _unwatch_tree(self, path):
+        prefix = path + os.sep
+        for directory in [d for d in self.wds if d == path or d.startswith(prefix)]:
+            wd = self.wds.pop(directory)
+            del self.paths[wd]
+            self._libc.inotify_rm_watch(self.fd, wd)
+
+    def read(self, timeout, batch):
+        """Wait up to timeout seconds for events and add them to batch."""
+        if not select.select([self.fd], [], [], timeout)[0]:
+            return
+        try:
+            data = os.read(self.fd, 64 * 1024)
+        except BlockingIOError:
+            return
+        offset = 0
+        while offset < len(data):
+            wd, mask, _, length = _EVENT.unpack_from(data, offset)
+            offset += _EVENT.size
+            name = data[offset:offset + length].rstrip(b'\0')
+            offset += length
+            batch.events += 1
+            if mask & IN_Q_OVERFLOW:
+                batch.overflow = True
+                continue
+            directory = self.paths.get(wd)
+            if directory is None:
+                continue
+            if mask & IN_IGNORED:
+                # The directory was deleted or unmounted
+                del self.paths[wd]
+                if self.wds.get(directory) == wd:
+                    del self.wds[directory]
+                continue
+            batch.dirs.add(directory)
+            if mask & IN_ISDIR and name:
+                path = os.path.join(directory, os.fsdecode(name))
+                if mask & (IN_CREATE | IN_MOVED_TO):
+                    self._watch_tree(path)
+                elif mask & IN_MOVED_FROM:
+                    self._unwatch_tree(path)
+
+    def close(self):
+        os.close(self.fd)
+
+class _Poller:
+    """Detects changes by re-walking the tree and comparing directory signatures.
+
+    A signature covers the names, sizes and mtimes of a directory's files and
+    the names of its subdirectories, so only one integer is kept per directory.
+    """
+
+    def __init__(self, root, interval, device=None, cancel=NEVER_CANCELLED,
+                 throttle=NO_THROTTLE):
+        self.root = root
+        self.interval = interval
+        self.device = device
+        self.signatures = self._snapshot(cancel, throttle)
+        self._next = time.monotonic() + interval
+
+    def _snapshot(self, cancel=NEVER_CANCELLED, throttle=NO_THROTTLE):
+        signatures = {}
+        for root, dirs, files in _walk(self.root, self.device):
+            cancel.check()
+            entries = []
+            for name in files:
+                throttle.file()
+                try:
+                    st = os.stat(os.path.join(root, name))
+                except OSError:
+                    continue
+                entries.append((name, st.st_size, st.st_mtime_ns))
+            entries.sort()
+            dirs.sort()
+            signatures[root] = hash((tuple(entries), tuple(dirs)))
+        return signatures
+
+    def read(self, timeout, batch):
+        remaining = self._next - time.monotonic()
+        if remaining > 0:
+            time.sleep(min(timeout, remaining))
+            return
+        signatures = self._snapshot()
+        old = self.signatures
+        changed = {d for d, signature in signatures.items() if old.get(d) != signature}
+        changed.update(old.keys() - signatures.keys())
+        self.signatures = signatures
+        self._next = time.monotonic() + self.interval
+        batch.dirs.update(changed)
+        batch.events += len(changed)
+
+    def close(self):
+        pass
+
+class Watcher:
+    """Watches a tree and calls on_batch(batch) from its own thread.
+
+    Call open() before scanning the tree so that no change made during the
+    scan is missed, then start() once the scan results are ready. With
+    one_filesystem, directories on other filesystems mounted under root
+    (such as /proc under /) are not watched.
+
+    An exception from on_batch does not stop the watcher; it is kept, with
+    the root, in errors (the latest 100).
+    """
+
+    def __init__(self, root, on_batch, batch_delay=1.0, poll_interval=60.0, max_watches=None,
+                 use_inotify=True, one_filesystem=False):
+        self.root = watch_root(root)
+        self.one_filesystem = one_filesystem
+        self.on_batch = on_batch
+        self.batch_delay = batch_delay
+        self.poll_interval = poll_interval
+        self.max_watches = default_max_watches() if max_watches is None else max_watches
+        self.use_inotify = use_inotify
+        self.errors = deque(maxlen=100)  # (root, error) of the latest failed batches
+        self.mode = None  # 'inotify' or 'polling'
+        self._backend = None
+        self._stop = threading.Event()
+        self._thread = None
+        self._recheck = set()
+        self._recheck_lock = threading.Lock()
+
+    def open(self, cancel=NEVER_CANCELLED, throttle=NO_THROTTLE):
+        """Begin recording changes.
+
+        This walks the whole tree once, to add the inotify watches or take
+        the first polling snapshot, so a scan passes its token and throttle.
+        """
+        if self.use_inotify and sys.platform.startswith('linux'):
+            try:
+                self._backend = _Inotify(self.root, self.max_watches, self._root_device(),
+                                         cancel, throttle)
+                self.mode = 'inotify'
+                return self
+            except (WatchLimitExceeded, OSError, AttributeError):
+                pass
+        self._backend = _Poller(self.root, self.poll_interval, self._root_device(),
+                                cancel, throttle)
+        self.mode = 'polling'
+        return self
+
+    def _root_device(self):
+        return _device(self.root) if self.one_filesystem else None
+
+    def start(self):
+        """Deliver batches of recorded changes to on_batch."""
+        if self._backend is None:
+            self.open()
+        self._thread = threading.Thread(target=self._run, name=f"watcher-{self.root}", daemon=True)
+        self._thread.start()
+        return self
+
+    def recheck(self, dirs):
+        """Deliver dirs again in a later batch, batch_delay seconds from now at the earliest."""
+        with self._recheck_lock:
+            self._recheck.update(dirs)
+
+    def stop(self):
+        self._stop.set()
+        if self._thread is None and self._backend is not None:
+            self._backend.close()
+
+    def _run(self):
+        if self.mode == 'polling':
+            lower_priority()
+        batch = Batch()
+        first_event = None
+        try:
+            while not self._stop.is_set():
+                try:
+                    self._backend.read(0.25, batch)
+                except WatchLimitExceeded:
+                    # The tree outgrew the watch budget: switch to polling and
+                    # have the indexes re-list everything once
+                    self._backend.close()
+                    self._backend = _Poller(self.root, self.poll_interval, self._root_device())
+                    self.mode = 'polling'
+                    lower_priority()
+                    batch.overflow = True
+                if self._recheck:
+                    with self._recheck_lock:
+                        batch.dirs.update(self._recheck)
+                        self._recheck.clear()
+                if not batch:
+                    continue
+                if first_event is None:
+                    first_event = time.monotonic()
+                if time.monotonic() - first_event >= self.batch_delay:
+                    try:
+                        self.on_batch(batch)
+                    except Exception as e:
+                        self.errors.append((self.root, str(e)))
+                    batch = Batch()
+                    first_event = None
+        finally:
+            self._backend.close()
+
+# Incremental indexes
+
+def _listing(path):
+    """Names of the files directly in path and paths of its subdirectories.
+
+    Matches os.walk: symbolic links to directories are neither.
+    """
+    files = []
+    subdirs = set()
+    with os.scandir(path) as entries:
+        for entry in entries:
+            try:
+                if entry.is_dir(follow_symlinks=False):
+                    subdirs.add(entry.path)
+                elif not entry.is_dir():
+                    files.append(entry.name)
+            except OSError:
+                continue
+    return files, subdirs
+
+class _TreeIndex:
+    """Per-directory scan results that can be refreshed one directory at a time.
+
+    per_dir must come from a walk of watch_root(root), as the scan()
+    class methods do.
+    """
+
+    def __init__(self, root, per_dir):
+        self.root = watch_root(root)
+        self.dirs = {}
+        self.children = defaultdict(set)
+        self.lock = threading.Lock()
+        for path, entry in per_dir.items():
+            self._put(os.path.normpath(path), self._compact(entry))
+
+    def apply(self, batch, metrics=NULL_METRICS):
+        """Bring the index up to date with the directories in batch.
+
+        Returns directories to look at again later (see Watcher.recheck).
+        """
+        dirs = set(self.dirs) | {self.root} if batch.overflow else batch.dirs
+        with self.lock:
+            with metrics.phase('watch.refresh'):
+                # Parents sort before their children, so a new subtree is
+                # walked once, from its top
+                for path in sorted(dirs):
+                    if path in self.dirs:
+                        self._refresh(path)
+            recheck = self._end_batch(metrics)
+        metrics.count('watch.events', batch.events)
+        metrics.count('watch.dirs', len(dirs))
+        return recheck
+
+    def _refresh(self, path):
+        try:
+            if os.path.islink(path) or not os.path.isdir(path):
+                raise FileNotFoundError(path)
+            entry, subdirs = self._list_dir(path)
+        except OSError:
+            self._remove_tree(path)
+            return
+        self._put(path, entry)
+        known = self.children.get(path, set())
+        for sub in known - subdirs:
+            self._remove_tree(sub)
+        for sub in subdirs - known:
+            self._add_tree(sub)
+
+    def _put(self, path, entry):
+        old = self.dirs.get(path)
+        if old is not None:
+            self._remove_entry(path, old)
+        elif path != self.root:
+            self.children[os.path.dirname(path)].add(path)
+        self.dirs[path] = entry
+        self._add_entry(path, entry)
+
+    def _add_tree(self, path):
+        stack = [path]
+        while stack:
+            directory = stack.pop()
+            try:
+                entry, subdirs = self._list_dir(directory)
+            except OSError:
+                continue
+            self._put(directory, entry)
+            stack.extend(subdirs)
+
+    def _remove_tree(self, path):
+        stack = [path]
+        while stack:
+            directory = stack.pop()
+            stack.extend(self.children.pop(directory, ()))
+            entry = self.dirs.pop(directory, None)
+            if entry is not None:
+                self._remove_entry(directory, entry)
+        self.children[os.path.dirname(path)].discard(path)
+
+    def _compact(self, entry):
+        return entry
+
+    def _end_batch(self, metrics):
+        return set()
+
+class StorageIndex(_TreeIndex):
+    """Category totals kept current from per-directory (category, bytes) pairs."""
+
+    def __init__(self, root, per_dir):
+        self.categories = defaultdict(int)
+        super().__init__(root, per_dir)
+
+    @classmethod
+    def scan(cls, root, metrics=NULL_METRICS, cancel=NEVER_CANCELLED, throttle=NO_THROTTLE):
+        root = watch_root(root)
+        per_dir = {}
+        engine.scan_directory(root, None, metrics, cancel, throttle, per_dir)
+        return cls(root, per_dir)
+
+    def totals(self):
+        """Bytes per category, like the result of engine.scan_directory."""
+        with self.lock:
+            return {category: size for category, size in self.categories.items() if size}
+
+    def _compact(self, entry):
+        return tuple(entry.items())
+
+    def _list_dir(self, path):
+        names, subdirs = _listing(path)
+        entry = defaultdict(int)
+        for name in names:
+            file_path = os.path.join(path, name)
+            try:
+                entry[engine.get_file_category(file_path)] += os.stat(file_path).st_size
+            except OSError:
+                continue
+        return tuple(entry.items()), subdirs
+
+    def _add_entry(self, path, entry):
+        for category, size in entry:
+            self.categories[category] += size
+
+    def _remove_entry(self, path, entry):
+        for category, size in entry:
+            self.categories[category] -= size
+
+class DuplicateIndex(_TreeIndex):
+    """Duplicate groups kept current from per-directory file digests.
+
+    New and changed files are hashed after all directories in a batch have
+    been re-listed, so a file moved within the tree keeps its digest. A file
+    still being written is not hashed until its size and mtime have stayed
+    the same for settle seconds; until then it is left out of the groups and
+    its directory is returned from apply() to be re-listed later.
+    """
+
+    def __init__(self, root, per_dir, settle=1.0):
+        self.settle = settle
+        self.by_digest = defaultdict(set)
+        self._unhashed = []
+        self._deferred = {}  # (directory, name) -> (size, mtime_ns) of files waiting to settle
+        self._dropped = {}  # (inode, size, mtime_ns) -> digest, for the current batch
+        self._cache = None
+        super().__init__(root, per_dir)
+        self._dropped.clear()
+
+    @classmethod
+    def scan(cls, root, cache=None, metrics=NULL_METRICS, cancel=NEVER_CANCELLED,
+             throttle=NO_THROTTLE, settle=1.0):
+        """Scan root like engine.scan_duplicates; returns (index, inaccessible, errors)."""
+        root = watch_root(root)
+        per_dir = {}
+        _, inaccessible, errors = engine.scan_duplicates(root, cache, metrics, cancel, throttle,
+                                                         per_dir)
+        return cls(root, per_dir, settle), inaccessible, errors
+
+    def apply(self, batch, metrics=NULL_METRICS, cache=None):
+        self._cache = cache
+        try:
+            return super().apply(batch, metrics)
+        finally:
+            self._cache = None
+
+    def groups(self):
+        """Digest -> [(path, size, mtime_ns)] for every digest shared by several files.
+
+        As in engine.scan_duplicates, hardlinks of one inode count as one file.
+        """
+        groups = {}
+        devices = {}
+        with self.lock:
+            for digest, paths in self.by_digest.items():
+                if len(paths) < 2:
+                    continue
+                files = []
+                inodes = set()
+                for path in sorted(paths):
+                    directory = os.path.dirname(path)
+                    size, mtime_ns, inode, _ = self.dirs[directory][os.path.basename(path)]
+                    if directory not in devices:
+                        try:
+                            devices[directory] = os.stat(directory).st_dev
+                        except OSError:
+                            devices[directory] = None
+                    inodes.add((devices[directory], inode))
+                    files.append((path, size, mtime_ns))
+                if len(inodes) > 1:
+                    groups[digest] = files
+        return groups
+
+    def _list_dir(self, path):
+        names, subdirs = _listing(path)
+        old = self.dirs.get(path, {})
+        entry = {}
+        for name in names:
+            try:
+                st = os.stat(os.path.join(path, name))
+            except OSError:
+                continue
+            stat = (st.st_size, st.st_mtime_ns, st.st_ino)
+            previous = old.get(name)
+            if previous and previous[:3] == stat:
+                entry[name] = previous
+                if previous[3] is None:
+                    self._unhashed.append((path, name))  # waiting to settle
+            else:
+                entry[name] = stat + (None,)
+                self._unhashed.append((path, name))
+        return entry, subdirs
+
+    def _add_entry(self, path, entry):
+        for name, (_, _, _, digest) in entry.items():
+            if digest is not None:
+                self.by_digest[digest].add(os.path.join(path, name))
+
+    def _remove_entry(self, path, entry):
+        for name, (size, mtime_ns, inode, digest) in entry.items():
+            if digest is None:
+                continue
+            paths = self.by_digest[digest]
+            paths.discard(os.path.join(path, name))
+            if not paths:
+                del self.by_digest[digest]
+            self._dropped[(inode, size, mtime_ns)] = digest
+
+    def _end_batch(self, metrics):
+        reused = 0
+        recheck = set()
+        deferred = {}
+        now = time.time()
+        for directory, name in self._unhashed:
+            entry = self.dirs.get(directory)
+            if entry is None or name not in entry or entry[name][3] is not None:
+                continue
+            size, mtime_ns, inode, _ = entry[name]
+            file_path = os.path.join(directory, name)
+            digest = self._dropped.get((inode, size, mtime_ns))
+            if digest is not None:
+                reused += 1
+            else:
+                try:
+                    st = os.stat(file_path)
+                except OSError:
+                    del entry[name]
+                    continue
+                # Still being written: changed since it was listed, or
+                # modified recently and not unchanged since the last look
+                stat = (st.st_size, st.st_mtime_ns)
+                if stat != (size, mtime_ns) or (
+                        now - mtime_ns / 1e9 < self.settle
+                        and self._deferred.get((directory, name)) != stat):
+                    deferred[(directory, name)] = stat
+                    recheck.add(directory)
+                    continue
+                try:
+                    digest = engine.calculate_file_hash(file_path, self._cache, st, metrics)
+                except OSError:
+                    del entry[name]
+                    continue
+            entry[name] = (size, mtime_ns, inode, digest)
+            self.by_digest[digest].add(file_path)
+        metrics.count('watch.moved_reused', reused)
+        metrics.count('watch.deferred', len(deferred))
+        self._unhashed = []
+        self._deferred = deferred
+        self._dropped.clear()
+        return recheck